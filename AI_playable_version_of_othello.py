@@ -1,11 +1,26 @@
 # Othello
 # https://inventwithpython.com/chapter15.html
 
+import array
+import collections
+import json
+import math
+import mmap
+import multiprocessing
+import operator
+import os
 import random
+import struct
 import sys
-#import numpy as np
+import threading
+import time
 #import matplotlib.pyplot as plt
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for batched leaf evaluation
+    np = None
+
 
 def drawBoard(board):
     # This function prints out the board that it was passed. Returns None.
@@ -47,46 +62,173 @@ def getNewBoard():
     return board
 
 
+####################################################################################################
+# BITBOARDS
+# A second board representation used by the search: one 64-bit integer per tile, bit (x * 8 + y)
+# set when that tile is on space x, y.  Moves and flips are computed with shifts and masks over all
+# eight directions at once instead of walking the list-of-lists board square by square.
+
+FULL_BITBOARD = 0xFFFFFFFFFFFFFFFF
+FIRST_COLUMN_BITBOARD = 0x0101010101010101
+LAST_COLUMN_BITBOARD = 0x8080808080808080
+
+# [shift, mask] for each of the eight directions.  A positive shift moves towards higher squares.
+# The mask clears the squares that wrapped around from the other side of the board after the shift.
+BITBOARD_DIRECTIONS = [
+    [1, FULL_BITBOARD & ~FIRST_COLUMN_BITBOARD],  # [0, 1]
+    [9, FULL_BITBOARD & ~FIRST_COLUMN_BITBOARD],  # [1, 1]
+    [8, FULL_BITBOARD],  # [1, 0]
+    [7, FULL_BITBOARD & ~LAST_COLUMN_BITBOARD],  # [1, -1]
+    [-1, FULL_BITBOARD & ~LAST_COLUMN_BITBOARD],  # [0, -1]
+    [-9, FULL_BITBOARD & ~LAST_COLUMN_BITBOARD],  # [-1, -1]
+    [-8, FULL_BITBOARD],  # [-1, 0]
+    [-7, FULL_BITBOARD & ~FIRST_COLUMN_BITBOARD],  # [-1, 1]
+]
+
+
+def getBitboardsFromBoard(board):
+    # Converts a getNewBoard style board into bitboards. Returns a dictionary with keys "X" and "O".
+    xbits = 0
+    obits = 0
+    bit = 1
+    for x in range(8):
+        for y in range(8):
+            if board[x][y] == "X":
+                xbits |= bit
+            elif board[x][y] == "O":
+                obits |= bit
+            bit <<= 1
+    return {"X": xbits, "O": obits}
+
+
+def getBoardFromBitboards(bitboards):
+    # Converts bitboards back into a getNewBoard style board, so drawBoard and the heuristics can use it.
+    board = getNewBoard()
+    setBoardTiles(board, bitboards["X"], "X")
+    setBoardTiles(board, bitboards["O"], "O")
+    return board
+
+
+def countBits(bits):
+    # Returns the number of squares set in a bitboard.
+    return bin(bits).count("1")
+
+
+def getMovesFromBitboard(bits):
+    # Returns a list of [x,y] lists for the squares set in a bitboard, in the same order as a row by row scan.
+    moves = []
+    while bits:
+        lowBit = bits & -bits
+        square = lowBit.bit_length() - 1
+        moves.append([square >> 3, square & 7])
+        bits ^= lowBit
+    return moves
+
+
+def getBitboardValidMoves(own, opponent):
+    # Returns a bitboard of every empty square where the player owning "own" can move.
+    # In each direction the runs of opponent's pieces next to own's are extended one square at a time
+    # until they stop growing, which is usually long before the longest run of six.
+    empty = ~(own | opponent) & FULL_BITBOARD
+    moves = 0
+    for shift, mask in BITBOARD_DIRECTIONS:
+        if shift > 0:
+            line = (own << shift) & mask & opponent
+            while line:
+                longerLine = line | ((line << shift) & mask & opponent)
+                if longerLine == line:
+                    break
+                line = longerLine
+            moves |= (line << shift) & mask & empty
+        else:
+            shift = -shift
+            line = (own >> shift) & mask & opponent
+            while line:
+                longerLine = line | ((line >> shift) & mask & opponent)
+                if longerLine == line:
+                    break
+                line = longerLine
+            moves |= (line >> shift) & mask & empty
+    return moves
+
+
+def hasBitboardMove(own, opponent):
+    # Returns True if the player owning "own" can move: getBitboardValidMoves(own, opponent) != 0, but it
+    # stops at the first direction with a move instead of finding them all.
+    empty = ~(own | opponent) & FULL_BITBOARD
+    for shift, mask in BITBOARD_DIRECTIONS:
+        if shift > 0:
+            line = (own << shift) & mask & opponent
+            while line:
+                if (line << shift) & mask & empty:
+                    return True
+                line = (line << shift) & mask & opponent
+        else:
+            shift = -shift
+            line = (own >> shift) & mask & opponent
+            while line:
+                if (line >> shift) & mask & empty:
+                    return True
+                line = (line >> shift) & mask & opponent
+    return False
+
+
+def getBitboardFlips(own, opponent, square):
+    # Returns a bitboard of the opponent's pieces that would be flipped by playing on square (x * 8 + y).
+    # Returns 0 if the move flips nothing (and so is not a valid move).
+    move = 1 << square
+    if (own | opponent) & move:
+        return 0
+    flips = 0
+    for shift, mask in BITBOARD_DIRECTIONS:
+        line = 0
+        if shift > 0:
+            bit = (move << shift) & mask
+            while bit & opponent:
+                line |= bit
+                bit = (bit << shift) & mask
+        else:
+            bit = (move >> -shift) & mask
+            while bit & opponent:
+                line |= bit
+                bit = (bit >> -shift) & mask
+        if bit & own:
+            flips |= line
+    return flips
+
+
+def makeBitboardMove(bitboards, tile, xstart, ystart):
+    # Returns new bitboards with the tile placed on xstart, ystart and the opponent"s pieces flipped.
+    # Returns False if this is an invalid move.
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    own = bitboards[tile]
+    opponent = bitboards[otherTile]
+    flips = getBitboardFlips(own, opponent, xstart * 8 + ystart)
+    if flips == 0:
+        return False
+    return {tile: own | flips | (1 << (xstart * 8 + ystart)), otherTile: opponent ^ flips}
+
+
+####################################################################################################
+
+
 def isValidMove(board, tile, xstart, ystart):
     # Returns False if the player"s move on space xstart, ystart is invalid.
     # If it is a valid move, returns a list of spaces that would become the player"s if they made a move here.
-    if board[xstart][ystart] != " " or not isOnBoard(xstart, ystart):
+    if not isOnBoard(xstart, ystart) or board[xstart][ystart] != " ":
         return False
-    board[xstart][ystart] = tile  # temporarily set the tile on the board.
     if tile == "X":
         otherTile = "O"
     else:
         otherTile = "X"
-    tilesToFlip = []
-    for xdirection, ydirection in [[0, 1], [1, 1], [1, 0], [1, -1], [0, -1], [-1, -1], [-1, 0], [-1, 1]]:
-        x, y = xstart, ystart
-        x += xdirection  # first step in the direction
-        y += ydirection  # first step in the direction
-        if isOnBoard(x, y) and board[x][y] == otherTile:
-            # There is a piece belonging to the other player next to our piece.
-            x += xdirection
-            y += ydirection
-            if not isOnBoard(x, y):
-                continue
-            while board[x][y] == otherTile:
-                x += xdirection
-                y += ydirection
-                if not isOnBoard(x, y):  # break out of while loop, then continue in for loop
-                    break
-            if not isOnBoard(x, y):
-                continue
-            if board[x][y] == tile:
-                # There are pieces to flip over. Go in the reverse direction until we reach the original space, noting all the tiles along the way.
-                while True:
-                    x -= xdirection
-                    y -= ydirection
-                    if x == xstart and y == ystart:
-                        break
-                    tilesToFlip.append([x, y])
-    board[xstart][ystart] = " "  # restore the empty space
-    if len(tilesToFlip) == 0:  # If no tiles were flipped, this is not a valid move.
+    bitboards = getBitboardsFromBoard(board)
+    flips = getBitboardFlips(bitboards[tile], bitboards[otherTile], xstart * 8 + ystart)
+    if flips == 0:  # If no tiles were flipped, this is not a valid move.
         return False
-    return tilesToFlip
+    return getMovesFromBitboard(flips)
 
 
 def isOnBoard(x, y):
@@ -104,12 +246,12 @@ def getBoardWithValidMoves(board, tile):
 
 def getValidMoves(board, tile):
     # Returns a list of [x,y] lists of valid moves for the given player on the given board.
-    validMoves = []
-    for x in range(8):
-        for y in range(8):
-            if isValidMove(board, tile, x, y) != False:
-                validMoves.append([x, y])
-    return validMoves
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    bitboards = getBitboardsFromBoard(board)
+    return getMovesFromBitboard(getBitboardValidMoves(bitboards[tile], bitboards[otherTile]))
 
 
 def getScoreOfBoard(board):
@@ -156,13 +298,60 @@ def playAgain():
 def makeMove(board, tile, xstart, ystart):
     # Place the tile on the board at xstart, ystart, and flip any of the opponent"s pieces.
     # Returns False if this is an invalid move, True if it is valid.
-    tilesToFlip = isValidMove(board, tile, xstart, ystart)
-    if tilesToFlip == False:
+    return makeMoveWithUndo(board, tile, xstart, ystart) is not False
+
+
+def makeMoveWithUndo(board, tile, xstart, ystart, bitboards=None):
+    # Same as makeMove, but returns the flipped pieces as a bitboard (False if the move is invalid)
+    # so that undoMove can put the board back exactly as it was without keeping a copy.
+    # If the board's bitboards are passed they are read instead of converting the board, and kept in step.
+    # board can be None to make the move on the bitboards alone.
+    if not isOnBoard(xstart, ystart):
         return False
-    board[xstart][ystart] = tile
-    for x, y in tilesToFlip:
-        board[x][y] = tile
-    return True
+    if board is None:
+        if (bitboards["X"] | bitboards["O"]) >> (xstart * 8 + ystart) & 1:
+            return False
+    elif board[xstart][ystart] != " ":
+        return False
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    if bitboards is None:
+        bitboards = getBitboardsFromBoard(board)
+    square = xstart * 8 + ystart
+    flips = getBitboardFlips(bitboards[tile], bitboards[otherTile], square)
+    if flips == 0:
+        return False
+    if board is not None:
+        board[xstart][ystart] = tile
+        setBoardTiles(board, flips, tile)
+    bitboards[tile] ^= flips | (1 << square)
+    bitboards[otherTile] ^= flips
+    return flips
+
+
+def undoMove(board, tile, xstart, ystart, flips, bitboards=None):
+    # Takes back a move made with makeMoveWithUndo, given the flips it returned.
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    if board is not None:
+        board[xstart][ystart] = " "
+        setBoardTiles(board, flips, otherTile)
+    if bitboards is not None:
+        bitboards[tile] ^= flips | (1 << (xstart * 8 + ystart))
+        bitboards[otherTile] ^= flips
+
+
+def setBoardTiles(board, bits, tile):
+    # Puts tile on every space of the board that is set in the bitboard bits.
+    while bits:
+        lowBit = bits & -bits
+        square = lowBit.bit_length() - 1
+        board[square >> 3][square & 7] = tile
+        bits ^= lowBit
 
 
 def getBoardCopy(board):
@@ -238,18 +427,21 @@ def getPlayerMove(board, playerTile):
 ##################################################################################################
 
 
+# Weights
+SQUARE_WEIGHTS = [
+    [4, -3, 2, 2, 2, 2, -3, 4],
+    [-3, -4, -1, -1, -1, -1, -4, -3],
+    [2, -1, 1, 0, 0, 1, -1, 2],
+    [2, -1, 0, 1, 1, 0, -1, 2],
+    [2, -1, 0, 1, 1, 0, -1, 2],
+    [2, -1, 1, 0, 0, 1, -1, 2],
+    [-3, -4, -1, -1, -1, -1, -4, -3],
+    [4, -3, 2, 2, 2, 2, -3, 4],
+]
+
+
 def getWeightedScoreOfBoard(board):
-    # Weights
-    W = [
-        [4, -3, 2, 2, 2, 2, -3, 4],
-        [-3, -4, -1, -1, -1, -1, -4, -3],
-        [2, -1, 1, 0, 0, 1, -1, 2],
-        [2, -1, 0, 1, 1, 0, -1, 2],
-        [2, -1, 0, 1, 1, 0, -1, 2],
-        [2, -1, 1, 0, 0, 1, -1, 2],
-        [-3, -4, -1, -1, -1, -1, -4, -3],
-        [4, -3, 2, 2, 2, 2, -3, 4],
-    ]
+    W = SQUARE_WEIGHTS
     # Determine the score by counting the tiles. Returns a dictionary with keys "X" and "O" with weight.
     xscore = 0
     oscore = 0
@@ -276,12 +468,12 @@ def getNumberOfCorners(board, computerTile):
 
 
 def getNumberOfValidMoves(board, tile):
-    score = 0
-    for x in range(8):
-        for y in range(8):
-            if isValidMove(board, tile, x, y) != False:
-                score += 1
-    return score
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    bitboards = getBitboardsFromBoard(board)
+    return countBits(getBitboardValidMoves(bitboards[tile], bitboards[otherTile]))
 
 
 def getCoinHeuristicScore(board, computerTile):
@@ -310,26 +502,36 @@ def getAdaptiveHeuristicScore(board, computerTile, playerTile, computerMobilityV
 
 def getStabilityHeuristicScore(board, playerTile, computerTile):
     computerCoins = getScoreOfBoard(board)[computerTile]
-    possibleMoves = getValidMoves(board, playerTile)
+    bitboards = getBitboardsFromBoard(board)
+    own = bitboards[playerTile]
+    opponent = bitboards[computerTile]
+    # A reply changes the space it is played on plus every piece it flips, so there is no need to play it
+    # on a copy of the board and compare the two.
+    possibleMoves = getBitboardValidMoves(own, opponent)
     maxDifferent = 0
-    for x, y in possibleMoves:
-        dupeBoard = getBoardCopy(board)
-        makeMove(dupeBoard, playerTile, x, y)
-        howManyDifferent = 0
-        for i in range(8):
-            for j in range(8):
-                if board[i][j] != dupeBoard[i][j]:
-                    howManyDifferent += 1
+    while possibleMoves:
+        lowBit = possibleMoves & -possibleMoves
+        howManyDifferent = 1 + countBits(getBitboardFlips(own, opponent, lowBit.bit_length() - 1))
         if howManyDifferent > maxDifferent:
             maxDifferent = howManyDifferent
+        possibleMoves ^= lowBit
     staticScore = computerCoins - maxDifferent
     return staticScore
 
 
-def getAdaptiveHeuristicScoreWithStability(board, computerTile, playerTile, computerMobilityValue, compTime):
+def getAdaptiveHeuristicScoreWithStability(board, computerTile, playerTile, computerMobilityValue, compTime,
+                                           stableDiscScore=None):
+    # compTime[4], when there is one, weighs the stable disc score. The search passes that score in from
+    # its stability state; otherwise it is computed from the board. A stability weight of 0 skips
+    # getStabilityHeuristicScore and its trial replies altogether.
     heuristic_score = compTime[0] * getCoinHeuristicScore(board, computerTile) + compTime[1] * getCornerHeuristicScore(
-        board, computerTile) + compTime[2] * getMobilityHeuristicScore(board, playerTile, computerMobilityValue) + \
-                      compTime[3] * getStabilityHeuristicScore(board, playerTile, computerTile)
+        board, computerTile) + compTime[2] * getMobilityHeuristicScore(board, playerTile, computerMobilityValue)
+    if compTime[3]:
+        heuristic_score += compTime[3] * getStabilityHeuristicScore(board, playerTile, computerTile)
+    if len(compTime) > 4 and compTime[4]:
+        if stableDiscScore is None:
+            stableDiscScore = getStableDiscHeuristicScore(board, computerTile, playerTile)
+        heuristic_score += compTime[4] * stableDiscScore
     return heuristic_score
 
 
@@ -340,11 +542,13 @@ def getHybridHeuristicScore(board, computerTile, playerTile, computerMobilityVal
         return getAdaptiveHeuristicScore(board, computerTile, playerTile, computerMobilityValue, time[0:3])
 
 
-def getHybridHeuristicScoreWithStability(board, computerTile, playerTile, computerMobilityValue, time):
+def getHybridHeuristicScoreWithStability(board, computerTile, playerTile, computerMobilityValue, time,
+                                         stableDiscScore=None):
     if countPieces(board) < time[4]:
         return getWeightedScoreOfBoard(board)[computerTile]
     else:
-        return getAdaptiveHeuristicScoreWithStability(board, computerTile, playerTile, computerMobilityValue, time[0:4])
+        return getAdaptiveHeuristicScoreWithStability(board, computerTile, playerTile, computerMobilityValue,
+                                                      time[0:4] + time[5:6], stableDiscScore)
 
 
 def countPieces(board):
@@ -356,6 +560,428 @@ def countPieces(board):
     return count
 
 
+#################################################################################################
+# STABLE DISCS
+# A disc is stable when nothing can ever flip it.  That is true when, along each of the four lines
+# through it (the row, the column and the two diagonals), the line is completely filled or the next
+# space on one side is off the board or holds a stable disc of the same tile.  Corners are always
+# stable, and stability spreads from them along the edges and across filled lines.
+# Stable discs stay stable and filled lines stay filled for the rest of the game, so the search keeps
+# a stability state [filledLines, stableDiscs] next to its bitboards and only adds to it after each
+# move: the four lines through the new disc are checked, and the stable discs are grown from the ones
+# already known.  Undoing the move goes back to the state the search had before it.
+
+EDGE_BITBOARD = 0xFF000000000000FF | FIRST_COLUMN_BITBOARD | LAST_COLUMN_BITBOARD
+
+# [shift, mask, mask, edges] for the row, the column and the two diagonals.  The masks are the ones of
+# BITBOARD_DIRECTIONS for shifting one way and the other, and edges are the spaces that have a
+# neighbour off the board along the line.
+STABILITY_AXES = [
+    [1, BITBOARD_DIRECTIONS[0][1], BITBOARD_DIRECTIONS[4][1], FIRST_COLUMN_BITBOARD | LAST_COLUMN_BITBOARD],
+    [8, FULL_BITBOARD, FULL_BITBOARD, 0xFF000000000000FF],
+    [9, BITBOARD_DIRECTIONS[1][1], BITBOARD_DIRECTIONS[5][1], EDGE_BITBOARD],
+    [7, BITBOARD_DIRECTIONS[3][1], BITBOARD_DIRECTIONS[7][1], EDGE_BITBOARD],
+]
+
+
+def getLineBitboards():
+    # Returns a 64 x 4 list: entry [square][axis] is the bitboard of the whole line through square
+    # along that axis of STABILITY_AXES.
+    lines = []
+    for x in range(8):
+        for y in range(8):
+            squareLines = []
+            for xdirection, ydirection in [[0, 1], [1, 0], [1, 1], [1, -1]]:
+                line = 0
+                for k in range(-7, 8):
+                    i, j = x + k * xdirection, y + k * ydirection
+                    if isOnBoard(i, j):
+                        line |= 1 << (i * 8 + j)
+                squareLines.append(line)
+            lines.append(squareLines)
+    return lines
+
+
+LINE_BITBOARDS = getLineBitboards()
+
+
+def getFilledLines(occupied):
+    # Returns a list with one bitboard per axis of STABILITY_AXES, holding the spaces whose line along
+    # that axis has no empty space left.
+    filledLines = [0, 0, 0, 0]
+    for squareLines in LINE_BITBOARDS:
+        for axis in range(4):
+            if (occupied & squareLines[axis]) == squareLines[axis]:
+                filledLines[axis] |= squareLines[axis]
+    return filledLines
+
+
+def getStableDiscs(own, filledLines, stable=0):
+    # Returns the bitboard of own's stable discs, grown from stable (discs of own already known to be
+    # stable) until no more are found.
+    rowAxis, columnAxis, diagonalAxis, antidiagonalAxis = STABILITY_AXES
+    while True:
+        candidates = own & ~stable & (filledLines[0] | rowAxis[3] | ((stable << 1) & rowAxis[1]) |
+                                      ((stable >> 1) & rowAxis[2]))
+        if candidates:
+            candidates &= filledLines[1] | columnAxis[3] | (stable << 8) | (stable >> 8)
+        if candidates:
+            candidates &= filledLines[2] | diagonalAxis[3] | ((stable << 9) & diagonalAxis[1]) | (
+                    (stable >> 9) & diagonalAxis[2])
+        if candidates:
+            candidates &= filledLines[3] | antidiagonalAxis[3] | ((stable << 7) & antidiagonalAxis[1]) | (
+                    (stable >> 7) & antidiagonalAxis[2])
+        if candidates == 0:
+            return stable
+        stable |= candidates
+
+
+def getStabilityState(bitboards):
+    # Computes the stability state of a position from nothing.
+    filledLines = getFilledLines(bitboards["X"] | bitboards["O"])
+    return [filledLines, {"X": getStableDiscs(bitboards["X"], filledLines),
+                          "O": getStableDiscs(bitboards["O"], filledLines)}]
+
+
+def getStabilityStateAfterMove(stability, bitboards, tile, x, y, flips):
+    # Returns the stability state after tile's move at x, y, which flipped the discs in flips, from the
+    # state before it. bitboards are the ones after the move.
+    filledLines, stable = stability
+    occupied = bitboards["X"] | bitboards["O"]
+    for axis, line in enumerate(LINE_BITBOARDS[x * 8 + y]):
+        # x, y was empty before the move, so a filled line through it is a new one
+        if (occupied & line) == line:
+            if filledLines is stability[0]:
+                filledLines = list(filledLines)
+            filledLines[axis] |= line
+    if filledLines is stability[0]:
+        # With no new filled line the other tile only lost discs, and new stable discs of tile have to
+        # start from the ones it just placed or flipped, so most moves leave the state as it was.
+        if getStableDiscs(flips | (1 << (x * 8 + y)), filledLines, stable[tile]) == stable[tile]:
+            return stability
+        stable = dict(stable)
+        stable[tile] = getStableDiscs(bitboards[tile], filledLines, stable[tile])
+        return [filledLines, stable]
+    return [filledLines, {"X": getStableDiscs(bitboards["X"], filledLines, stable["X"]),
+                          "O": getStableDiscs(bitboards["O"], filledLines, stable["O"])}]
+
+
+def getStableDiscScore(stability, computerTile, playerTile):
+    # The computer's stable discs minus the player's.
+    return countBits(stability[1][computerTile]) - countBits(stability[1][playerTile])
+
+
+def getStableDiscHeuristicScore(board, computerTile, playerTile):
+    # The stable disc score of a board, for use outside of the search.
+    return getStableDiscScore(getStabilityState(getBitboardsFromBoard(board)), computerTile, playerTile)
+
+
+def getStableDiscWeight(compHeuristic, compTime):
+    # The stable heuristics take the weight of the stable disc score as an optional last compTime value:
+    # stable_adaptive [coins, corners, mobility, stability, stable discs] and
+    # stable_hybrid [coins, corners, mobility, stability, pieces, stable discs].
+    if compHeuristic == 'stable_adaptive' and len(compTime) > 4:
+        return compTime[4]
+    if compHeuristic == 'stable_hybrid' and len(compTime) > 5:
+        return compTime[5]
+    return 0
+
+
+#################################################################################################
+# LEAF EVALUATORS
+# getMinMaxMove compiles compHeuristic and compTime into one LeafEvaluator per search, so the name of
+# the heuristic is looked at once instead of at every leaf.  The evaluator scores a leaf for the
+# computer straight from the search's bitboards and works out each feature its weights use only once:
+# the player's replies, for example, give both the mobility and the stability score.  The scores are
+# the same as those of the board heuristics above, 'pattern' scores with the tables of PATTERN
+# EVALUATION instead and 'tuned' with the weights of its game phase (see TUNED WEIGHTS).  An evaluator
+# can keep a state next to the search's bitboards (getState and getStateAfterMove), which the search
+# updates after every move instead of the evaluator working it out again at every leaf.
+
+CORNER_BITBOARD = 0x8100000000000081
+
+# WEIGHTED_ROW_SCORES[x][row] is the sum of SQUARE_WEIGHTS over the spaces of row x set in the 8 bits row.
+WEIGHTED_ROW_SCORES = [[sum(SQUARE_WEIGHTS[x][y] for y in range(8) if row >> y & 1) for row in range(256)]
+                       for x in range(8)]
+
+
+def getWeightedBitboardScore(bits):
+    # getWeightedScoreOfBoard of the tile with the bitboard bits.
+    score = 0
+    for x in range(8):
+        score += WEIGHTED_ROW_SCORES[x][(bits >> (x * 8)) & 0xFF]
+    return score
+
+
+class LeafEvaluator:
+    # The weights of one heuristic configuration. A feature with a weight of 0 is not computed.
+
+    def __init__(self, compHeuristic, compTime):
+        self.compHeuristic = compHeuristic
+        self.compTime = compTime
+        self.weightedOnly = compHeuristic == 'weighted'
+        # the hybrid heuristics use the weighted score while there are fewer pieces than this on the board
+        self.threshold = None
+        self.coinWeight = 0
+        self.cornerWeight = 0
+        self.mobilityWeight = 0
+        self.stabilityWeight = 0
+        self.stableDiscWeight = getStableDiscWeight(compHeuristic, compTime)
+        # the pattern heuristic scores from its PatternWeights, plus compTime[0] (if any) times the mobility
+        self.patternWeights = None
+        # the tuned heuristic hands every position to the stable_adaptive evaluator of its game phase
+        self.phaseEvaluators = None
+        if compHeuristic == 'greedy':
+            self.coinWeight = 1
+        elif compHeuristic == 'pattern':
+            self.patternWeights = getPatternWeights()
+            if len(compTime) > 0:
+                self.mobilityWeight = compTime[0]
+        elif compHeuristic == 'tuned':
+            self.phaseEvaluators = [LeafEvaluator('stable_adaptive', weights) for weights in getCompTimeWeights()]
+        elif compHeuristic != 'weighted':
+            self.coinWeight, self.cornerWeight, self.mobilityWeight = compTime[0:3]
+            if compHeuristic == 'stable_adaptive' or compHeuristic == 'stable_hybrid':
+                self.stabilityWeight = compTime[3]
+            if compHeuristic == 'stable_hybrid':
+                self.threshold = compTime[4]
+            elif compHeuristic != 'adaptive' and compHeuristic != 'stable_adaptive':
+                self.threshold = compTime[3]
+        self.keepsStability = self.stableDiscWeight != 0
+        if self.phaseEvaluators is not None:
+            self.keepsStability = any(evaluator.keepsStability for evaluator in self.phaseEvaluators)
+
+    def getState(self, bitboards):
+        # The state the search keeps up to date next to its bitboards for this evaluator: the pattern
+        # indices, the stability state when stable discs are weighed, or None.
+        if self.patternWeights is not None:
+            return getPatternIndices(bitboards)
+        if self.keepsStability:
+            return getStabilityState(bitboards)
+        return None
+
+    def getStateAfterMove(self, evalState, bitboards, tile, x, y, flips):
+        # The state after tile's move at x, y, which flipped the discs in flips, from evalState before it.
+        # bitboards are the ones after the move.
+        if self.patternWeights is not None:
+            return getPatternIndicesAfterMove(evalState, tile, x, y, flips)
+        return getStabilityStateAfterMove(evalState, bitboards, tile, x, y, flips)
+
+    def score(self, bitboards, computerMobilityValue, evalState=None):
+        # Scores the position for the computer. computerMobilityValue is the number of moves the computer
+        # had one ply up, and evalState the position's getState if the search keeps it.
+        own = bitboards[computerTile]
+        opponent = bitboards[playerTile]
+        if self.patternWeights is not None:
+            if evalState is None:
+                evalState = getPatternIndices(bitboards)
+            score = self.patternWeights.score(evalState, countBits(own | opponent))
+            if self.mobilityWeight:
+                replies = getBitboardValidMoves(opponent, own)
+                score += self.mobilityWeight * (computerMobilityValue - countBits(replies))
+            return score
+        if self.phaseEvaluators is not None:
+            phase = getGamePhase(countBits(own | opponent), len(self.phaseEvaluators))
+            return self.phaseEvaluators[phase].score(bitboards, computerMobilityValue, evalState)
+        if self.weightedOnly or (self.threshold is not None and countBits(own | opponent) < self.threshold):
+            return getWeightedBitboardScore(own)
+        coins = countBits(own)
+        score = self.coinWeight * coins
+        if self.cornerWeight:
+            score += self.cornerWeight * countBits(own & CORNER_BITBOARD)
+        if self.mobilityWeight or self.stabilityWeight:
+            replies = getBitboardValidMoves(opponent, own)
+            if self.mobilityWeight:
+                score += self.mobilityWeight * (computerMobilityValue - countBits(replies))
+            if self.stabilityWeight:
+                # as in getStabilityHeuristicScore, the most spaces one reply changes
+                maxDifferent = 0
+                while replies:
+                    lowBit = replies & -replies
+                    howManyDifferent = 1 + countBits(getBitboardFlips(opponent, own, lowBit.bit_length() - 1))
+                    if howManyDifferent > maxDifferent:
+                        maxDifferent = howManyDifferent
+                    replies ^= lowBit
+                score += self.stabilityWeight * (coins - maxDifferent)
+        if self.stableDiscWeight:
+            if evalState is None:
+                evalState = getStabilityState(bitboards)
+            score += self.stableDiscWeight * getStableDiscScore(evalState, computerTile, playerTile)
+        return score
+
+
+#################################################################################################
+# BATCHED EVALUATION
+# Scores many leaf boards at once.  The boards are stacked into an N x 8 x 8 int8 NumPy array
+# (1 for "X", -1 for "O", 0 for an empty space) and every feature is computed for the whole batch
+# with array operations. The scores are the same as the ones the single-board heuristics return.
+
+BOARD_ARRAY_VALUES = {"X": 1, "O": -1, " ": 0}
+EIGHT_DIRECTIONS = [[0, 1], [1, 1], [1, 0], [1, -1], [0, -1], [-1, -1], [-1, 0], [-1, 1]]
+if np is not None:
+    SQUARE_WEIGHTS_ARRAY = np.array(SQUARE_WEIGHTS)
+
+
+def getBoardArrays(boards):
+    # Stacks a list of getNewBoard style boards into an N x 8 x 8 int8 array.
+    return np.array([[[BOARD_ARRAY_VALUES[tile] for tile in row] for row in board] for board in boards],
+                    dtype=np.int8)
+
+
+def getBoardArraysFromBitboards(xbitsList, obitsList):
+    # Stacks lists of "X" and "O" bitboards into an N x 8 x 8 int8 array without going through the board lists.
+    xbits = np.unpackbits(np.array(xbitsList, dtype="<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    obits = np.unpackbits(np.array(obitsList, dtype="<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    return (xbits.astype(np.int8) - obits.astype(np.int8)).reshape(-1, 8, 8)
+
+
+def getRayIndices():
+    # Returns a 7 x 64 x 8 array: entry [k, square, d] is the flat index (x * 8 + y) of the space k + 1
+    # steps away from square in direction d, or 64 (an always empty space added after the last one)
+    # when that is off the board.
+    rays = np.full((7, 64, 8), 64, dtype=np.intp)
+    for x in range(8):
+        for y in range(8):
+            for d, (xdirection, ydirection) in enumerate(EIGHT_DIRECTIONS):
+                for k in range(7):
+                    i, j = x + (k + 1) * xdirection, y + (k + 1) * ydirection
+                    if isOnBoard(i, j):
+                        rays[k, x * 8 + y, d] = i * 8 + j
+    return rays
+
+
+if np is not None:
+    RAY_INDICES = getRayIndices()
+
+
+def getBatchFlipCounts(boardArrays, tile):
+    # Returns an N x 64 array with the number of pieces tile would flip by playing on each space of each
+    # board (0 where the move is not valid).
+    tileValue = BOARD_ARRAY_VALUES[tile]
+    flat = np.zeros((boardArrays.shape[0], 65), dtype=np.int8)
+    flat[:, :64] = boardArrays.reshape(-1, 64)
+    lines = np.take(flat, RAY_INDICES, axis=1)
+    own = lines == tileValue
+    opposing = lines == -tileValue
+    # run is True while every space so far in the direction holds an opposing piece and length counts
+    # them; the run is flipped if it is closed by one of tile's own pieces
+    run = opposing[:, 0].copy()
+    length = run.astype(np.int8)
+    closed = np.zeros_like(run)
+    for k in range(1, 7):
+        closed |= run & own[:, k]
+        run &= opposing[:, k]
+        length += run
+    flips = (length * closed).sum(axis=2)
+    flips[flat[:, :64] != 0] = 0
+    return flips
+
+
+def getBatchFeatures(boardArrays, computerTile, playerTile):
+    # Returns a dictionary of arrays with one value per board: "coins", "weighted" and "corners" for the
+    # computer and the number of "pieces" on the board.
+    computer = boardArrays == BOARD_ARRAY_VALUES[computerTile]
+    return {
+        "coins": computer.sum(axis=(1, 2)),
+        "weighted": (computer * SQUARE_WEIGHTS_ARRAY).sum(axis=(1, 2)),
+        "corners": computer[:, [0, 0, 7, 7], [0, 7, 0, 7]].sum(axis=1),
+        "pieces": (boardArrays != 0).sum(axis=(1, 2)),
+    }
+
+
+def getBatchReplyFeatures(boardArrays, playerTile, coins):
+    # Returns a dictionary of arrays with the player's "mobility" on each board and the "stability" score
+    # of getStabilityHeuristicScore, given the computer's coins from getBatchFeatures.
+    flips = getBatchFlipCounts(boardArrays, playerTile)
+    # a reply changes the space it is played on plus the pieces it flips
+    return {"mobility": (flips > 0).sum(axis=1),
+            "stability": coins - np.where(flips > 0, flips + 1, 0).max(axis=1)}
+
+
+def getBatchHeuristicScores(boardArrays, evaluator, computerTile, playerTile, computerMobilityValue,
+                            stableDiscScores=None):
+    # Scores every board of an N x 8 x 8 array with the weights of a LeafEvaluator. Returns a list of
+    # N scores, equal to what evaluator.score returns for each board.
+    # stableDiscScores is the list of the boards' stable disc scores when the caller already has them.
+    features = getBatchFeatures(boardArrays, computerTile, playerTile)
+    if evaluator.phaseEvaluators is not None:
+        # the boards of each phase are scored with the evaluator of the phase
+        phaseEvaluators = evaluator.phaseEvaluators
+        phases = getGamePhase(features["pieces"], len(phaseEvaluators))
+        scores = [0] * len(boardArrays)
+        for phase, phaseEvaluator in enumerate(phaseEvaluators):
+            rows = np.flatnonzero(phases == phase).tolist()
+            if rows:
+                phaseStableDiscScores = None
+                if stableDiscScores is not None:
+                    phaseStableDiscScores = [stableDiscScores[row] for row in rows]
+                phaseScores = getBatchHeuristicScores(boardArrays[rows], phaseEvaluator, computerTile, playerTile,
+                                                      computerMobilityValue, phaseStableDiscScores)
+                for row, score in zip(rows, phaseScores):
+                    scores[row] = score
+        return scores
+    if evaluator.weightedOnly:
+        return features["weighted"].tolist()
+    threshold = evaluator.threshold
+    if threshold is not None and not (features["pieces"] >= threshold).any():
+        # every board is still scored by the weights alone
+        return features["weighted"].tolist()
+    scores = evaluator.coinWeight * features["coins"]
+    if evaluator.cornerWeight:
+        scores = scores + evaluator.cornerWeight * features["corners"]
+    if evaluator.mobilityWeight or evaluator.stabilityWeight:
+        features.update(getBatchReplyFeatures(boardArrays, playerTile, features["coins"]))
+        if evaluator.mobilityWeight:
+            scores = scores + evaluator.mobilityWeight * (computerMobilityValue - features["mobility"])
+        if evaluator.stabilityWeight:
+            scores = scores + evaluator.stabilityWeight * features["stability"]
+    if evaluator.stableDiscWeight:
+        if stableDiscScores is None:
+            xbitsList = np.packbits((boardArrays == 1).reshape(-1, 64), axis=1, bitorder="little").view("<u8")
+            obitsList = np.packbits((boardArrays == -1).reshape(-1, 64), axis=1, bitorder="little").view("<u8")
+            stableDiscScores = [getStableDiscScore(getStabilityState({"X": int(xbits), "O": int(obits)}),
+                                                   computerTile, playerTile)
+                                for xbits, obits in zip(xbitsList[:, 0], obitsList[:, 0])]
+        scores = scores + evaluator.stableDiscWeight * np.array(stableDiscScores)
+    if threshold is not None:
+        scores = np.where(features["pieces"] < threshold, features["weighted"], scores)
+    return scores.tolist()
+
+
+def getChildScoresBatch(bitboards, tile, possibleMoves, evaluator, evalState=None):
+    # Scores the position after each of tile's possibleMoves in one batched call, the way the search
+    # scores its leaves one at a time. Returns a list of scores in the order of possibleMoves.
+    # evalState is the search's evaluator state before the moves, if it keeps one.
+    # Pattern scores are table lookups already, so they are scored one child at a time.
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    own = bitboards[tile]
+    opponent = bitboards[otherTile]
+    children = {tile: [], otherTile: []}
+    stableDiscScores = None
+    if evalState is not None and evaluator.patternWeights is None:
+        stableDiscScores = []
+    scores = []
+    for x, y in possibleMoves:
+        flips = getBitboardFlips(own, opponent, x * 8 + y)
+        children[tile].append(own | flips | (1 << (x * 8 + y)))
+        children[otherTile].append(opponent ^ flips)
+        childBitboards = {tile: children[tile][-1], otherTile: children[otherTile][-1]}
+        childState = None
+        if evalState is not None:
+            childState = evaluator.getStateAfterMove(evalState, childBitboards, tile, x, y, flips)
+        if evaluator.patternWeights is not None:
+            scores.append(evaluator.score(childBitboards, len(possibleMoves), childState))
+        elif childState is not None:
+            stableDiscScores.append(getStableDiscScore(childState, computerTile, "X"))
+    if evaluator.patternWeights is not None:
+        return scores
+    boardArrays = getBoardArraysFromBitboards(children["X"], children["O"])
+    return getBatchHeuristicScores(boardArrays, evaluator, computerTile, "X", len(possibleMoves), stableDiscScores)
+
+
 #################################################################################################
 
 def getComputerMove(board, computerTile):
@@ -412,47 +1038,1116 @@ def showPoints(playerTile, computerTile, mainBoard):
 playerTile, computerTile = ["X", "O"]
 MIN_SCORE = -5000
 MAX_SCORE = 5000
-ComputerMovesEvaluated = 0
-PlayerMovesEvaluated = 0
+# time.monotonic() value at which a time-budgeted search gives up, None when the search has no deadline
+searchDeadline = None
+
+
+####################################################################################################
+# TRANSPOSITION TABLE
+# Positions reached through a different move order are looked up by their Zobrist hash instead of
+# being searched again.  The hash is the XOR of one random 64-bit key per (tile, square) on the
+# board plus a key for the side to move, so it can be updated from the flipped squares alone.
+
+# A private generator keeps the keys identical between runs and processes without touching the
+# random module state that the search uses for move ordering.
+zobristRandom = random.Random(20200401)
+ZOBRIST_KEYS = {"X": [zobristRandom.getrandbits(64) for i in range(64)],
+                "O": [zobristRandom.getrandbits(64) for i in range(64)]}
+# Flipping a square swaps its "X" key for its "O" key (or the reverse), which is the same XOR.
+ZOBRIST_FLIP_KEYS = [ZOBRIST_KEYS["X"][i] ^ ZOBRIST_KEYS["O"][i] for i in range(64)]
+ZOBRIST_SIDE_KEY = zobristRandom.getrandbits(64)
+
+# Bound types of a stored score.
+TT_EXACT = 0
+TT_LOWER = 1  # the search failed high, the real score is at least the stored one
+TT_UPPER = 2  # the search failed low, the real score is at most the stored one
+
+DEFAULT_TT_SIZE = 2 ** 18
+
+
+def getZobristHash(bitboards, tileToMove):
+    # Computes the Zobrist hash of a position from scratch.
+    hashKey = 0
+    for tile in ["X", "O"]:
+        bits = bitboards[tile]
+        while bits:
+            lowBit = bits & -bits
+            hashKey ^= ZOBRIST_KEYS[tile][lowBit.bit_length() - 1]
+            bits ^= lowBit
+    if tileToMove == "O":
+        hashKey ^= ZOBRIST_SIDE_KEY
+    return hashKey
+
+
+def getZobristHashAfterMove(hashKey, tile, xstart, ystart, flips):
+    # Incrementally updates a Zobrist hash for tile playing on xstart, ystart and flipping the bitboard flips.
+    # The side to move changes as well.
+    hashKey ^= ZOBRIST_KEYS[tile][xstart * 8 + ystart] ^ ZOBRIST_SIDE_KEY
+    while flips:
+        lowBit = flips & -flips
+        hashKey ^= ZOBRIST_FLIP_KEYS[lowBit.bit_length() - 1]
+        flips ^= lowBit
+    return hashKey
+
+
+class TranspositionTable:
+    # A fixed-size hash table of search results.  Each entry is a tuple
+    # (hashKey, depth, score, bound, bestMove, generation).
+    # The table is split into buckets of two slots so it never grows past its memory budget:
+    # the first slot keeps the deepest result (unless it is left over from an earlier search) and
+    # the second slot always takes the newest result that did not fit in the first.
+
+    def __init__(self, size=DEFAULT_TT_SIZE):
+        # size is the number of entries and is rounded down to a power of two (at least 2).
+        buckets = 1
+        while buckets * 4 <= size:
+            buckets *= 2
+        self.size = buckets * 2
+        self.mask = buckets - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.searchKey = None
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def newSearch(self, searchKey):
+        # Called at the start of every search. Scores only make sense for one heuristic configuration,
+        # so the table is cleared when searchKey changes; otherwise older entries are marked as stale.
+        if searchKey != self.searchKey:
+            self.clear()
+            self.searchKey = searchKey
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def peek(self, hashKey):
+        # Returns the stored entry for hashKey, or None, without counting it as a hit or miss.
+        index = (hashKey & self.mask) << 1
+        for entry in self.entries[index:index + 2]:
+            if entry is not None and entry[0] == hashKey:
+                return entry
+        return None
+
+    def probe(self, hashKey):
+        # Returns the stored entry for hashKey, or None.
+        index = (hashKey & self.mask) << 1
+        entry = self.entries[index]
+        if entry is not None and entry[0] == hashKey:
+            self.hits += 1
+            return entry
+        other = self.entries[index + 1]
+        if other is not None and other[0] == hashKey:
+            self.hits += 1
+            return other
+        self.misses += 1
+        if entry is not None or other is not None:
+            # the bucket is holding other positions
+            self.collisions += 1
+        return None
+
+    def store(self, hashKey, depth, score, bound, bestMove):
+        index = (hashKey & self.mask) << 1
+        entry = (hashKey, depth, score, bound, bestMove, self.generation)
+        deepest = self.entries[index]
+        self.stores += 1
+        if deepest is None or deepest[0] == hashKey or deepest[1] <= depth or deepest[5] != self.generation:
+            self.entries[index] = entry
+            if deepest is not None and deepest[0] != hashKey:
+                # keep the result it replaced in the always-replace slot
+                self.entries[index + 1] = deepest
+        else:
+            self.entries[index + 1] = entry
+
+    def getStats(self):
+        # Returns a dictionary with the hit/miss/collision counters and how full the table is.
+        used = len(self.entries) - self.entries.count(None)
+        probes = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions, "stores": self.stores,
+                "hitRate": self.hits / probes if probes else 0.0, "used": used, "size": self.size}
+
+
+
+####################################################################################################
+# EVALUATION CACHE
+# Leaf scores are remembered by position, so a leaf that is reached again (through a transposition in
+# the same search, or in the search for the next move) is not scored again.  A leaf score depends on
+# the position and the side to move (both in the Zobrist hash), on the heuristic and its compTime, and
+# for the mobility heuristics on the number of moves the computer had one ply up, so the key is made
+# of all of them.
+
+DEFAULT_EVAL_CACHE_SIZE = 2 ** 16
+
+
+class EvaluationCache:
+    # A bounded map from (hashKey, computerMobilityValue, (compHeuristic, compTime)) to a leaf score.
+    # When it is full the least recently used score makes room for the new one.
+
+    def __init__(self, size=DEFAULT_EVAL_CACHE_SIZE):
+        # size is the largest number of scores kept.
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.searchKey = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def newSearch(self, searchKey):
+        # Called at the start of every search with the search's (compHeuristic, tuple(compTime)). Scores
+        # of other configurations are kept, they are just part of a different key.
+        self.searchKey = searchKey
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        # Returns the score stored for key, or None.
+        score = self.entries.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, key, score):
+        self.entries[key] = score
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def getStats(self):
+        # Returns a dictionary with the hit/miss/eviction counters and how full the cache is.
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hitRate": self.hits / lookups if lookups else 0.0, "used": len(self.entries), "size": self.size}
+
+
+def getCachedLeafScore(evalCache, hashKey, evaluator, bitboards, computerMobilityValue, evalState=None):
+    # evaluator.score through evalCache, which may be None. hashKey is the Zobrist hash of the leaf.
+    if evalCache is None:
+        return evaluator.score(bitboards, computerMobilityValue, evalState)
+    key = (hashKey, computerMobilityValue, evalCache.searchKey)
+    score = evalCache.get(key)
+    if score is None:
+        score = evaluator.score(bitboards, computerMobilityValue, evalState)
+        evalCache.put(key, score)
+    return score
+
+
+####################################################################################################
+# MOVE ORDERING
+# Alpha-beta prunes the most when the best move of a node is searched first, so the moves of every
+# node are sorted before they are searched:
+#   1. the move of the principal variation and the best move stored in the transposition table,
+#   2. the killer moves of the ply: the last KILLER_MOVES moves that caused a cutoff at the same distance
+#      from the root, which often refute the sibling positions as well,
+#   3. the history score of the move's square for the tile: every cutoff adds the square of the
+#      remaining depth, so moves that were good anywhere in the tree come first,
+#   4. the weight of the square in SQUARE_WEIGHTS (corners first, the squares next to them last).
+# Moves that are still tied are ordered with a seeded random number generator, so the order (and the
+# move chosen among equal scores) is repeatable for the same seed.
+
+KILLER_MOVES = 2
+
+
+class MoveOrdering:
+    # Killer moves and history scores for one search, or for every search of a game if the same object
+    # is passed to getMinMaxMove for each move.  Also counts the cutoffs and how many of them happened on
+    # the first move searched, which is how often the ordering found the best move.
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.killers = []
+        self.history = {"X": [0] * 64, "O": [0] * 64}
+        # whether iterMoves still holds the history list of the tile, which storeCutoff must then copy
+        # before changing it
+        self.historyShared = {"X": False, "O": False}
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+
+    def newSearch(self):
+        # Called at the start of every search. The killers are kept by ply from the root, so they belong to
+        # the last search only; the history scores are halved so that recent cutoffs count the most.
+        self.killers = []
+        for tile in ["X", "O"]:
+            self.history[tile] = [score >> 1 for score in self.history[tile]]
+            self.historyShared[tile] = False
+
+    def clear(self):
+        self.killers = []
+        self.history = {"X": [0] * 64, "O": [0] * 64}
+        self.historyShared = {"X": False, "O": False}
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+
+    def orderMoves(self, possibleMoves, tile, ply, firstMoves=()):
+        # Returns the [x, y] moves of tile at ply sorted best first. firstMoves are tried before everything
+        # else in the order given (None entries are ignored).
+        killers = ()
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+        history = self.history[tile]
+        tieBreak = self.random.random
+        keyedMoves = []
+        for move in possibleMoves:
+            x, y = move
+            priority = 0
+            if move in firstMoves:
+                priority = KILLER_MOVES + len(firstMoves) - firstMoves.index(move)
+            elif move in killers:
+                priority = KILLER_MOVES - killers.index(move)
+            keyedMoves.append((priority, history[x * 8 + y], SQUARE_WEIGHTS[x][y], tieBreak(), move))
+        keyedMoves.sort(reverse=True)
+        return [keyedMove[4] for keyedMove in keyedMoves]
+
+    def iterMoves(self, moves, tile, ply, firstMoves=(), stats=None):
+        # Yields the [x, y] moves of the move bitboard moves in the same order as orderMoves, one at a time:
+        # the first moves and the killers are yielded before the other moves are listed and sorted, which
+        # does not happen at all when the search stops after a cutoff. The sort uses the killers and history
+        # scores from before the first move was searched, as orderMoves would: the history list is kept
+        # without copying it, and storeCutoff copies it before its first change while it is shared. The
+        # tie-breaks are still drawn for every move up front, so that the random numbers drawn in the
+        # subtrees of the first moves do not change them. The ordering is timed in stats if given.
+        if stats is not None:
+            timer = stats.startTimer("moveOrdering")
+        count = countBits(moves)
+        tieBreak = self.random.random
+        tieBreaks = [tieBreak() for i in range(count)]
+        killers = []
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+        history = self.history[tile]
+        self.historyShared[tile] = True
+        earlyMoves = []
+        for move in list(firstMoves) + killers:
+            if move is not None and moves >> (move[0] * 8 + move[1]) & 1 and move not in earlyMoves:
+                earlyMoves.append(move)
+        if stats is not None:
+            stats.stopTimer("moveOrdering", timer)
+        for move in earlyMoves:
+            yield move
+        if len(earlyMoves) == count:
+            return
+        if stats is not None:
+            timer = stats.startTimer("moveOrdering")
+        keyedMoves = []
+        for i, move in enumerate(getMovesFromBitboard(moves)):
+            if move not in earlyMoves:
+                x, y = move
+                keyedMoves.append((history[x * 8 + y], SQUARE_WEIGHTS[x][y], tieBreaks[i], move))
+        keyedMoves.sort(reverse=True)
+        if stats is not None:
+            stats.stopTimer("moveOrdering", timer)
+        for keyedMove in keyedMoves:
+            yield keyedMove[3]
+
+    def storeCutoff(self, tile, ply, move, moveIndex, depth):
+        # Called when move (the moveIndex-th move searched) caused a cutoff with depth plies left.
+        self.cutoffs += 1
+        if moveIndex == 0:
+            self.firstMoveCutoffs += 1
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[KILLER_MOVES:]
+        if self.historyShared[tile]:
+            self.history[tile] = self.history[tile][:]
+            self.historyShared[tile] = False
+        self.history[tile][move[0] * 8 + move[1]] += depth * depth
+
+    def getStats(self):
+        # Returns a dictionary with the cutoff counters and the fraction of cutoffs on the first move.
+        return {"cutoffs": self.cutoffs, "firstMoveCutoffs": self.firstMoveCutoffs,
+                "firstMoveCutoffRate": self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0}
+
+
+####################################################################################################
+# SEARCH STATISTICS
+# A SearchStats passed to getMinMaxMove is filled in by the search it is passed to: the nodes (moves
+# made) at each ply from the root and in the endgame solver, the leaves scored by the heuristic, and
+# the index in the move order of every move that caused a cutoff.  The time spent in the hot paths of
+# the search, STATS_TIMERS, is measured in one node in every sampleInterval and scaled up to all of
+# them, because reading the clock everywhere would cost more than some of the calls being timed:
+#   moveGeneration: finding the moves of a node,
+#   moveOrdering:   sorting them (see MOVE ORDERING),
+#   makeMove:       making a move in place, with its hash key and evaluator state (there is no board copy),
+#   evaluation:     scoring leaves, one leaf or one batch of them at a time.
+# A hook, if given, is called as hook(timer, True) before and hook(timer, False) after every timed call,
+# outside the measured time, so that a profiler or another timer can be attached to the same calls
+# without changing the search; for example a cProfile.Profile whose enable and disable the hook calls
+# profiles a sample of the hot paths.
+
+STATS_TIMERS = ["moveGeneration", "moveOrdering", "makeMove", "evaluation"]
+STATS_MAX_PLY = 128  # 60 moves and a pass before each of them
+DEFAULT_STATS_SAMPLE_INTERVAL = 64
+
+
+class SearchStats:
+    # The statistics of the last search it was passed to. Statistics of several searches (or of the
+    # worker processes of one) are combined with add.
+
+    def __init__(self, sampleInterval=DEFAULT_STATS_SAMPLE_INTERVAL, hook=None):
+        self.sampleInterval = sampleInterval
+        self.hook = hook
+        self.newSearch(None)
+
+    def newSearch(self, compHeuristic):
+        # Called at the start of every search: forgets the counters of the one before.
+        self.compHeuristic = compHeuristic
+        self.nodesPerPly = [0] * STATS_MAX_PLY
+        self.endgameNodes = 0
+        self.leaves = 0
+        self.leafEvaluations = collections.Counter()
+        self.cutoffMoveIndices = collections.Counter()
+        self.countdown = self.sampleInterval
+        self.sampledSeconds = dict.fromkeys(STATS_TIMERS, 0.0)
+        self.seconds = 0.0
+
+    def sampleNode(self):
+        # Called by every node of the search; True for the nodes whose hot paths are timed.
+        self.countdown -= 1
+        if self.countdown:
+            return False
+        self.countdown = self.sampleInterval
+        return True
+
+    def startTimer(self, timer):
+        # Called before a timed call. Returns the clock to pass to stopTimer after it.
+        if self.hook is not None:
+            self.hook(timer, True)
+        return time.perf_counter()
+
+    def stopTimer(self, timer, start):
+        self.sampledSeconds[timer] += time.perf_counter() - start
+        if self.hook is not None:
+            self.hook(timer, False)
+
+    def finishSearch(self, seconds):
+        # Called at the end of a search with how long it took. The leaves are counted in self.leaves during
+        # the search and filed under the heuristic here.
+        if self.leaves:
+            self.leafEvaluations[self.compHeuristic] += self.leaves
+            self.leaves = 0
+        self.seconds += seconds
+
+    def add(self, other):
+        # Adds the counters of the SearchStats other to these.
+        self.nodesPerPly = [nodes + otherNodes for nodes, otherNodes in zip(self.nodesPerPly, other.nodesPerPly)]
+        self.endgameNodes += other.endgameNodes
+        self.leaves += other.leaves
+        self.leafEvaluations.update(other.leafEvaluations)
+        self.cutoffMoveIndices.update(other.cutoffMoveIndices)
+        for timer in STATS_TIMERS:
+            self.sampledSeconds[timer] += other.sampledSeconds[timer] * other.sampleInterval / self.sampleInterval
+        self.seconds += other.seconds
+
+    def getNodes(self):
+        return sum(self.nodesPerPly) + self.endgameNodes
+
+    def getStats(self):
+        # Returns a dictionary with the counters, the estimated seconds spent in each timer and the effective
+        # branching factor: the number of nodes at the deepest ply to the power of one over its depth.
+        cutoffs = sum(self.cutoffMoveIndices.values())
+        deepestPly = 0
+        for ply, nodes in enumerate(self.nodesPerPly):
+            if nodes:
+                deepestPly = ply
+        nodes = self.getNodes()
+        return {"nodes": nodes, "nodesPerPly": self.nodesPerPly[1:deepestPly + 1],
+                "endgameNodes": self.endgameNodes, "leafEvaluations": dict(self.leafEvaluations), "cutoffs": cutoffs,
+                "cutoffMoveIndices": dict(sorted(self.cutoffMoveIndices.items())),
+                "firstMoveCutoffRate": self.cutoffMoveIndices[0] / cutoffs if cutoffs else 0.0,
+                "timerSeconds": {timer: self.sampledSeconds[timer] * self.sampleInterval for timer in STATS_TIMERS},
+                "seconds": self.seconds, "nodesPerSecond": nodes / self.seconds if self.seconds else 0.0,
+                "effectiveBranchingFactor": self.nodesPerPly[deepestPly] ** (1 / deepestPly) if deepestPly else 0.0}
+
+
+####################################################################################################
+# OPENING BOOK
+# Book moves are stored in a compact binary file that is memory-mapped, so several game processes
+# reading the same book share its pages.  The file is a header followed by fixed-size records sorted
+# by key.  The key is the smallest Zobrist hash of the position over its 8 board symmetries (rotations
+# and reflections), so one record covers all 8 of them.  The move is stored in the orientation that
+# gave that hash.  Book positions always have computerTile to move, the same as getMinMaxMove.
+# build_opening_book.py writes the file.
+
+BOOK_MAGIC = b"OTHBOOK1"
+BOOK_HEADER = struct.Struct("<8sII")  # magic, number of records, record size
+BOOK_RECORD = struct.Struct("<QBxhI")  # canonical hash, square of the move, score, weight (e.g. games)
+OPENING_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "othello_book.bin")
+
+
+def getSymmetrySquares():
+    # Returns a list of 8 tables mapping each square (x * 8 + y) to the square it moves to under one of the
+    # board's symmetries. The first one is the identity.
+    transforms = [lambda x, y: [x, y], lambda x, y: [x, 7 - y], lambda x, y: [7 - x, y],
+                  lambda x, y: [7 - x, 7 - y], lambda x, y: [y, x], lambda x, y: [y, 7 - x],
+                  lambda x, y: [7 - y, x], lambda x, y: [7 - y, 7 - x]]
+    tables = []
+    for transform in transforms:
+        table = []
+        for square in range(64):
+            x, y = transform(square >> 3, square & 7)
+            table.append(x * 8 + y)
+        tables.append(table)
+    return tables
+
+
+SYMMETRY_SQUARES = getSymmetrySquares()
+# the table that undoes each symmetry
+INVERSE_SYMMETRY_SQUARES = [[table.index(square) for square in range(64)] for table in SYMMETRY_SQUARES]
+
+
+def transformBitboard(bits, table):
+    # Moves every square set in bits to table[square].
+    transformed = 0
+    while bits:
+        lowBit = bits & -bits
+        transformed |= 1 << table[lowBit.bit_length() - 1]
+        bits ^= lowBit
+    return transformed
+
+
+def getCanonicalHash(bitboards):
+    # Returns [hashKey, symmetry]: the smallest Zobrist hash (computerTile to move) of the position over
+    # the 8 symmetries, and the index in SYMMETRY_SQUARES of the symmetry that gives it.
+    best = None
+    for symmetry, table in enumerate(SYMMETRY_SQUARES):
+        transformed = {"X": transformBitboard(bitboards["X"], table), "O": transformBitboard(bitboards["O"], table)}
+        hashKey = getZobristHash(transformed, computerTile)
+        if best is None or hashKey < best[0]:
+            best = [hashKey, symmetry]
+    return best
+
+
+class OpeningBook:
+    # A read-only, memory-mapped opening book file.
+
+    def __init__(self, path=OPENING_BOOK_PATH):
+        self.path = path
+        self.bookFile = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.bookFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file cannot be mapped
+            self.bookFile.close()
+            raise ValueError("%s is not an opening book" % path)
+        if len(self.data) < BOOK_HEADER.size:
+            self.close()
+            raise ValueError("%s is not an opening book" % path)
+        magic, self.size, recordSize = BOOK_HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or recordSize != BOOK_RECORD.size or \
+                len(self.data) != BOOK_HEADER.size + self.size * recordSize:
+            self.close()
+            raise ValueError("%s is not an opening book" % path)
+
+    def lookup(self, hashKey):
+        # Returns [square, score, weight] for the canonical hashKey, or None. Binary search over the records.
+        low = 0
+        high = self.size
+        while low < high:
+            middle = (low + high) // 2
+            record = BOOK_RECORD.unpack_from(self.data, BOOK_HEADER.size + middle * BOOK_RECORD.size)
+            if record[0] < hashKey:
+                low = middle + 1
+            elif record[0] > hashKey:
+                high = middle
+            else:
+                return list(record[1:])
+        return None
+
+    def close(self):
+        self.data.close()
+        self.bookFile.close()
+
+
+def writeOpeningBook(path, entries, maxEntries=None):
+    # Writes entries, a list of [hashKey, square, score, weight, plies] with canonical hashes and squares,
+    # as a book file. With maxEntries only that many are kept, the positions closest to the start of the
+    # game (and then the heaviest) first, so the file stays small enough to share.
+    # The book is written to a temporary file next to path and then renamed over it, so an interrupted
+    # build leaves the old book (or none) rather than a broken one.
+    if maxEntries is not None:
+        entries = sorted(entries, key=lambda entry: [entry[4], -entry[3]])[:maxEntries]
+    entries = sorted(entries)
+    temporaryPath = path + ".tmp"
+    try:
+        with open(temporaryPath, "wb") as bookFile:
+            bookFile.write(BOOK_HEADER.pack(BOOK_MAGIC, len(entries), BOOK_RECORD.size))
+            for hashKey, square, score, weight, plies in entries:
+                score = max(-32768, min(32767, int(round(score))))
+                bookFile.write(BOOK_RECORD.pack(hashKey, square, score, min(weight, 0xFFFFFFFF)))
+        os.replace(temporaryPath, path)
+    except BaseException:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+
+def loadOpeningBook(path=OPENING_BOOK_PATH):
+    # Maps the book file and makes getMinMaxMove use it. Returns the book.
+    global openingBook
+    if openingBook is not None:
+        openingBook.close()
+    openingBook = OpeningBook(path)
+    return openingBook
+
+
+def getBookMove(bitboards, book=None):
+    # Returns [[x,y], Score] from the book for the computer, or None if the position is not in it.
+    if book is None:
+        book = openingBook
+    if book is None:
+        return None
+    hashKey, symmetry = getCanonicalHash(bitboards)
+    record = book.lookup(hashKey)
+    if record is None:
+        return None
+    square = INVERSE_SYMMETRY_SQUARES[symmetry][record[0]]
+    if getBitboardFlips(bitboards[computerTile], bitboards[playerTile], square) == 0:
+        return None
+    return [[square >> 3, square & 7], record[1]]
+
+
+openingBook = None
+if os.path.exists(OPENING_BOOK_PATH):
+    try:
+        openingBook = OpeningBook(OPENING_BOOK_PATH)
+    except ValueError as error:
+        # a broken book file should not stop the game, so it is played without a book
+        print("warning: %s, playing without an opening book" % error, file=sys.stderr)
+
+
+####################################################################################################
+# PATTERN EVALUATION
+# The 'pattern' heuristic scores a position as a sum of table lookups, one for every instance of the
+# PATTERNS below: the edges with their X squares, the 3x3 and 2x5 corner regions, the second, third and
+# fourth lines and the diagonals of 4 to 8 squares.  The squares of an instance are read as the digits
+# of a base-3 number (0 empty, 1 the computer, 2 the player), and that index picks the instance's score
+# from the table of its pattern for the game phase.  The rotations and reflections of a pattern share
+# one table.
+# The search keeps the index of every instance as its evaluator state: a move adds the placed disc and
+# the flipped discs to the few indices whose instances contain their squares, so scoring a leaf is only
+# the lookups.  The tables are int16 values in a weight file, PATTERN_WEIGHTS_PATH by default, read the
+# first time they are needed.  Without a weight file every square's SQUARE_WEIGHTS weight is shared out
+# over the instances that contain it, which makes the score the computer's weighted score minus the
+# player's.
+
+PATTERN_WEIGHTS_MAGIC = b"OTHPATT1"
+PATTERN_HEADER = struct.Struct("<8sHHH")  # magic, number of phases, scale, number of patterns
+PATTERN_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "othello_patterns.bin")
+PATTERN_PHASES = 6  # phases of the default tables; the discs on the board from 4 to 64 are split evenly
+# a table value is the score times the scale. 120 is divisible by the number of instances on every
+# square, so the default tables are exact.
+PATTERN_SCALE = 120
+
+# [name, squares] of each pattern in one orientation, the squares as [x, y] lists.
+PATTERNS = [
+    ["edge", [[0, 0], [0, 1], [0, 2], [0, 3], [0, 4], [0, 5], [0, 6], [0, 7], [1, 1], [1, 6]]],
+    ["corner3x3", [[0, 0], [0, 1], [0, 2], [1, 0], [1, 1], [1, 2], [2, 0], [2, 1], [2, 2]]],
+    ["corner2x5", [[0, 0], [0, 1], [0, 2], [0, 3], [0, 4], [1, 0], [1, 1], [1, 2], [1, 3], [1, 4]]],
+    ["line2", [[1, y] for y in range(8)]],
+    ["line3", [[2, y] for y in range(8)]],
+    ["line4", [[3, y] for y in range(8)]],
+    ["diagonal8", [[i, i] for i in range(8)]],
+    ["diagonal7", [[i, i + 1] for i in range(7)]],
+    ["diagonal6", [[i, i + 2] for i in range(6)]],
+    ["diagonal5", [[i, i + 3] for i in range(5)]],
+    ["diagonal4", [[i, i + 4] for i in range(4)]],
+]
+PATTERN_SIZES = [3 ** len(squares) for name, squares in PATTERNS]
+
+
+def getPatternInstances():
+    # Returns a list of [pattern, squares], one for every instance of PATTERNS under the symmetries of the
+    # board, with the squares (x * 8 + y) in the order of the index digits. Symmetries that map a pattern
+    # onto the same squares give one instance.
+    instances = []
+    for pattern, (name, squares) in enumerate(PATTERNS):
+        seen = set()
+        for table in SYMMETRY_SQUARES:
+            instanceSquares = [table[x * 8 + y] for x, y in squares]
+            if frozenset(instanceSquares) not in seen:
+                seen.add(frozenset(instanceSquares))
+                instances.append([pattern, instanceSquares])
+    return instances
+
+
+PATTERN_INSTANCES = getPatternInstances()
+
+
+def getPatternSquareUpdates():
+    # Returns a 64 entry list: entry [square] is a list of [instance, power] for every instance containing
+    # square, power being the place value of square's digit in the instance's index.
+    updates = [[] for square in range(64)]
+    for instance, (pattern, squares) in enumerate(PATTERN_INSTANCES):
+        for digit, square in enumerate(squares):
+            updates[square].append([instance, 3 ** digit])
+    return updates
+
+
+PATTERN_SQUARE_UPDATES = getPatternSquareUpdates()
+
+patternWeights = None
+
+
+def getPatternIndices(bitboards):
+    # Computes the index of every instance of PATTERN_INSTANCES from nothing.
+    own = bitboards[computerTile]
+    opponent = bitboards[playerTile]
+    indices = []
+    for pattern, squares in PATTERN_INSTANCES:
+        index = 0
+        power = 1
+        for square in squares:
+            if own >> square & 1:
+                index += power
+            elif opponent >> square & 1:
+                index += 2 * power
+            power *= 3
+        indices.append(index)
+    return indices
+
+
+def getPatternIndicesAfterMove(indices, tile, x, y, flips):
+    # Returns the indices after tile's move at x, y, which flipped the discs in flips, from the indices
+    # before it. The placed disc adds its digit and a flipped disc changes from one digit to the other.
+    if tile == computerTile:
+        placed, flipped = 1, -1
+    else:
+        placed, flipped = 2, 1
+    indices = list(indices)
+    for instance, power in PATTERN_SQUARE_UPDATES[x * 8 + y]:
+        indices[instance] += placed * power
+    while flips:
+        lowBit = flips & -flips
+        for instance, power in PATTERN_SQUARE_UPDATES[lowBit.bit_length() - 1]:
+            indices[instance] += flipped * power
+        flips ^= lowBit
+    return indices
+
+
+def getGamePhase(pieces, phases):
+    # The phase of a position with pieces discs on the board when the game is split into phases of about
+    # the same number of moves. The pattern tables, the tuned weights and the ProbCut fits all split the
+    # game with this. pieces may also be a NumPy array of disc counts; there are never more than 64
+    # discs, so the phase is at most phases - 1.
+    return (pieces - 4) * phases // 61
+
+
+class PatternWeights:
+    # The pattern tables of every game phase: tables[phase][pattern] is an array of int16 values, one
+    # for each index of the pattern, and a value is the score times scale.
+
+    def __init__(self, tables, scale=PATTERN_SCALE):
+        self.tables = tables
+        self.phases = len(tables)
+        self.scale = scale
+        # the table of each instance, so that scoring is one lookup per index
+        self.instanceTables = [[phaseTables[pattern] for pattern, squares in PATTERN_INSTANCES]
+                               for phaseTables in tables]
+
+    def score(self, indices, pieces):
+        # The score for the computer of the position with these pattern indices and pieces discs.
+        return sum(map(operator.getitem, self.instanceTables[getGamePhase(pieces, self.phases)], indices)) / self.scale
+
+
+def getDefaultPatternWeights():
+    # The tables used without a weight file, the same for every phase. A table is built one square at a
+    # time: the values so far, then the same values with the square's share of its weight added (the
+    # computer's disc) and subtracted (the player's).
+    tables = []
+    for name, squares in PATTERNS:
+        values = [0]
+        for x, y in squares:
+            weight = SQUARE_WEIGHTS[x][y] * PATTERN_SCALE // len(PATTERN_SQUARE_UPDATES[x * 8 + y])
+            values = values + [value + weight for value in values] + [value - weight for value in values]
+        tables.append(array.array("h", values))
+    return PatternWeights([tables] * PATTERN_PHASES)
+
+
+def writePatternWeights(path, tables, scale=PATTERN_SCALE):
+    # Writes tables (tables[phase][pattern], sequences of PATTERN_SIZES[pattern] integers) as a weight
+    # file. Values are rounded and clipped to int16.
+    with open(path, "wb") as weightsFile:
+        weightsFile.write(PATTERN_HEADER.pack(PATTERN_WEIGHTS_MAGIC, len(tables), scale, len(PATTERNS)))
+        for phaseTables in tables:
+            for pattern, values in enumerate(phaseTables):
+                if len(values) != PATTERN_SIZES[pattern]:
+                    raise ValueError("pattern %s needs %d values" % (PATTERNS[pattern][0], PATTERN_SIZES[pattern]))
+                table = array.array("h", [max(-32768, min(32767, int(round(value)))) for value in values])
+                if sys.byteorder == "big":
+                    table.byteswap()
+                weightsFile.write(table.tobytes())
+
+
+def readPatternWeights(path=PATTERN_WEIGHTS_PATH):
+    # Reads a weight file into PatternWeights. Raises ValueError if it is not one for these PATTERNS.
+    with open(path, "rb") as weightsFile:
+        data = weightsFile.read()
+    if len(data) < PATTERN_HEADER.size:
+        raise ValueError("%s is not a pattern weight file" % path)
+    magic, phases, scale, patterns = PATTERN_HEADER.unpack_from(data, 0)
+    if magic != PATTERN_WEIGHTS_MAGIC or patterns != len(PATTERNS) or phases == 0 or scale == 0 or \
+            len(data) != PATTERN_HEADER.size + phases * sum(PATTERN_SIZES) * 2:
+        raise ValueError("%s is not a pattern weight file" % path)
+    tables = []
+    offset = PATTERN_HEADER.size
+    for phase in range(phases):
+        phaseTables = []
+        for size in PATTERN_SIZES:
+            table = array.array("h")
+            table.frombytes(data[offset:offset + size * 2])
+            if sys.byteorder == "big":
+                table.byteswap()
+            phaseTables.append(table)
+            offset += size * 2
+        tables.append(phaseTables)
+    return PatternWeights(tables, scale)
+
+
+def loadPatternWeights(path=PATTERN_WEIGHTS_PATH):
+    # Reads a weight file and makes the 'pattern' heuristic use it from the next search on. Returns it.
+    global patternWeights
+    patternWeights = readPatternWeights(path)
+    return patternWeights
+
+
+def getPatternWeights():
+    # The weights of the 'pattern' heuristic: the weight file at PATTERN_WEIGHTS_PATH when there is one,
+    # read the first time it is needed, otherwise the default tables.
+    global patternWeights
+    if patternWeights is None:
+        if os.path.exists(PATTERN_WEIGHTS_PATH):
+            patternWeights = readPatternWeights(PATTERN_WEIGHTS_PATH)
+        else:
+            patternWeights = getDefaultPatternWeights()
+    return patternWeights
+
+
+####################################################################################################
+# TUNED WEIGHTS
+# The 'tuned' heuristic weighs the features of stable_adaptive (COMPTIME_FEATURES) with a different set
+# of weights in each game phase, the phase picked by the number of discs on the board as the pattern
+# tables are.  The weights are fitted to recorded games by `othello_tune.py comptime` and read from a
+# JSON weight file, COMPTIME_WEIGHTS_PATH by default, the first time they are needed.  Without a weight
+# file there is one phase with DEFAULT_COMPTIME_WEIGHTS, which makes 'tuned' score as stable_adaptive
+# does with those weights.
+
+COMPTIME_FEATURES = ["coins", "corners", "mobility", "stability", "stableDiscs"]
+DEFAULT_COMPTIME_WEIGHTS = [1, 80, 30, 10, 0]
+COMPTIME_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "othello_comptime.json")
+
+compTimeWeights = None
+
+
+def writeCompTimeWeights(path, phaseWeights):
+    # Writes a list with the weights of each phase, in the order of COMPTIME_FEATURES, as a weight file.
+    phases = len(phaseWeights)
+    data = {"features": COMPTIME_FEATURES, "phases": []}
+    for phase, weights in enumerate(phaseWeights):
+        pieces = [count for count in range(4, 65) if getGamePhase(count, phases) == phase]
+        data["phases"].append({"pieces": [pieces[0], pieces[-1]], "weights": list(weights)})
+    with open(path, "w") as weightsFile:
+        json.dump(data, weightsFile, indent=1)
+
+
+def readCompTimeWeights(path=COMPTIME_WEIGHTS_PATH):
+    # Reads a weight file into a list with the weights of each phase. Raises ValueError if it is not one.
+    with open(path) as weightsFile:
+        try:
+            data = json.load(weightsFile)
+            if data["features"] != COMPTIME_FEATURES or not data["phases"]:
+                raise ValueError()
+            phaseWeights = [[float(weight) for weight in phase["weights"]] for phase in data["phases"]]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("%s is not a compTime weight file" % path)
+    if any(len(weights) != len(COMPTIME_FEATURES) for weights in phaseWeights):
+        raise ValueError("%s is not a compTime weight file" % path)
+    return phaseWeights
+
+
+def loadCompTimeWeights(path=COMPTIME_WEIGHTS_PATH):
+    # Reads a weight file and makes the 'tuned' heuristic use it from the next search on. Returns it.
+    global compTimeWeights
+    compTimeWeights = readCompTimeWeights(path)
+    return compTimeWeights
+
+
+def getCompTimeWeights():
+    # The weights of the 'tuned' heuristic: the weight file at COMPTIME_WEIGHTS_PATH when there is one,
+    # read the first time it is needed, otherwise DEFAULT_COMPTIME_WEIGHTS for the whole game.
+    global compTimeWeights
+    if compTimeWeights is None:
+        if os.path.exists(COMPTIME_WEIGHTS_PATH):
+            compTimeWeights = readCompTimeWeights(COMPTIME_WEIGHTS_PATH)
+        else:
+            compTimeWeights = [DEFAULT_COMPTIME_WEIGHTS]
+    return compTimeWeights
 
 
 # MIN-MAX-SEARCH
-def getMinMaxMove(board, compHeuristic, compTime, depth, abPrune):
-    return getMaxMove(board, depth, compHeuristic, compTime, abPrune, a=MIN_SCORE, b=MAX_SCORE, root=True)
+class SearchTimeout(Exception):
+    # Raised inside the search when searchDeadline has passed.
+    pass
+
+
+def getMinMaxMove(board, compHeuristic, compTime, depth, abPrune, transpositionTable=None, timeLimit=None,
+                  batchEval=False, workers=None, endgameEmpties=None, useBook=True, evalCache=None, pvs=False,
+                  moveOrdering=None, searchStats=None, selectiveSearch=None):
+    # The search itself runs on bitboards, making and undoing moves in place, and scores its leaves with a
+    # LeafEvaluator compiled from compHeuristic and compTime.
+    # Pass the same TranspositionTable for every move of a game to reuse results between moves.
+    # With a timeLimit (in seconds) the search deepens one ply at a time until the time is up and depth
+    # becomes the maximum depth (None or 0 for no limit).
+    # With batchEval the children of the last searched ply are scored together with NumPy.
+    # With workers the root moves are searched in that many worker processes (fixed depth only, and
+    # without the transposition table so that the result is the same as the serial search).
+    # With endgameEmpties squares or fewer left empty the game is solved exactly instead, and the score is
+    # the final disc difference. By default that is as many empties as getEndgameEmptiesForTime expects to
+    # solve within timeLimit; 0 turns the endgame solver off.
+    # Positions in the loaded opening book are answered from the book unless useBook is False.
+    # The evaluator's state (the stability state of a heuristic that weighs stable discs, the pattern
+    # indices of 'pattern') is kept up to date move by move.
+    # Pass the same EvaluationCache for every move of a game to score each leaf position only once (the
+    # batched evaluation and the worker processes do not use it).
+    # With pvs the principal variation search below is used instead, deepening up to depth (a fixed depth
+    # search too) with aspiration windows and the transposition table. It cannot be combined with
+    # batchEval or workers.
+    # Moves are searched in the order of a MoveOrdering (see MOVE ORDERING); pass the same one for every
+    # move of a game to keep its history scores and to read its cutoff statistics. By default a new one
+    # is seeded from the random module.
+    # Pass a SearchStats to read the statistics of the search from it afterwards (see SEARCH STATISTICS).
+    # With a SelectiveSearch the principal variation search (pvs must be set) also uses ProbCut and late
+    # move reductions with its settings (see SELECTIVE SEARCH).
+    if batchEval and np is None:
+        raise ImportError("batchEval needs numpy")
+    if searchStats is None:
+        searchStats = SearchStats()
+    searchStats.newSearch(compHeuristic)
+    start = time.perf_counter()
+    try:
+        return searchMinMaxMove(board, compHeuristic, compTime, depth, abPrune, transpositionTable, timeLimit,
+                                batchEval, workers, endgameEmpties, useBook, evalCache, pvs, moveOrdering,
+                                searchStats, selectiveSearch)
+    finally:
+        searchStats.finishSearch(time.perf_counter() - start)
+
+
+def searchMinMaxMove(board, compHeuristic, compTime, depth, abPrune, transpositionTable, timeLimit, batchEval,
+                     workers, endgameEmpties, useBook, evalCache, pvs, moveOrdering, stats, selective):
+    # getMinMaxMove once its SearchStats is set up.
+    global searchDeadline
+    bitboards = getBitboardsFromBoard(board)
+    if useBook and openingBook is not None:
+        bookMove = getBookMove(bitboards)
+        if bookMove is not None:
+            return bookMove
+    if endgameEmpties is None:
+        endgameEmpties = getEndgameEmptiesForTime(timeLimit)
+    if 64 - countBits(bitboards["X"] | bitboards["O"]) <= endgameEmpties:
+        start = time.monotonic()
+        if timeLimit is not None:
+            searchDeadline = start + timeLimit
+        try:
+            return getEndgameMove(bitboards, stats=stats)
+        except SearchTimeout:
+            if timeLimit is None:
+                # without a time limit only a Ponderer stops a search, and it wants nothing more from it
+                raise
+            # the solve did not finish in time, so the normal search gets what is left
+            timeLimit = max(0, timeLimit - (time.monotonic() - start))
+        finally:
+            searchDeadline = None
+    if pvs and (batchEval or workers is not None):
+        raise ValueError("the principal variation search does not use batchEval or workers")
+    if selective is not None and not pvs:
+        raise ValueError("a selective search needs the principal variation search")
+    if moveOrdering is None:
+        moveOrdering = MoveOrdering(random.getrandbits(32))
+    moveOrdering.newSearch()
+    if workers is not None:
+        if timeLimit is not None:
+            raise ValueError("a parallel search needs a fixed depth, not a timeLimit")
+        return getParallelRootMove(bitboards, compHeuristic, compTime, depth, abPrune, workers, moveOrdering, stats,
+                                   batchEval)
+    if (timeLimit is not None or pvs) and transpositionTable is None:
+        # iterative deepening carries its move ordering from one iteration to the next through the table
+        transpositionTable = TranspositionTable()
+    hashKey = 0
+    if transpositionTable is not None:
+        # the principal variation search stores scores for the side to move, so it needs its own entries,
+        # and the bounds of a selective search are not those of the exact search
+        selectiveKey = None
+        if selective is not None:
+            selectiveKey = selective.getKey()
+        transpositionTable.newSearch((compHeuristic, tuple(compTime), pvs, selectiveKey))
+    if evalCache is not None:
+        evalCache.newSearch((compHeuristic, tuple(compTime)))
+    if transpositionTable is not None or evalCache is not None:
+        hashKey = getZobristHash(bitboards, computerTile)
+    evaluator = LeafEvaluator(compHeuristic, compTime)
+    evalState = evaluator.getState(bitboards)
+    if pvs:
+        return getPVSMove(bitboards, evaluator, moveOrdering, stats, depth, transpositionTable, hashKey, timeLimit,
+                          evalState, evalCache, selective)
+    if timeLimit is not None:
+        return getIterativeDeepeningMove(bitboards, evaluator, moveOrdering, stats, depth, abPrune, transpositionTable,
+                                         hashKey, timeLimit, batchEval, evalState, evalCache)
+    return getMaxMove(bitboards, depth, evaluator, moveOrdering, stats, abPrune, a=MIN_SCORE, b=MAX_SCORE,
+                      root=True, tt=transpositionTable, hashKey=hashKey, batchEval=batchEval, evalState=evalState,
+                      evalCache=evalCache)
+
+
+def getIterativeDeepeningMove(bitboards, evaluator, ordering, stats, maxDepth, abPrune, tt, hashKey, timeLimit,
+                              batchEval=False, evalState=None, evalCache=None):
+    # Searches depth 1, 2, 3... until timeLimit seconds have passed and returns [[x,y], Score] from the
+    # last iteration that finished. Depth 1 always finishes so there is always a move to play.
+    # The principal variation of each iteration is searched first in the next one.
+    global searchDeadline
+    deadline = time.monotonic() + timeLimit
+    emptySquares = 64 - countBits(bitboards["X"] | bitboards["O"])
+    if not maxDepth or maxDepth > emptySquares:
+        maxDepth = emptySquares
+    result = [[], MIN_SCORE]
+    pv = []
+    try:
+        for depth in range(1, maxDepth + 1):
+            result = getMaxMove(bitboards, depth, evaluator, ordering, stats, abPrune, a=MIN_SCORE, b=MAX_SCORE,
+                                root=True, tt=tt, hashKey=hashKey, pv=pv, batchEval=batchEval, evalState=evalState,
+                                evalCache=evalCache)
+            if result[0] == [] or time.monotonic() >= deadline:
+                break
+            pv = getPrincipalVariation(bitboards, tt, hashKey, depth)
+            searchDeadline = deadline
+    except SearchTimeout:
+        # the unfinished iteration is thrown away; whatever it stored in the table is still valid
+        pass
+    finally:
+        searchDeadline = None
+    return result
+
+
+def getPrincipalVariation(bitboards, tt, hashKey, depth, tile=None):
+    # Follows the best moves stored in the transposition table from the root, alternating the computer
+    # and the player the same way the search does, starting with tile (the computer by default). Returns a
+    # list of [x, y] moves.
+    pv = []
+    if tile is None or tile == computerTile:
+        tile, otherTile = computerTile, playerTile
+    else:
+        tile, otherTile = playerTile, computerTile
+    while len(pv) < depth:
+        entry = tt.peek(hashKey)
+        if entry is None or not entry[4]:
+            break
+        x, y = entry[4]
+        childBitboards = makeBitboardMove(bitboards, tile, x, y)
+        if childBitboards is False:
+            break
+        hashKey = getZobristHashAfterMove(hashKey, tile, x, y, bitboards[otherTile] ^ childBitboards[otherTile])
+        pv.append([x, y])
+        bitboards = childBitboards
+        tile, otherTile = otherTile, tile
+    return pv
 
 
 # gets max move decision in MIN_MAX algorithm and returns [[x,y], Score]
 # if no moe is possile returns [[], MIN_SCORE]
-def getMaxMove(board, depth, compHeuristic, compTime, abPrune, a, b, root):
+def getMaxMove(bitboards, depth, evaluator, ordering, stats, abPrune, a, b, root, tt=None, hashKey=0, pv=None,
+               batchEval=False, evalState=None, evalCache=None, ply=0):
     # print("MaxMove depth: ", depth)
     bestScore = MIN_SCORE
     bestMove = []
 
     if depth == 0:
         return [bestMove, bestScore]
-    else:
-        depth -= 1
+
+    if searchDeadline is not None and time.monotonic() > searchDeadline:
+        raise SearchTimeout()
+
+    ttMove = None
+    if tt is not None:
+        entry = tt.probe(hashKey)
+        if entry is not None:
+            ttMove = entry[4]
+            # the root always searches so it can return a move of its own
+            if entry[1] >= depth and root is not True:
+                if entry[3] == TT_EXACT or (entry[3] == TT_LOWER and entry[2] >= b) or (
+                        entry[3] == TT_UPPER and entry[2] <= a):
+                    return [entry[4], entry[2]]
+    startDepth = depth
+    startA = a
+    depth -= 1
+    timed = stats.sampleNode()
 
     # Given a board and the computer"s tile, determine where to
     # move and return that move as a [x, y] list.
-    possibleMoves = getValidMoves(board, computerTile)
+    if timed:
+        timer = stats.startTimer("moveGeneration")
+    moves = getBitboardValidMoves(bitboards[computerTile], bitboards[playerTile])
+    if timed:
+        stats.stopTimer("moveGeneration", timer)
     # print("Max Move Posible Moves: ", possibleMoves)
 
-    # randomize the order of the possible moves
-    random.shuffle(possibleMoves)
-
-    if len(possibleMoves) == 0:
+    if moves == 0:
         return [bestMove, bestScore]
-
-    for x, y in possibleMoves:
-        global ComputerMovesEvaluated
-        ComputerMovesEvaluated += 1
+    moveCount = countBits(moves)
+
+    # the principal variation first, then the best move from the transposition table, then the rest; the
+    # rest are only sorted if neither of the first moves causes a cutoff
+    pvMove = None
+    if pv:
+        pvMove = pv[0]
+    possibleMoves = ordering.iterMoves(moves, computerTile, ply, (pvMove, ttMove), stats if timed else None)
+
+    # when the children are leaves, score them all with one batched call
+    leafScores = None
+    if batchEval and depth == 0:
+        possibleMoves = list(possibleMoves)
+        if timed:
+            timer = stats.startTimer("evaluation")
+        leafScores = getChildScoresBatch(bitboards, computerTile, possibleMoves, evaluator, evalState)
+        if timed:
+            stats.stopTimer("evaluation", timer)
+        stats.leaves += moveCount
+
+    for moveIndex, (x, y) in enumerate(possibleMoves):
+        stats.nodesPerPly[ply + 1] += 1
 
         # print("Max possible Move: ", x, y)
-        dupeBoard = getBoardCopy(board)
-        makeMove(dupeBoard, computerTile, x, y)
-
-        move, score = getMinMove(dupeBoard, depth, compHeuristic, compTime, abPrune, a, b)
+        if timed:
+            timer = stats.startTimer("makeMove")
+        flips = makeMoveWithUndo(None, computerTile, x, y, bitboards)
+        childHashKey = 0
+        if tt is not None or evalCache is not None:
+            childHashKey = getZobristHashAfterMove(hashKey, computerTile, x, y, flips)
+        childState = None
+        if evalState is not None and leafScores is None:
+            childState = evaluator.getStateAfterMove(evalState, bitboards, computerTile, x, y, flips)
+        if timed:
+            stats.stopTimer("makeMove", timer)
+
+        # only the first move can continue the principal variation
+        childPV = None
+        if pv and [x, y] == pv[0]:
+            childPV = pv[1:]
+
+        move, score = getMinMove(bitboards, depth, evaluator, ordering, stats, abPrune, a, b, tt, childHashKey, childPV,
+                                 batchEval, childState, evalCache, ply + 1)
         # getMinMove will return MIN_SCORE if no move is possible
         if score == MAX_SCORE:
             # hybrid between weights and adaptive function:
@@ -461,19 +2156,15 @@ def getMaxMove(board, depth, compHeuristic, compTime, abPrune, a, b, root):
             # else:
             #    score = getAdaptiveHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves))
 
-            if compHeuristic == 'greedy':
-                score = getScoreOfBoard(dupeBoard)[computerTile]
-            elif compHeuristic == 'weighted':
-                score = getWeightedScoreOfBoard(dupeBoard)[computerTile]
-            elif compHeuristic == 'adaptive':
-                score = getAdaptiveHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves), compTime)
-            elif compHeuristic == 'stable_adaptive':
-                score = getAdaptiveHeuristicScoreWithStability(dupeBoard, computerTile, "X", len(possibleMoves),
-                                                               compTime)
-            elif compHeuristic == 'stable_hybrid':
-                score = getHybridHeuristicScoreWithStability(dupeBoard, computerTile, "X", len(possibleMoves), compTime)
+            if leafScores is not None:
+                score = leafScores[moveIndex]
             else:
-                score = getHybridHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves), compTime)
+                if timed:
+                    timer = stats.startTimer("evaluation")
+                score = getCachedLeafScore(evalCache, childHashKey, evaluator, bitboards, moveCount, childState)
+                if timed:
+                    stats.stopTimer("evaluation", timer)
+                stats.leaves += 1
 
             # score = getAdaptiveHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves))
             # print("Max Possible Move and Score: ", x, y, score)
@@ -485,6 +2176,8 @@ def getMaxMove(board, depth, compHeuristic, compTime, abPrune, a, b, root):
                     a = score
                     # print("Max abMinMax: ", (a, b), file=log_file)
 
+        undoMove(None, computerTile, x, y, flips, bitboards)
+
         if score > bestScore:
             bestMove = [x, y]
             bestScore = score
@@ -493,41 +2186,102 @@ def getMaxMove(board, depth, compHeuristic, compTime, abPrune, a, b, root):
         if abPrune is True and root is not True:
             if bestScore >= b:
                 # print("Max: Pruning bestScore, abMinMax", bestScore, (a, b), file=log_file)
+                ordering.storeCutoff(computerTile, ply, bestMove, moveIndex, startDepth)
+                stats.cutoffMoveIndices[moveIndex] += 1
                 break;
 
+    if tt is not None:
+        if bestScore >= b:
+            tt.store(hashKey, startDepth, bestScore, TT_LOWER, bestMove)
+        elif bestScore <= startA:
+            # every move failed low, so none of them is worth trying first next time
+            tt.store(hashKey, startDepth, bestScore, TT_UPPER, None)
+        else:
+            tt.store(hashKey, startDepth, bestScore, TT_EXACT, bestMove)
+
     # print("Max: Best Move and Score: ", bestMove, bestScore)
     return [bestMove, bestScore]
 
 
-def getMinMove(board, depth, compHeuristic, compTime, abPrune, a, b):
+def getMinMove(bitboards, depth, evaluator, ordering, stats, abPrune, a, b, tt=None, hashKey=0, pv=None,
+               batchEval=False, evalState=None, evalCache=None, ply=0):
     bestScore = MAX_SCORE
     bestMove = []
 
     # print("MinMove depth: ", depth)
     if depth == 0:
         return [bestMove, bestScore]
-    else:
-        depth -= 1
+
+    if searchDeadline is not None and time.monotonic() > searchDeadline:
+        raise SearchTimeout()
+
+    ttMove = None
+    if tt is not None:
+        entry = tt.probe(hashKey)
+        if entry is not None:
+            ttMove = entry[4]
+            if entry[1] >= depth:
+                if entry[3] == TT_EXACT or (entry[3] == TT_LOWER and entry[2] >= b) or (
+                        entry[3] == TT_UPPER and entry[2] <= a):
+                    return [entry[4], entry[2]]
+    startDepth = depth
+    startB = b
+    depth -= 1
+    timed = stats.sampleNode()
 
     # Given a board and the computer"s tile, determine where to
     # move and return that move as a [x, y] list.
-    possibleMoves = getValidMoves(board, playerTile)
+    if timed:
+        timer = stats.startTimer("moveGeneration")
+    moves = getBitboardValidMoves(bitboards[playerTile], bitboards[computerTile])
+    if timed:
+        stats.stopTimer("moveGeneration", timer)
     # print("Min Move Posible Moves: ", possibleMoves)
 
-    # randomize the order of the possible moves
-    random.shuffle(possibleMoves)
-
-    if len(possibleMoves) == 0:
+    if moves == 0:
         return [bestMove, MAX_SCORE]
-
-    for x, y in possibleMoves:
-        global ComputerMovesEvaluated
-        ComputerMovesEvaluated += 1
-        dupeBoard = getBoardCopy(board)
-        makeMove(dupeBoard, playerTile, x, y)
+    moveCount = countBits(moves)
+
+    # the principal variation first, then the best move from the transposition table, then the rest; the
+    # rest are only sorted if neither of the first moves causes a cutoff
+    pvMove = None
+    if pv:
+        pvMove = pv[0]
+    possibleMoves = ordering.iterMoves(moves, playerTile, ply, (pvMove, ttMove), stats if timed else None)
+
+    # when the children are leaves, score them all with one batched call
+    leafScores = None
+    if batchEval and depth == 0:
+        possibleMoves = list(possibleMoves)
+        if timed:
+            timer = stats.startTimer("evaluation")
+        leafScores = getChildScoresBatch(bitboards, playerTile, possibleMoves, evaluator, evalState)
+        if timed:
+            stats.stopTimer("evaluation", timer)
+        stats.leaves += moveCount
+
+    for moveIndex, (x, y) in enumerate(possibleMoves):
+        stats.nodesPerPly[ply + 1] += 1
+        if timed:
+            timer = stats.startTimer("makeMove")
+        flips = makeMoveWithUndo(None, playerTile, x, y, bitboards)
+        childHashKey = 0
+        if tt is not None or evalCache is not None:
+            childHashKey = getZobristHashAfterMove(hashKey, playerTile, x, y, flips)
+        childState = None
+        if evalState is not None and leafScores is None:
+            childState = evaluator.getStateAfterMove(evalState, bitboards, playerTile, x, y, flips)
+        if timed:
+            stats.stopTimer("makeMove", timer)
         # print("Min Possible Move: ", x, y)
 
-        move, score = getMaxMove(dupeBoard, depth, compHeuristic, compTime, abPrune, a, b, root=False)
+        childPV = None
+        if pv and [x, y] == pv[0]:
+            childPV = pv[1:]
+
+        move, score = getMaxMove(bitboards, depth, evaluator, ordering, stats, abPrune, a, b, root=False, tt=tt,
+                                 hashKey=childHashKey, pv=childPV, batchEval=batchEval, evalState=childState,
+                                 evalCache=evalCache, ply=ply + 1)
 
         # if Max's score is less than Min Max Value update Min's max value
         if abPrune is True and score != MIN_SCORE:
@@ -543,18 +2297,21 @@ def getMinMove(board, depth, compHeuristic, compTime, abPrune, a, b):
             # else:
             #    score = getAdaptiveHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves))
 
-            if compHeuristic == 'greedy':
-                score = getScoreOfBoard(dupeBoard)[computerTile]
-            elif compHeuristic == 'weighted':
-                score = getWeightedScoreOfBoard(dupeBoard)[computerTile]
-            elif compHeuristic == 'adaptive':
-                score = getAdaptiveHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves), compTime)
+            if leafScores is not None:
+                score = leafScores[moveIndex]
             else:
-                score = getHybridHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves), compTime)
+                if timed:
+                    timer = stats.startTimer("evaluation")
+                score = getCachedLeafScore(evalCache, childHashKey, evaluator, bitboards, moveCount, childState)
+                if timed:
+                    stats.stopTimer("evaluation", timer)
+                stats.leaves += 1
 
             # score = getAdaptiveHeuristicScore(dupeBoard, computerTile, "X", len(possibleMoves))
             # print("Min Possible Move and score : ", x, y, score)
 
+        undoMove(None, playerTile, x, y, flips, bitboards)
+
         if score < bestScore:
             bestMove = [x, y]
             bestScore = score
@@ -562,13 +2319,1255 @@ def getMinMove(board, depth, compHeuristic, compTime, abPrune, a, b):
         if abPrune is True:
             if bestScore <= a:
                 # print("Min: Pruning bestScore, abMinMax", bestScore, (a, b), file=log_file)
+                ordering.storeCutoff(playerTile, ply, bestMove, moveIndex, startDepth)
+                stats.cutoffMoveIndices[moveIndex] += 1
                 break;
 
+    if tt is not None:
+        if bestScore <= a:
+            tt.store(hashKey, startDepth, bestScore, TT_UPPER, bestMove)
+        elif bestScore >= startB:
+            tt.store(hashKey, startDepth, bestScore, TT_LOWER, None)
+        else:
+            tt.store(hashKey, startDepth, bestScore, TT_EXACT, bestMove)
+
     # print("Min: Best Move and Score: ", bestMove, bestScore)
     return [bestMove, bestScore]
 
 
-def othello_human_play(compHeuristic, compTime, depth, abPrune):
+####################################################################################################
+# PRINCIPAL VARIATION SEARCH
+# A negamax form of the search: every score is from the point of view of the side to move, so one
+# function searches for both tiles.  The first move of a node is searched with the full window and the
+# others with a null window that only asks whether they beat the best score so far; a move that does
+# is searched again with the full window.  A tile with no moves passes and the other tile moves again;
+# a position is only scored before the depth runs out when neither tile can move.  Leaves are scored
+# with the same evaluator and move count one ply up as in getMaxMove/getMinMove, so the best score is
+# the same as theirs as long as nobody has to pass within the search depth.
+# getPVSMove deepens one ply at a time and starts every iteration after the first with an aspiration
+# window of ASPIRATION_WINDOW around an earlier score, widening it when the score falls outside.  The
+# mobility term makes scores swing between odd and even depths, so the window is centred on the score
+# from two plies less when there is one.
+
+ASPIRATION_WINDOW = 10
+
+
+def getNullWindow(alpha):
+    # The smallest beta above alpha, so that (alpha, beta) is a null window for integer and float scores.
+    return math.nextafter(alpha, math.inf)
+
+
+def getPVSMove(bitboards, evaluator, ordering, stats, maxDepth, tt, hashKey, timeLimit=None, evalState=None,
+               evalCache=None, selective=None):
+    # Returns [[x,y], Score] like getMaxMove after searching depth 1, 2, ... maxDepth, or until timeLimit
+    # seconds have passed when there is one (maxDepth None or 0 for no limit then). selective is a
+    # SelectiveSearch or None for the exact search.
+    global searchDeadline
+    result = [[], MIN_SCORE]
+    if not hasBitboardMove(bitboards[computerTile], bitboards[playerTile]):
+        return result
+    emptySquares = 64 - countBits(bitboards["X"] | bitboards["O"])
+    if timeLimit is None:
+        if not maxDepth:
+            return result
+        deadline = None
+    else:
+        deadline = time.monotonic() + timeLimit
+        if not maxDepth:
+            maxDepth = emptySquares
+    maxDepth = min(maxDepth, emptySquares)
+    scores = []
+    try:
+        for depth in range(1, maxDepth + 1):
+            delta = ASPIRATION_WINDOW
+            alpha, beta = -math.inf, math.inf
+            if depth > 1:
+                center = scores[-1]
+                if depth > 2:
+                    center = scores[-2]
+                alpha, beta = center - delta, center + delta
+            while True:
+                move, score = getPVSScore(bitboards, computerTile, depth, alpha, beta, evaluator, ordering, stats, 0,
+                                          root=True, tt=tt, hashKey=hashKey, evalState=evalState,
+                                          evalCache=evalCache, selective=selective)
+                if score <= alpha:
+                    alpha = score - delta
+                elif score >= beta:
+                    beta = score + delta
+                else:
+                    break
+                delta *= 2
+            result = [move, score]
+            scores.append(score)
+            if deadline is not None:
+                if time.monotonic() >= deadline:
+                    break
+                searchDeadline = deadline
+    except SearchTimeout:
+        # the unfinished iteration is thrown away
+        pass
+    finally:
+        searchDeadline = None
+    return result
+
+
+def getPVSScore(bitboards, tile, depth, alpha, beta, evaluator, ordering, stats, computerMobilityValue, root=False,
+                tt=None, hashKey=0, evalState=None, evalCache=None, ply=0, selective=None):
+    # Returns [[x,y], Score] for tile to move, with Score from tile's point of view and the move [] when
+    # tile passes. computerMobilityValue is the number of moves one ply up, which a leaf is scored with.
+    # selective is a SelectiveSearch, or None to search every move to the full depth.
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    timed = stats.sampleNode()
+    if depth == 0:
+        return [[], getPVSLeafScore(bitboards, tile, evaluator, stats, timed, computerMobilityValue, hashKey,
+                                    evalState, evalCache)]
+
+    if searchDeadline is not None and time.monotonic() > searchDeadline:
+        raise SearchTimeout()
+
+    ttMove = None
+    if tt is not None:
+        entry = tt.probe(hashKey)
+        if entry is not None:
+            ttMove = entry[4]
+            # the root always searches so it can return a move of its own
+            if entry[1] >= depth and not root:
+                if entry[3] == TT_EXACT or (entry[3] == TT_LOWER and entry[2] >= beta) or (
+                        entry[3] == TT_UPPER and entry[2] <= alpha):
+                    return [entry[4], entry[2]]
+
+    if selective is not None and not root and depth in selective.probCut:
+        score = getProbCutScore(bitboards, tile, depth, alpha, beta, evaluator, ordering, stats,
+                                computerMobilityValue, tt, hashKey, evalState, evalCache, ply, selective)
+        if score is not None:
+            return [[], score]
+
+    if timed:
+        timer = stats.startTimer("moveGeneration")
+    moves = getBitboardValidMoves(bitboards[tile], bitboards[otherTile])
+    if timed:
+        stats.stopTimer("moveGeneration", timer)
+    if moves == 0:
+        if not hasBitboardMove(bitboards[otherTile], bitboards[tile]):
+            # the game is over
+            return [[], getPVSLeafScore(bitboards, tile, evaluator, stats, timed, computerMobilityValue, hashKey,
+                                        evalState, evalCache)]
+        move, score = getPVSScore(bitboards, otherTile, depth, -beta, -alpha, evaluator, ordering, stats, 0, tt=tt,
+                                  hashKey=hashKey ^ ZOBRIST_SIDE_KEY, evalState=evalState, evalCache=evalCache,
+                                  ply=ply + 1, selective=selective)
+        return [[], -score]
+
+    moveCount = countBits(moves)
+    possibleMoves = ordering.iterMoves(moves, tile, ply, (ttMove,), stats if timed else None)
+
+    startAlpha = alpha
+    bestMove = []
+    bestScore = -math.inf
+    for moveIndex, (x, y) in enumerate(possibleMoves):
+        stats.nodesPerPly[ply + 1] += 1
+        if timed:
+            timer = stats.startTimer("makeMove")
+        flips = makeMoveWithUndo(None, tile, x, y, bitboards)
+        childHashKey = 0
+        if tt is not None or evalCache is not None:
+            childHashKey = getZobristHashAfterMove(hashKey, tile, x, y, flips)
+        childState = None
+        if evalState is not None:
+            childState = evaluator.getStateAfterMove(evalState, bitboards, tile, x, y, flips)
+        if timed:
+            stats.stopTimer("makeMove", timer)
+        if moveIndex == 0:
+            move, score = getPVSScore(bitboards, otherTile, depth - 1, -beta, -alpha, evaluator, ordering, stats,
+                                      moveCount, tt=tt, hashKey=childHashKey, evalState=childState,
+                                      evalCache=evalCache, ply=ply + 1, selective=selective)
+            score = -score
+        else:
+            childDepth = depth - 1
+            if selective is not None and selective.isReduced(depth, moveIndex):
+                childDepth -= selective.lmrReduction
+            move, score = getPVSScore(bitboards, otherTile, childDepth, -getNullWindow(alpha), -alpha, evaluator,
+                                      ordering, stats, moveCount, tt=tt, hashKey=childHashKey,
+                                      evalState=childState, evalCache=evalCache, ply=ply + 1, selective=selective)
+            score = -score
+            if childDepth < depth - 1 and score > alpha:
+                # the reduced search beat alpha, so the move gets its full depth after all
+                selective.researches += 1
+                move, score = getPVSScore(bitboards, otherTile, depth - 1, -getNullWindow(alpha), -alpha, evaluator,
+                                          ordering, stats, moveCount, tt=tt, hashKey=childHashKey,
+                                          evalState=childState, evalCache=evalCache, ply=ply + 1,
+                                          selective=selective)
+                score = -score
+            # a leaf's score is exact whatever the window, anything else is searched again if it beat alpha
+            if alpha < score < beta and depth > 1:
+                move, score = getPVSScore(bitboards, otherTile, depth - 1, -beta, -alpha, evaluator, ordering, stats,
+                                          moveCount, tt=tt, hashKey=childHashKey, evalState=childState,
+                                          evalCache=evalCache, ply=ply + 1, selective=selective)
+                score = -score
+        undoMove(None, tile, x, y, flips, bitboards)
+
+        if score > bestScore:
+            bestMove = [x, y]
+            bestScore = score
+        if score > alpha:
+            alpha = score
+        if alpha >= beta:
+            ordering.storeCutoff(tile, ply, bestMove, moveIndex, depth)
+            stats.cutoffMoveIndices[moveIndex] += 1
+            break
+
+    if tt is not None:
+        if bestScore >= beta:
+            tt.store(hashKey, depth, bestScore, TT_LOWER, bestMove)
+        elif bestScore <= startAlpha:
+            tt.store(hashKey, depth, bestScore, TT_UPPER, None)
+        else:
+            tt.store(hashKey, depth, bestScore, TT_EXACT, bestMove)
+    return [bestMove, bestScore]
+
+
+def getPVSLeafScore(bitboards, tile, evaluator, stats, timed, computerMobilityValue, hashKey, evalState, evalCache):
+    # The evaluator's score of a leaf from the point of view of tile. timed is True to time the evaluation.
+    if timed:
+        timer = stats.startTimer("evaluation")
+    score = getCachedLeafScore(evalCache, hashKey, evaluator, bitboards, computerMobilityValue, evalState)
+    if timed:
+        stats.stopTimer("evaluation", timer)
+    stats.leaves += 1
+    if tile == computerTile:
+        return score
+    return -score
+
+
+####################################################################################################
+# SELECTIVE SEARCH
+# Two options of the principal variation search that give up its exact result to search deeper in the
+# same time, calibrated for a heuristic from self-play positions by othello_selective.py:
+#   ProbCut: a node at a calibrated depth is first searched PROBCUT_DEPTH_REDUCTION plies less deep (the
+#            same parity, as the mobility term makes scores swing between odd and even depths), and its
+#            deep score is predicted as slope * shallow score + intercept.  When the prediction is more
+#            than threshold standard errors (sigma) above beta, or below alpha, the node is cut without
+#            the deep search.  The shallow search only has to tell with a null window whether its score
+#            is beyond the bound that makes that so.  The line is fitted for each game phase (by the
+#            number of discs, as the pattern tables are), since the hybrid heuristics change their scale
+#            at a number of discs and a search that reaches it predicts badly from one that does not.
+#   late move reductions: the moves from lmrMoveIndex on in the move order of a node at least
+#            LMR_MIN_DEPTH plies from the leaves, which seldom cause a cutoff when the ordering is good,
+#            are searched lmrReduction plies less deep with a null window, and to the full depth only
+#            when that beats alpha.
+# The transposition table keeps the scores of a selective search apart from those of the exact search.
+
+PROBCUT_DEPTH_REDUCTION = 2
+PROBCUT_THRESHOLD = 2.0  # standard errors the predicted deep score must be beyond the window
+LMR_MIN_DEPTH = 3
+LMR_REDUCTION = 1
+DEFAULT_LMR_MOVE_INDEX = 4
+SELECTIVE_SEARCH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "othello_selective.json")
+
+
+class SelectiveSearch:
+    # The settings of a selective search, and counters of what the searches that used it did.  probCut
+    # maps a depth to a list with the [slope, intercept, sigma] of the prediction of a search to that
+    # depth in each phase, or None for a phase without ProbCut; other depths are searched without it, and
+    # an lmrMoveIndex of None turns the reductions off.
+    # compHeuristic and compTime record what it was calibrated for.
+
+    def __init__(self, probCut=None, threshold=PROBCUT_THRESHOLD, lmrMoveIndex=DEFAULT_LMR_MOVE_INDEX,
+                 lmrReduction=LMR_REDUCTION, compHeuristic=None, compTime=None):
+        self.probCut = dict(probCut or {})
+        for depth, fits in self.probCut.items():
+            if not fits:
+                raise ValueError("no ProbCut phases at depth %d" % depth)
+            for fit in fits:
+                if depth <= PROBCUT_DEPTH_REDUCTION or (fit is not None and (len(fit) != 3 or fit[0] <= 0)):
+                    raise ValueError("no ProbCut at depth %d with %r" % (depth, fit))
+        if lmrMoveIndex is not None and lmrMoveIndex < 1:
+            raise ValueError("the first move of a node is never reduced")
+        self.threshold = threshold
+        self.lmrMoveIndex = lmrMoveIndex
+        self.lmrReduction = lmrReduction
+        self.compHeuristic = compHeuristic
+        self.compTime = compTime
+        self.probCutTries = 0
+        self.probCuts = 0
+        self.reductions = 0
+        self.researches = 0
+
+    def isReduced(self, depth, moveIndex):
+        # True if the move at moveIndex of a node searched to depth is searched less deep first.
+        if self.lmrMoveIndex is None or depth < LMR_MIN_DEPTH or moveIndex < self.lmrMoveIndex:
+            return False
+        self.reductions += 1
+        return True
+
+    def getKey(self):
+        # The settings the scores of a search depend on, to tell its transposition table entries apart.
+        probCut = tuple(sorted((depth, tuple(fit and tuple(fit) for fit in fits))
+                               for depth, fits in self.probCut.items()))
+        return (probCut, self.threshold, self.lmrMoveIndex, self.lmrReduction)
+
+    def getStats(self):
+        # Returns a dictionary with the counters and the fractions of ProbCut tries that cut the node and of
+        # reduced moves that had to be searched again.
+        return {"probCutTries": self.probCutTries, "probCuts": self.probCuts,
+                "probCutRate": self.probCuts / self.probCutTries if self.probCutTries else 0.0,
+                "reductions": self.reductions, "researches": self.researches,
+                "researchRate": self.researches / self.reductions if self.reductions else 0.0}
+
+
+def getProbCutScore(bitboards, tile, depth, alpha, beta, evaluator, ordering, stats, computerMobilityValue, tt,
+                    hashKey, evalState, evalCache, ply, selective):
+    # Returns the score getPVSScore cuts the node with, beta or alpha, or None when the shallow search does
+    # not predict the deep score to be outside the window (alpha, beta).
+    fits = selective.probCut[depth]
+    fit = fits[getGamePhase(countBits(bitboards["X"] | bitboards["O"]), len(fits))]
+    if fit is None:
+        return None
+    slope, intercept, sigma = fit
+    margin = selective.threshold * sigma
+    shallowDepth = depth - PROBCUT_DEPTH_REDUCTION
+    selective.probCutTries += 1
+    if beta < math.inf:
+        # the shallow score from which on the deep score is expected to be at least beta
+        bound = (beta + margin - intercept) / slope
+        move, score = getPVSScore(bitboards, tile, shallowDepth, math.nextafter(bound, -math.inf), bound, evaluator,
+                                  ordering, stats, computerMobilityValue, tt=tt, hashKey=hashKey,
+                                  evalState=evalState, evalCache=evalCache, ply=ply, selective=selective)
+        if score >= bound:
+            selective.probCuts += 1
+            return beta
+    if alpha > -math.inf:
+        bound = (alpha - margin - intercept) / slope
+        move, score = getPVSScore(bitboards, tile, shallowDepth, bound, getNullWindow(bound), evaluator, ordering,
+                                  stats, computerMobilityValue, tt=tt, hashKey=hashKey, evalState=evalState,
+                                  evalCache=evalCache, ply=ply, selective=selective)
+        if score <= bound:
+            selective.probCuts += 1
+            return alpha
+    return None
+
+
+def writeSelectiveSearch(path, selective):
+    # Writes the settings of a SelectiveSearch as a JSON calibration file.
+    data = {"heuristic": selective.compHeuristic, "compTime": selective.compTime,
+            "threshold": selective.threshold, "lmrMoveIndex": selective.lmrMoveIndex,
+            "lmrReduction": selective.lmrReduction,
+            "probCut": {str(depth): fits for depth, fits in sorted(selective.probCut.items())}}
+    with open(path, "w") as selectiveFile:
+        json.dump(data, selectiveFile, indent=1)
+
+
+def readSelectiveSearch(path=SELECTIVE_SEARCH_PATH):
+    # Reads a calibration file into a SelectiveSearch. Raises ValueError if it is not one.
+    with open(path) as selectiveFile:
+        try:
+            data = json.load(selectiveFile)
+            probCut = {}
+            for depth, fits in data["probCut"].items():
+                probCut[int(depth)] = [fit and [float(value) for value in fit] for fit in fits]
+            return SelectiveSearch(probCut, float(data["threshold"]), data["lmrMoveIndex"], int(data["lmrReduction"]),
+                                   data.get("heuristic"), data.get("compTime"))
+        except (KeyError, TypeError, AttributeError, ValueError):
+            raise ValueError("%s is not a selective search file" % path)
+
+
+####################################################################################################
+# MULTI-PV ANALYSIS
+# Scores for several root moves from one search instead of one search per move.  getMultiPVMoves
+# deepens one ply at a time with the principal variation search, sharing the transposition table, the
+# evaluation cache and the move ordering between all the root moves, and starts every iteration with the
+# best moves of the one before.  Until count moves have exact scores every root move is searched with
+# the full window; after that a move is first searched with a null window at the count-th best score so
+# far and only searched again with the full window when it beats it, so the moves that cannot make the
+# list cost about as much as they do in a normal search.  The principal variation of each move is read
+# from the transposition table right after the move is searched.
+
+def getMultiPVMoves(board, compHeuristic, compTime, depth, count=None, transpositionTable=None, timeLimit=None,
+                    evalCache=None, moveOrdering=None, searchStats=None):
+    # Returns a list of [[x,y], Score, pv] for the count best moves of the computer, or for all of them when
+    # count is None, best first. Score is the score the principal variation search gives the move at depth
+    # (the same as getMinMaxMove(..., pvs=True) for the best move) and pv the moves expected to follow it,
+    # starting with the move itself. With a timeLimit the list of the last finished iteration is returned
+    # (depth None or 0 for no depth limit then).
+    # The other arguments are those of getMinMaxMove; a transpositionTable passed to both is shared by them.
+    # Returns [] if the computer has no move.
+    global searchDeadline
+    if count is not None and count < 1:
+        raise ValueError("count must be at least 1")
+    if searchStats is None:
+        searchStats = SearchStats()
+    searchStats.newSearch(compHeuristic)
+    start = time.perf_counter()
+    bitboards = getBitboardsFromBoard(board)
+    moves = getBitboardValidMoves(bitboards[computerTile], bitboards[playerTile])
+    if moves == 0 or (not depth and timeLimit is None):
+        searchStats.finishSearch(time.perf_counter() - start)
+        return []
+    if transpositionTable is None:
+        transpositionTable = TranspositionTable()
+    transpositionTable.newSearch((compHeuristic, tuple(compTime), True, None))
+    if evalCache is not None:
+        evalCache.newSearch((compHeuristic, tuple(compTime)))
+    if moveOrdering is None:
+        moveOrdering = MoveOrdering(random.getrandbits(32))
+    moveOrdering.newSearch()
+    hashKey = getZobristHash(bitboards, computerTile)
+    evaluator = LeafEvaluator(compHeuristic, compTime)
+    evalState = evaluator.getState(bitboards)
+    rootMoves = moveOrdering.orderMoves(getMovesFromBitboard(moves), computerTile, 0)
+    emptySquares = 64 - countBits(bitboards["X"] | bitboards["O"])
+    if not depth or depth > emptySquares:
+        depth = emptySquares
+    deadline = None
+    if timeLimit is not None:
+        deadline = time.monotonic() + timeLimit
+    results = []
+    try:
+        for iterationDepth in range(1, depth + 1):
+            results, rootMoves = searchMultiPV(bitboards, evaluator, moveOrdering, searchStats, iterationDepth,
+                                               rootMoves, count, transpositionTable, hashKey, evalState, evalCache)
+            if deadline is not None:
+                if time.monotonic() >= deadline:
+                    break
+                searchDeadline = deadline
+    except SearchTimeout:
+        # the unfinished iteration is thrown away
+        pass
+    finally:
+        searchDeadline = None
+        searchStats.finishSearch(time.perf_counter() - start)
+    return results
+
+
+def searchMultiPV(bitboards, evaluator, ordering, stats, depth, rootMoves, count, tt, hashKey, evalState,
+                  evalCache):
+    # One iteration of getMultiPVMoves: searches rootMoves in order to depth and returns [results, order],
+    # the [[x,y], Score, pv] of the count best moves (all of them when count is None) and every root move
+    # sorted by its score or, for the moves that did not make the list, by the bound on it.
+    moveCount = len(rootMoves)
+    exactMoves = []
+    boundMoves = []
+    for moveIndex, (x, y) in enumerate(rootMoves):
+        stats.nodesPerPly[1] += 1
+        flips = makeMoveWithUndo(None, computerTile, x, y, bitboards)
+        childHashKey = getZobristHashAfterMove(hashKey, computerTile, x, y, flips)
+        childState = None
+        if evalState is not None:
+            childState = evaluator.getStateAfterMove(evalState, bitboards, computerTile, x, y, flips)
+        alpha = -math.inf
+        if count is not None and len(exactMoves) >= count:
+            alpha = exactMoves[count - 1][1]
+            move, score = getPVSScore(bitboards, playerTile, depth - 1, -getNullWindow(alpha), -alpha, evaluator,
+                                      ordering, stats, moveCount, tt=tt, hashKey=childHashKey, evalState=childState,
+                                      evalCache=evalCache, ply=1)
+            score = -score
+        if alpha == -math.inf or (score > alpha and depth > 1):
+            move, score = getPVSScore(bitboards, playerTile, depth - 1, -math.inf, -alpha, evaluator, ordering,
+                                      stats, moveCount, tt=tt, hashKey=childHashKey, evalState=childState,
+                                      evalCache=evalCache, ply=1)
+            score = -score
+        if score > alpha:
+            pv = [[x, y]] + getPrincipalVariation(bitboards, tt, childHashKey, depth - 1, playerTile)
+            # after the moves with a higher score, and after those with the same score searched before it
+            position = 0
+            while position < len(exactMoves) and exactMoves[position][1] >= score:
+                position += 1
+            exactMoves.insert(position, [[x, y], score, pv])
+            if count is not None and len(exactMoves) > count:
+                droppedMove = exactMoves.pop()
+                boundMoves.append([droppedMove[0], droppedMove[1]])
+        else:
+            boundMoves.append([[x, y], score])
+        undoMove(None, computerTile, x, y, flips, bitboards)
+    boundMoves.sort(key=lambda boundMove: boundMove[1], reverse=True)
+    return [exactMoves, [exactMove[0] for exactMove in exactMoves] + [boundMove[0] for boundMove in boundMoves]]
+
+
+####################################################################################################
+# ENDGAME SOLVER
+# Near the end of the game the heuristics are replaced by an exact search to the last move.  It is a
+# negamax alpha-beta search on bitboards: scores are the final disc difference (pieces of the side to
+# move minus the other side's) with best play from both sides.  Moves are ordered fastest-first (fewest
+# replies for the opponent) and by parity (empty squares in a quadrant with an odd number of empties
+# first).  The last few empty squares are tried directly instead of generating moves.
+
+ENDGAME_EMPTIES = 12  # solve exactly when this many squares or fewer are empty and there is no timeLimit
+ENDGAME_LAST_SQUARES = 4  # with this many empties or fewer the empty squares are tried one by one
+ENDGAME_FASTEST_FIRST = 7  # with more empties than this, moves are ordered by the opponent's mobility
+ENDGAME_TT_EMPTIES = 7  # positions with at least this many empties are kept in the endgame table
+# Rough cost of a solve, used to pick the number of empties that fits a time budget: the seconds an
+# exact solve takes at ENDGAME_EMPTIES, and how much longer each extra empty square makes it.
+ENDGAME_SECONDS = 0.5
+ENDGAME_GROWTH = 3.0
+
+QUADRANT_BITBOARDS = [0x0F0F0F0F, 0xF0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000]
+
+endgameTable = None
+
+
+def getEndgameEmptiesForTime(timeLimit):
+    # Returns the largest number of empty squares an exact solve is expected to finish in within timeLimit
+    # seconds, or ENDGAME_EMPTIES when there is no time limit.
+    if timeLimit is None:
+        return ENDGAME_EMPTIES
+    empties = ENDGAME_EMPTIES
+    seconds = ENDGAME_SECONDS
+    while seconds * ENDGAME_GROWTH <= timeLimit:
+        seconds *= ENDGAME_GROWTH
+        empties += 1
+    while seconds > timeLimit and empties > 0:
+        seconds /= ENDGAME_GROWTH
+        empties -= 1
+    return empties
+
+
+def getEndgameTable():
+    # The endgame keeps its own transposition table: exact disc differences never mix with heuristic scores.
+    global endgameTable
+    if endgameTable is None:
+        endgameTable = TranspositionTable(2 ** 16)
+    return endgameTable
+
+
+def getParitySquares(empty):
+    # Returns the empty squares as a list, those in quadrants with an odd number of empties first.
+    odd = []
+    even = []
+    for quadrant in QUADRANT_BITBOARDS:
+        squares = empty & quadrant
+        if countBits(squares) % 2 == 1:
+            target = odd
+        else:
+            target = even
+        while squares:
+            lowBit = squares & -squares
+            target.append(lowBit.bit_length() - 1)
+            squares ^= lowBit
+    return odd + even
+
+
+def solveLastSquare(own, opponent, square):
+    # The final disc difference when only square is empty: own plays it if it can, otherwise the opponent does.
+    flips = getBitboardFlips(own, opponent, square)
+    if flips:
+        flipped = countBits(flips)
+        return countBits(own) - countBits(opponent) + 2 * flipped + 1
+    flips = getBitboardFlips(opponent, own, square)
+    if flips:
+        flipped = countBits(flips)
+        return countBits(own) - countBits(opponent) - 2 * flipped - 1
+    return countBits(own) - countBits(opponent)
+
+
+def solveLastSquares(own, opponent, alpha, beta, empty, stats, passed=False):
+    # Solves positions with two or more (but only a few) empty squares by trying each of them, without move
+    # generation or the table.
+    bestScore = -65
+    emptyCount = countBits(empty)
+    for square in getParitySquares(empty):
+        flips = getBitboardFlips(own, opponent, square)
+        if flips == 0:
+            continue
+        stats.endgameNodes += 1
+        move = 1 << square
+        if emptyCount == 2:
+            score = -solveLastSquare(opponent ^ flips, own | flips | move, (empty ^ move).bit_length() - 1)
+        else:
+            score = -solveLastSquares(opponent ^ flips, own | flips | move, -beta, -alpha, empty ^ move, stats)
+        if score > bestScore:
+            bestScore = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    if bestScore == -65:
+        # no move: pass, unless the opponent just passed and the game is over
+        if passed:
+            return countBits(own) - countBits(opponent)
+        return -solveLastSquares(opponent, own, -beta, -alpha, empty, stats, True)
+    return bestScore
+
+
+def getEndgameMoveOrder(own, opponent, moves, emptyCount):
+    # Yields [square, flips] for every move in the bitboard moves, in the order they should be searched.
+    # Ordered by parity alone, the flips of a move are only worked out when it is its turn, so nothing is
+    # done for the moves after a cutoff.
+    paritySquares = getParitySquares(moves)
+    if emptyCount <= ENDGAME_FASTEST_FIRST:
+        for square in paritySquares:
+            yield [square, getBitboardFlips(own, opponent, square)]
+        return
+    # fastest first: every move's flips are needed to count the opponent's replies
+    orderedMoves = []
+    for rank, square in enumerate(paritySquares):
+        flips = getBitboardFlips(own, opponent, square)
+        replies = getBitboardValidMoves(opponent ^ flips, own | flips | (1 << square))
+        orderedMoves.append([countBits(replies) * 64 + rank, square, flips])
+    orderedMoves.sort()
+    for key, square, flips in orderedMoves:
+        yield [square, flips]
+
+
+def solveEndgame(own, opponent, alpha, beta, tile, hashKey, stats, passed=False):
+    # Returns the final disc difference for own (to move, playing tile) with best play, within alpha and beta:
+    # a score <= alpha is only an upper bound and a score >= beta only a lower bound. The nodes are counted
+    # in stats.endgameNodes.
+    if searchDeadline is not None and time.monotonic() > searchDeadline:
+        raise SearchTimeout()
+    empty = ~(own | opponent) & FULL_BITBOARD
+    emptyCount = countBits(empty)
+    if emptyCount == 0:
+        return countBits(own) - countBits(opponent)
+    if emptyCount == 1:
+        return solveLastSquare(own, opponent, empty.bit_length() - 1)
+    if emptyCount <= ENDGAME_LAST_SQUARES:
+        return solveLastSquares(own, opponent, alpha, beta, empty, stats, passed)
+
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    moves = getBitboardValidMoves(own, opponent)
+    if moves == 0:
+        if passed:
+            return countBits(own) - countBits(opponent)
+        return -solveEndgame(opponent, own, -beta, -alpha, otherTile, hashKey ^ ZOBRIST_SIDE_KEY, stats, True)
+
+    table = None
+    startAlpha = alpha
+    if emptyCount >= ENDGAME_TT_EMPTIES:
+        table = getEndgameTable()
+        entry = table.probe(hashKey)
+        if entry is not None:
+            if entry[3] == TT_EXACT:
+                return entry[2]
+            if entry[3] == TT_LOWER and entry[2] > alpha:
+                alpha = entry[2]
+            elif entry[3] == TT_UPPER and entry[2] < beta:
+                beta = entry[2]
+            if alpha >= beta:
+                return entry[2]
+
+    bestScore = -65
+    bestMove = None
+    for square, flips in getEndgameMoveOrder(own, opponent, moves, emptyCount):
+        stats.endgameNodes += 1
+        x, y = square >> 3, square & 7
+        score = -solveEndgame(opponent ^ flips, own | flips | (1 << square), -beta, -alpha, otherTile,
+                              getZobristHashAfterMove(hashKey, tile, x, y, flips), stats)
+        if score > bestScore:
+            bestScore = score
+            bestMove = [x, y]
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+
+    if table is not None:
+        if bestScore >= beta:
+            table.store(hashKey, emptyCount, bestScore, TT_LOWER, bestMove)
+        elif bestScore <= startAlpha:
+            table.store(hashKey, emptyCount, bestScore, TT_UPPER, None)
+        else:
+            table.store(hashKey, emptyCount, bestScore, TT_EXACT, bestMove)
+    return bestScore
+
+
+def getEndgameMove(bitboards, exact=True, stats=None):
+    # Solves the position for the computer and returns [[x,y], Score] where Score is the final disc difference
+    # (computer minus player) with best play. With exact=False only win/draw/loss is solved, which is faster,
+    # and only the sign of Score is meaningful. Returns [[], MIN_SCORE] if the computer has no move.
+    # The nodes are counted in stats, a SearchStats, if given.
+    if stats is None:
+        stats = SearchStats()
+    own = bitboards[computerTile]
+    opponent = bitboards[playerTile]
+    moves = getBitboardValidMoves(own, opponent)
+    if moves == 0:
+        return [[], MIN_SCORE]
+    getEndgameTable().newSearch("endgame")
+    hashKey = getZobristHash(bitboards, computerTile)
+    emptyCount = countBits(~(own | opponent) & FULL_BITBOARD)
+    if exact:
+        alpha, beta = -65, 65
+    else:
+        alpha, beta = -1, 1
+    bestScore = -65
+    bestMove = []
+    for square, flips in getEndgameMoveOrder(own, opponent, moves, emptyCount):
+        x, y = square >> 3, square & 7
+        score = -solveEndgame(opponent ^ flips, own | flips | (1 << square), -beta, -alpha, playerTile,
+                              getZobristHashAfterMove(hashKey, computerTile, x, y, flips), stats)
+        if score > bestScore:
+            bestScore = score
+            bestMove = [x, y]
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return [bestMove, bestScore]
+
+
+####################################################################################################
+# PARALLEL ROOT SEARCH
+# The root moves are handed out in order to a pool of worker processes, each of which searches one
+# move with the same getMinMove as the serial search.  The best score found so far (alpha) lives in
+# shared memory so later root moves are searched with the tighter bound and still get pruned.
+
+searchPools = {}
+sharedRootAlpha = None
+
+
+def initSearchWorker(rootAlpha):
+    # Runs once in every worker process.
+    global sharedRootAlpha
+    sharedRootAlpha = rootAlpha
+
+
+def getSearchPool(workers):
+    # Returns a pool of worker processes, started the first time and kept for the following searches.
+    global sharedRootAlpha
+    if sharedRootAlpha is None:
+        sharedRootAlpha = multiprocessing.Value("d", MIN_SCORE)
+    if workers not in searchPools:
+        searchPools[workers] = multiprocessing.Pool(workers, initializer=initSearchWorker,
+                                                    initargs=(sharedRootAlpha,))
+    return searchPools[workers]
+
+
+def closeSearchPools():
+    for pool in searchPools.values():
+        pool.terminate()
+        pool.join()
+    searchPools.clear()
+
+
+def searchRootMove(task):
+    # Runs in a worker process and searches one root move. alpha is None to use the shared bound.
+    # Returns [score, exact, stats]: exact is False when the score is only an upper bound because the
+    # move failed low against alpha, and stats is the SearchStats of the worker's search.
+    xbits, obits, x, y, depth, compHeuristic, compTime, abPrune, batchEval, seed, computerMobilityValue, alpha = task
+    ordering = MoveOrdering(seed)
+    stats = SearchStats()
+    stats.nodesPerPly[1] = 1
+    if alpha is None:
+        alpha = MIN_SCORE
+        if abPrune is True:
+            alpha = sharedRootAlpha.value
+    bitboards = {"X": xbits, "O": obits}
+    makeMoveWithUndo(None, computerTile, x, y, bitboards)
+    evaluator = LeafEvaluator(compHeuristic, compTime)
+    evalState = evaluator.getState(bitboards)
+    move, score = getMinMove(bitboards, depth - 1, evaluator, ordering, stats, abPrune, alpha, MAX_SCORE,
+                             batchEval=batchEval, evalState=evalState, ply=1)
+    if score == MAX_SCORE:
+        stats.leaves += 1
+        return [evaluator.score(bitboards, computerMobilityValue, evalState), True, stats]
+    if abPrune is True:
+        # like the serial root, only searched (not leaf) scores raise alpha
+        with sharedRootAlpha.get_lock():
+            if score > sharedRootAlpha.value:
+                sharedRootAlpha.value = score
+    return [score, score > alpha or alpha == MIN_SCORE, stats]
+
+
+def getParallelRootMove(bitboards, compHeuristic, compTime, depth, abPrune, workers, ordering, stats,
+                        batchEval=False):
+    # Searches every root move in the worker pool and returns [[x,y], Score] like getMaxMove. For ties the
+    # first move in the root order of ordering wins, as in the serial search. Each worker orders the moves
+    # below the root with a MoveOrdering of its own, and its SearchStats are added to stats.
+    possibleMoves = getMovesFromBitboard(getBitboardValidMoves(bitboards[computerTile], bitboards[playerTile]))
+    if depth == 0 or len(possibleMoves) == 0:
+        return [[], MIN_SCORE]
+    possibleMoves = ordering.orderMoves(possibleMoves, computerTile, 0)
+    pool = getSearchPool(workers)
+    sharedRootAlpha.value = MIN_SCORE
+    seed = ordering.random.getrandbits(32)
+    tasks = [[bitboards["X"], bitboards["O"], x, y, depth, compHeuristic, compTime, abPrune, batchEval, seed,
+              len(possibleMoves), None] for x, y in possibleMoves]
+    results = pool.map(searchRootMove, tasks, chunksize=1)
+    for score, exact, workerStats in results:
+        stats.add(workerStats)
+    bestScore = max(score for score, exact, workerStats in results)
+    for i, (score, exact, workerStats) in enumerate(results):
+        if score != bestScore:
+            continue
+        if not exact:
+            # the move failed low against a bound found by a later move, so it may only tie
+            tasks[i][-1] = MIN_SCORE
+            score, exact, workerStats = pool.apply(searchRootMove, (tasks[i],))
+            stats.add(workerStats)
+        if score == bestScore:
+            return [possibleMoves[i], bestScore]
+    return [[], MIN_SCORE]
+
+
+def getParallelSpeedups(board, compHeuristic, compTime, depth, abPrune, workerCounts=(1, 2, 4, 8, 16), seed=0):
+    # Times the same search with each number of workers and prints the speedup over the serial search.
+    # Returns a dictionary {workers: [seconds, speedup]}.
+    random.seed(seed)
+    start = time.perf_counter()
+    serialResult = getMinMaxMove(board, compHeuristic, compTime, depth, abPrune)
+    serialTime = time.perf_counter() - start
+    print("serial: %.3fs %s" % (serialTime, serialResult))
+    speedups = {}
+    for workers in workerCounts:
+        getSearchPool(workers)  # start the processes outside the timing
+        random.seed(seed)
+        start = time.perf_counter()
+        result = getMinMaxMove(board, compHeuristic, compTime, depth, abPrune, workers=workers)
+        elapsed = time.perf_counter() - start
+        speedups[workers] = [elapsed, serialTime / elapsed]
+        print("%2d workers: %.3fs speedup %.2f %s" % (workers, elapsed, serialTime / elapsed, result))
+    return speedups
+
+
+####################################################################################################
+# ENGINE VS ENGINE
+# Games between two search configurations, with no terminal I/O. An engine is a dictionary with the
+# getMinMaxMove settings: "heuristic", "compTime" and "depth", and optionally "abPrune" (default True),
+# "timeLimit" (default None), "endgameEmpties" (default from the time limit), "useBook" (default True)
+# "ttSize" (default DEFAULT_TT_SIZE, 0 for no transposition table), "evalCacheSize" (default 0, no
+# evaluation cache), "pvs" (default False, the principal variation search) and "selective" (default None,
+# a SelectiveSearch for the principal variation search).
+
+def getBoardWithTilesSwapped(board):
+    # Returns a copy of the board with every X turned into an O and every O into an X.
+    swap = {"X": "O", "O": "X", " ": " "}
+    return [[swap[tile] for tile in row] for row in board]
+
+
+def getEngineMove(board, tile, engine, transpositionTable=None, evalCache=None, moveOrdering=None,
+                  searchStats=None):
+    # Returns the [x, y] move the engine plays for tile, or [] if it has no move.
+    # The search always plays computerTile, so the other tile searches a board with the tiles swapped.
+    if tile != computerTile:
+        board = getBoardWithTilesSwapped(board)
+    move, score = getMinMaxMove(board, engine["heuristic"], engine["compTime"], engine["depth"],
+                                engine.get("abPrune", True), transpositionTable, engine.get("timeLimit"),
+                                endgameEmpties=engine.get("endgameEmpties"), useBook=engine.get("useBook", True),
+                                evalCache=evalCache, pvs=engine.get("pvs", False), moveOrdering=moveOrdering,
+                                searchStats=searchStats, selectiveSearch=engine.get("selective"))
+    return move
+
+
+def playEngineGame(engines, openingMoves=0, seed=None):
+    # Plays a whole game between engines["X"] and engines["O"]; O moves first, as in othello_human_play.
+    # The first openingMoves moves are random. seed makes the opening and the search's tie-breaking
+    # repeatable. Returns a dictionary with the final "scores", the "winner" ("X", "O" or "tie"), the
+    # "moves" played as [tile, x, y] lists, the seconds each engine spent on each of its "moveTimes", the
+    # "nodes" each engine searched in the whole game and the "firstMoveCutoffRate" of each engine's move
+    # ordering.
+    openingRandom = random.Random(seed)
+    if seed is not None:
+        random.seed(seed)
+    board = getNewBoard()
+    resetBoard(board)
+    tables = {}
+    caches = {}
+    orderings = {}
+    for tile in ["X", "O"]:
+        tables[tile] = None
+        if engines[tile].get("ttSize", DEFAULT_TT_SIZE):
+            tables[tile] = TranspositionTable(engines[tile].get("ttSize", DEFAULT_TT_SIZE))
+        caches[tile] = None
+        if engines[tile].get("evalCacheSize"):
+            caches[tile] = EvaluationCache(engines[tile]["evalCacheSize"])
+        orderings[tile] = MoveOrdering(random.getrandbits(32))
+    moves = []
+    moveTimes = {"X": [], "O": []}
+    nodes = {"X": 0, "O": 0}
+    searchStats = SearchStats()
+    tile, otherTile = "O", "X"
+    while True:
+        possibleMoves = getValidMoves(board, tile)
+        if possibleMoves == []:
+            if getValidMoves(board, otherTile) == []:
+                break
+            tile, otherTile = otherTile, tile
+            continue
+        if len(moves) < openingMoves:
+            x, y = openingRandom.choice(possibleMoves)
+        else:
+            start = time.perf_counter()
+            x, y = getEngineMove(board, tile, engines[tile], tables[tile], caches[tile], orderings[tile],
+                                 searchStats)
+            moveTimes[tile].append(time.perf_counter() - start)
+            nodes[tile] += searchStats.getNodes()
+        makeMove(board, tile, x, y)
+        moves.append([tile, x, y])
+        tile, otherTile = otherTile, tile
+    scores = getScoreOfBoard(board)
+    if scores["X"] > scores["O"]:
+        winner = "X"
+    elif scores["O"] > scores["X"]:
+        winner = "O"
+    else:
+        winner = "tie"
+    firstMoveCutoffRate = {}
+    for tile in ["X", "O"]:
+        firstMoveCutoffRate[tile] = orderings[tile].getStats()["firstMoveCutoffRate"]
+    return {"scores": scores, "winner": winner, "moves": moves, "moveTimes": moveTimes, "nodes": nodes,
+            "firstMoveCutoffRate": firstMoveCutoffRate}
+
+
+####################################################################################################
+# GAME ARCHIVE
+# Engine games are stored in append-only files for tuning and analysis.  A file is GAME_ARCHIVE_MAGIC
+# followed by chunks, and a chunk is a GAME_CHUNK_HEADER (the number of games and the size of the rest
+# of the chunk), a table of the engine specs ("heuristic:compTime:depth") its games use, and the games.
+# A game is a GAME_RECORD (the X and O engines as indices into the table, the seed and the number of
+# moves) followed by one byte per move: the square x * 8 + y, or GAME_PASS when the tile to move had to
+# pass.  O moves first, so the tile of each move follows from the passes.  Games are written a chunk at a
+# time, so a chunk cut short by a crash is just dropped when the file is opened for appending again, and
+# the reader only ever holds one chunk in memory.
+# The text notation writes a move as the column letter and the row number ("f5d6c3"); passes are left
+# out, as the position tells when there was one.
+
+GAME_ARCHIVE_MAGIC = b"OTHGAME1"
+GAME_CHUNK_HEADER = struct.Struct("<II")  # games in the chunk, bytes after this header
+GAME_ENGINE_COUNT = struct.Struct("<H")  # engine specs in the chunk's table, each a length byte and text
+GAME_RECORD = struct.Struct("<HHQB")  # X engine, O engine, seed, number of move bytes
+GAME_PASS = 64
+GAME_NO_SEED = 2 ** 64 - 1  # the seed of a game that was played without one
+GAME_ARCHIVE_CHUNK_GAMES = 4096  # games buffered before a chunk is written
+NOTATION_COLUMNS = "abcdefgh"
+
+
+def getEngineSpec(engine):
+    # Returns "heuristic:compTime:depth" for an engine dictionary (its "name" if it has one).
+    if isinstance(engine, str):
+        return engine
+    if "name" in engine:
+        return engine["name"]
+    return "%s:%s:%s" % (engine["heuristic"], ",".join(str(weight) for weight in engine["compTime"]),
+                         engine["depth"])
+
+
+def getGameMoveBytes(moves):
+    # Encodes moves, a list of [tile, x, y] as returned by playEngineGame, as one byte per move with a
+    # GAME_PASS before every move played by the same tile as the move before it.
+    moveBytes = bytearray()
+    tile = "O"
+    for moveTile, x, y in moves:
+        if moveTile != tile:
+            moveBytes.append(GAME_PASS)
+        moveBytes.append(x * 8 + y)
+        tile = "X" if moveTile == "O" else "O"
+    return bytes(moveBytes)
+
+
+def getGameMovesFromBytes(moveBytes):
+    # The reverse of getGameMoveBytes.
+    moves = []
+    tile = "O"
+    for square in moveBytes:
+        if square != GAME_PASS:
+            moves.append([tile, square >> 3, square & 7])
+        tile = "X" if tile == "O" else "O"
+    return moves
+
+
+def getGameNotation(moves):
+    # Returns moves, a list of [tile, x, y], in text notation ("f5d6c3").
+    return "".join(NOTATION_COLUMNS[y] + str(x + 1) for tile, x, y in moves)
+
+
+def getMovesFromNotation(notation):
+    # Returns the [tile, x, y] moves of a game in text notation, replaying it from the start to find
+    # out whose move each one is. Raises ValueError at the first move that is not valid.
+    notation = notation.strip().lower()
+    if len(notation) % 2:
+        raise ValueError("%r is not a list of moves" % notation)
+    board = getNewBoard()
+    resetBoard(board)
+    bitboards = getBitboardsFromBoard(board)
+    moves = []
+    tile, otherTile = "O", "X"
+    for i in range(0, len(notation), 2):
+        if notation[i] not in NOTATION_COLUMNS or notation[i + 1] not in "12345678":
+            raise ValueError("%r is not a move" % notation[i:i + 2])
+        x, y = int(notation[i + 1]) - 1, NOTATION_COLUMNS.index(notation[i])
+        if not hasBitboardMove(bitboards[tile], bitboards[otherTile]):
+            tile, otherTile = otherTile, tile
+        childBitboards = makeBitboardMove(bitboards, tile, x, y)
+        if childBitboards is False:
+            raise ValueError("%s is not a valid move for %s after %r" % (notation[i:i + 2], tile, notation[:i]))
+        moves.append([tile, x, y])
+        bitboards = childBitboards
+        tile, otherTile = otherTile, tile
+    return moves
+
+
+class GameArchiveWriter:
+    # Appends games to an archive file (creating it if needed). Games are buffered and written chunkGames
+    # at a time, and the rest when the writer is flushed or closed.
+
+    def __init__(self, path, chunkGames=GAME_ARCHIVE_CHUNK_GAMES):
+        self.path = path
+        self.chunkGames = chunkGames
+        self.games = []
+        self.archiveFile = open(path, "ab+")
+        try:
+            self.archiveFile.truncate(getGameArchiveLength(self.archiveFile))
+            self.archiveFile.seek(0, os.SEEK_END)
+            if self.archiveFile.tell() == 0:
+                self.archiveFile.write(GAME_ARCHIVE_MAGIC)
+        except BaseException:
+            # not an archive (or not writable), so the writer is never returned to be closed
+            self.archiveFile.close()
+            raise
+
+    def addGame(self, engines, seed, moves):
+        # engines is {"X": engine, "O": engine} with engine dictionaries or specs, seed the game's seed (or
+        # None) and moves the [tile, x, y] moves as returned by playEngineGame.
+        self.games.append([getEngineSpec(engines["X"]), getEngineSpec(engines["O"]), seed,
+                           getGameMoveBytes(moves)])
+        if len(self.games) >= self.chunkGames:
+            self.flush()
+
+    def flush(self):
+        if self.games == []:
+            return
+        specs = {}
+        for xSpec, oSpec, seed, moveBytes in self.games:
+            specs.setdefault(xSpec, len(specs))
+            specs.setdefault(oSpec, len(specs))
+        body = bytearray(GAME_ENGINE_COUNT.pack(len(specs)))
+        for spec in specs:
+            encoded = spec.encode()
+            if len(encoded) > 255:
+                raise ValueError("engine spec %r is too long for the archive" % spec)
+            body.append(len(encoded))
+            body += encoded
+        for xSpec, oSpec, seed, moveBytes in self.games:
+            if seed is None:
+                seed = GAME_NO_SEED
+            else:
+                seed %= GAME_NO_SEED
+            body += GAME_RECORD.pack(specs[xSpec], specs[oSpec], seed, len(moveBytes))
+            body += moveBytes
+        self.archiveFile.write(GAME_CHUNK_HEADER.pack(len(self.games), len(body)) + body)
+        self.archiveFile.flush()
+        self.games = []
+
+    def close(self):
+        self.flush()
+        self.archiveFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def getGameArchiveLength(archiveFile):
+    # Returns the length of the whole chunks at the start of an open archive file, skipping from chunk
+    # header to chunk header. Raises ValueError if the file is not an archive.
+    archiveFile.seek(0, os.SEEK_END)
+    fileLength = archiveFile.tell()
+    if fileLength == 0:
+        return 0
+    archiveFile.seek(0)
+    if archiveFile.read(len(GAME_ARCHIVE_MAGIC)) != GAME_ARCHIVE_MAGIC:
+        raise ValueError("%s is not a game archive" % archiveFile.name)
+    length = len(GAME_ARCHIVE_MAGIC)
+    while length + GAME_CHUNK_HEADER.size <= fileLength:
+        archiveFile.seek(length)
+        games, bodyLength = GAME_CHUNK_HEADER.unpack(archiveFile.read(GAME_CHUNK_HEADER.size))
+        if length + GAME_CHUNK_HEADER.size + bodyLength > fileLength:
+            break
+        length += GAME_CHUNK_HEADER.size + bodyLength
+    return length
+
+
+def readGameArchive(path):
+    # Yields the games of an archive one at a time as dictionaries with the "engines" ({"X": spec,
+    # "O": spec}), the "seed" (None if there was none) and the [tile, x, y] "moves". Only one chunk is
+    # read at a time, and an unfinished chunk at the end of the file is ignored.
+    with open(path, "rb") as archiveFile:
+        if archiveFile.read(len(GAME_ARCHIVE_MAGIC)) != GAME_ARCHIVE_MAGIC:
+            raise ValueError("%s is not a game archive" % path)
+        while True:
+            header = archiveFile.read(GAME_CHUNK_HEADER.size)
+            if len(header) < GAME_CHUNK_HEADER.size:
+                return
+            games, bodyLength = GAME_CHUNK_HEADER.unpack(header)
+            body = archiveFile.read(bodyLength)
+            if len(body) < bodyLength:
+                return
+            offset = GAME_ENGINE_COUNT.size
+            specs = []
+            for i in range(GAME_ENGINE_COUNT.unpack_from(body, 0)[0]):
+                specs.append(body[offset + 1:offset + 1 + body[offset]].decode())
+                offset += 1 + body[offset]
+            for i in range(games):
+                xEngine, oEngine, seed, moveCount = GAME_RECORD.unpack_from(body, offset)
+                offset += GAME_RECORD.size
+                if seed == GAME_NO_SEED:
+                    seed = None
+                yield {"engines": {"X": specs[xEngine], "O": specs[oEngine]}, "seed": seed,
+                       "moves": getGameMovesFromBytes(body[offset:offset + moveCount])}
+                offset += moveCount
+
+
+def readArchivePositions(path):
+    # Replays the games of an archive and yields [game, bitboards, tile, [x, y]] for every move: the
+    # position before the move, the tile that played it and the move. The bitboards are a new dictionary
+    # each time, so they can be kept.
+    for game in readGameArchive(path):
+        board = getNewBoard()
+        resetBoard(board)
+        bitboards = getBitboardsFromBoard(board)
+        for tile, x, y in game["moves"]:
+            yield [game, bitboards, tile, [x, y]]
+            bitboards = makeBitboardMove(bitboards, tile, x, y)
+
+
+####################################################################################################
+# PONDERING
+# While the player thinks about a move, the computer searches the positions after the player's replies
+# in a background thread, so that its own move is often ready as soon as the player has moved.  The
+# reply the last search expected (the best move stored in the transposition table for the position) is
+# searched first, then the others in move ordering order.  Each reply gets exactly the search the
+# computer would make after it, so a result that is ready is played as it is; when the player plays the
+# reply being searched, the computer waits for that search to finish and stops pondering the others.
+# Any other move stops the pondering and the computer searches as usual; whatever the stopped searches
+# stored in the transposition table is still valid and makes that search faster.
+# A search is stopped by keeping searchDeadline in the past until the thread has finished, as it only
+# searches while the main thread waits for the player.
+
+class Ponderer:
+    # Ponders with the getMinMaxMove settings of the computer. The transposition table, evaluation cache
+    # and move ordering are shared with the computer's own searches, which never run at the same time.
+
+    def __init__(self, compHeuristic, compTime, depth, abPrune, transpositionTable=None, timeLimit=None,
+                 evalCache=None, pvs=False, moveOrdering=None):
+        self.compHeuristic = compHeuristic
+        self.compTime = compTime
+        self.depth = depth
+        self.abPrune = abPrune
+        self.transpositionTable = transpositionTable
+        self.timeLimit = timeLimit
+        self.evalCache = evalCache
+        self.pvs = pvs
+        if moveOrdering is None:
+            moveOrdering = MoveOrdering(random.getrandbits(32))
+        self.moveOrdering = moveOrdering
+        self.lock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.key = None
+        self.results = {}
+        self.current = None
+        self.target = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, board):
+        # Starts pondering the player's replies on board (the player to move). Does nothing if the replies
+        # of this board are already being pondered.
+        key = getBoardKey(board)
+        if self.thread is not None and self.key == key:
+            return
+        self.stop()
+        self.key = key
+        self.results = {}
+        self.current = None
+        self.target = None
+        self.stopEvent.clear()
+        replies = getValidMoves(board, playerTile)
+        if replies == []:
+            return
+        predictedMove = None
+        if self.transpositionTable is not None:
+            entry = self.transpositionTable.peek(getZobristHash(getBitboardsFromBoard(board), playerTile))
+            if entry is not None:
+                predictedMove = entry[4]
+        replies = self.moveOrdering.orderMoves(replies, playerTile, 1, (predictedMove,))
+        self.thread = threading.Thread(target=self.ponder, args=(getBoardCopy(board), replies), daemon=True)
+        self.thread.start()
+
+    def ponder(self, board, replies):
+        # Runs in the background thread and searches the position after each reply until stopped.
+        for x, y in replies:
+            childBoard = getBoardCopy(board)
+            makeMove(childBoard, playerTile, x, y)
+            key = getBoardKey(childBoard)
+            with self.lock:
+                if self.stopEvent.is_set() or self.target is not None:
+                    return
+                self.current = key
+            try:
+                result = getMinMaxMove(childBoard, self.compHeuristic, self.compTime, self.depth, self.abPrune,
+                                       self.transpositionTable, self.timeLimit, evalCache=self.evalCache,
+                                       pvs=self.pvs, moveOrdering=self.moveOrdering)
+            except SearchTimeout:
+                return
+            with self.lock:
+                self.current = None
+                if self.stopEvent.is_set():
+                    return
+                self.results[key] = result
+                if self.target == key:
+                    return
+
+    def getMove(self, board):
+        # Returns the computer's [[x,y], Score] for board (the computer to move) if it was pondered, waiting
+        # for the search if it is still running, or None after stopping the pondering.
+        if self.thread is None:
+            return None
+        key = getBoardKey(board)
+        with self.lock:
+            if key in self.results:
+                result = self.results[key]
+            elif key == self.current:
+                self.target = key
+                result = None
+            else:
+                result = False
+        if result is None:
+            self.thread.join()
+            result = self.results.get(key)
+        self.stop()
+        self.results = {}
+        if result:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return result or None
+
+    def stop(self):
+        # Stops the background search, if there is one, and waits for the thread to finish.
+        global searchDeadline
+        if self.thread is None:
+            return
+        self.stopEvent.set()
+        while self.thread.is_alive():
+            # the search sets searchDeadline itself between iterations, so keep it in the past
+            searchDeadline = -math.inf
+            self.thread.join(0.01)
+        searchDeadline = None
+        self.thread = None
+        self.key = None
+
+    def getStats(self):
+        # Returns a dictionary with how often the computer's move was ready (or being searched) when the
+        # player moved.
+        moves = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hitRate": self.hits / moves if moves else 0.0}
+
+
+def getBoardKey(board):
+    # A hashable copy of the board.
+    return tuple(tuple(column) for column in board)
+
+
+def othello_human_play(compHeuristic, compTime, depth, abPrune, ttSize=DEFAULT_TT_SIZE, timeLimit=None,
+                       evalCacheSize=0, pvs=False, ponder=False):
     print("\n--WELCOME TO OTHELLO--")
     print("----------------------\n")
 
@@ -587,6 +3586,25 @@ def othello_human_play(compHeuristic, compTime, depth, abPrune):
         # Show possible moves for the user
         showHints = False
 
+        # Search results are remembered between the computer's moves (ttSize=0 turns this off)
+        transpositionTable = None
+        if ttSize:
+            transpositionTable = TranspositionTable(ttSize)
+        # and so are leaf scores when evalCacheSize is set
+        evalCache = None
+        if evalCacheSize:
+            evalCache = EvaluationCache(evalCacheSize)
+        # the move ordering keeps its history scores for the whole game
+        moveOrdering = MoveOrdering(random.getrandbits(32))
+        # the statistics of every search of the game are added up
+        searchStats = SearchStats()
+        gameStats = SearchStats()
+        # with ponder the computer searches while the player thinks
+        ponderer = None
+        if ponder:
+            ponderer = Ponderer(compHeuristic, compTime, depth, abPrune, transpositionTable, timeLimit, evalCache,
+                                pvs, moveOrdering)
+
         # turn = whoGoesFirst()
         turn = "computer"
         print("The " + turn + " will move first.")
@@ -603,12 +3621,16 @@ def othello_human_play(compHeuristic, compTime, depth, abPrune):
                     drawBoard(mainBoard)
 
                 showPoints(playerTile, computerTile, mainBoard)
+                if ponderer is not None:
+                    ponderer.start(mainBoard)
                 # input("Input your move and press Enter to see the players's move.\n\n")
                 move = getPlayerMove(mainBoard, playerTile)
                 # move = getPlayerMove(mainBoard, playerTile, playerHeuristic, playerTime)
 
                 if move == "quit":
                     print("Thank you for playing!")
+                    if ponderer is not None:
+                        ponderer.stop()
                     sys.exit()  # terminate the program
                 elif move == "hints":
                     showHints = not showHints
@@ -635,7 +3657,18 @@ def othello_human_play(compHeuristic, compTime, depth, abPrune):
                 # move, score =  getComputerMove(mainBoard, computerTile)
                 # print("Computer move was: ", move, score)
                 # move, score = getMinMaxMove(mainBoard, compHeuristic, compTime, depth)
-                move, score = getMinMaxMove(mainBoard, compHeuristic, compTime, depth, abPrune)
+                start = time.monotonic()
+                result = None
+                if ponderer is not None:
+                    result = ponderer.getMove(mainBoard)
+                if result is None:
+                    result = getMinMaxMove(mainBoard, compHeuristic, compTime, depth, abPrune, transpositionTable,
+                                           timeLimit, evalCache=evalCache, pvs=pvs, moveOrdering=moveOrdering,
+                                           searchStats=searchStats)
+                    gameStats.add(searchStats)
+                move, score = result
+                if ponderer is not None:
+                    print("Computer answered in %.2fs" % (time.monotonic() - start))
                 # print("Min Max move was: ", move, score)
                 if score != MIN_SCORE:
                     makeMove(mainBoard, computerTile, move[0], move[1])
@@ -654,7 +3687,14 @@ def othello_human_play(compHeuristic, compTime, depth, abPrune):
                 else:
                     break
 
+        if ponderer is not None:
+            ponderer.stop()
         print("Computer Moves: ", nComputerMoves)
+        print("Cutoffs on the first move searched: %.1f%%" % (100 * moveOrdering.getStats()["firstMoveCutoffRate"]))
+        stats = gameStats.getStats()
+        print("Nodes searched: %d (%.0f per second)" % (stats["nodes"], stats["nodesPerSecond"]))
+        if ponderer is not None:
+            print("Moves ready from pondering: %d of %d" % (ponderer.hits, ponderer.hits + ponderer.misses))
         # Display the final score.
         drawBoard(mainBoard)
         scores = getScoreOfBoard(mainBoard)
@@ -681,6 +3721,7 @@ def othello_human_play(compHeuristic, compTime, depth, abPrune):
     return 0
 
 
-othello_human_play('stable_hybrid', [1, 80, 30, 10, 50], 5, abPrune=True)
+if __name__ == "__main__":
+    othello_human_play('stable_hybrid', [1, 80, 30, 10, 50], 5, abPrune=True)
 
 
@@ -0,0 +1,145 @@
+# Othello opening book builder
+# Writes the memory-mapped opening book that getMinMaxMove reads (othello_book.bin next to the game by
+# default). Positions are keyed by their canonical hash, so the 8 symmetric copies of a position share
+# one record. There are two ways to fill the book:
+#   search:   every position up to --plies moves from the start is searched deeply, and the best move
+#             is stored with its score.
+#   selfplay: engine games with random openings are played, and for every position in the first --plies
+#             moves the move with the best average final disc difference (over at least --min-games
+#             games) is stored, weighted by how often it was played.
+# --max-positions bounds the size of the file, keeping the positions closest to the start of the game.
+#
+# Examples:
+#   python build_opening_book.py search --plies 6 --depth 6 --workers 8
+#   python build_opening_book.py selfplay --games 20000 --plies 12 --opening-moves 10 --workers 8
+
+import argparse
+import multiprocessing
+
+import AI_playable_version_of_othello as othello
+from othello_tournament import parseEngine
+
+
+def getNormalizedBitboards(bitboards, tile):
+    # The book only holds positions with computerTile to move; the other side's positions are swapped.
+    if tile == othello.computerTile:
+        return bitboards
+    return {"X": bitboards["O"], "O": bitboards["X"]}
+
+
+def getOpeningPositions(plies):
+    # Returns [bitboards, plies] for every position (up to symmetry) reachable in plies moves or fewer,
+    # with the bitboards normalized so that computerTile is to move.
+    board = othello.getNewBoard()
+    othello.resetBoard(board)
+    frontier = [[othello.getBitboardsFromBoard(board), "O"]]
+    seen = set()
+    positions = []
+    for ply in range(plies + 1):
+        nextFrontier = []
+        for bitboards, tile in frontier:
+            normalized = getNormalizedBitboards(bitboards, tile)
+            hashKey, symmetry = othello.getCanonicalHash(normalized)
+            if hashKey in seen:
+                continue
+            seen.add(hashKey)
+            otherTile = "X" if tile == "O" else "O"
+            moves = othello.getMovesFromBitboard(othello.getBitboardValidMoves(bitboards[tile], bitboards[otherTile]))
+            if moves == []:
+                continue
+            positions.append([normalized, ply])
+            if ply < plies:
+                for x, y in moves:
+                    nextFrontier.append([othello.makeBitboardMove(bitboards, tile, x, y), otherTile])
+        frontier = nextFrontier
+    return positions
+
+
+def searchBookPosition(task):
+    # Runs in a worker process. Returns the book entry for one position.
+    bitboards, plies, engine = task
+    board = othello.getBoardFromBitboards(bitboards)
+    move, score = othello.getMinMaxMove(board, engine["heuristic"], engine["compTime"], engine["depth"], True,
+                                        othello.TranspositionTable(), engine.get("timeLimit"), endgameEmpties=0,
+                                        useBook=False)
+    hashKey, symmetry = othello.getCanonicalHash(bitboards)
+    return [hashKey, othello.SYMMETRY_SQUARES[symmetry][move[0] * 8 + move[1]], score, 1, plies]
+
+
+def getSearchEntries(plies, engine, workers):
+    tasks = [[bitboards, ply, engine] for bitboards, ply in getOpeningPositions(plies)]
+    print("searching %d positions" % len(tasks))
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(searchBookPosition, tasks, chunksize=1)
+
+
+def playBookGame(task):
+    # Runs in a worker process and returns the moves and final scores of one self-play game.
+    engine, openingMoves, seed = task
+    result = othello.playEngineGame({"X": engine, "O": engine}, openingMoves, seed)
+    return [result["moves"], result["scores"]]
+
+
+def getSelfPlayEntries(games, plies, engine, openingMoves, minGames, workers, seed=0):
+    # statistics[hashKey][square] is [games, total final disc difference for the side that moved, plies]
+    statistics = {}
+    tasks = [[engine, openingMoves, seed + game] for game in range(games)]
+    with multiprocessing.Pool(workers) as pool:
+        for moves, scores in pool.imap_unordered(playBookGame, tasks, chunksize=4):
+            board = othello.getNewBoard()
+            othello.resetBoard(board)
+            bitboards = othello.getBitboardsFromBoard(board)
+            for ply, (tile, x, y) in enumerate(moves[:plies]):
+                otherTile = "X" if tile == "O" else "O"
+                hashKey, symmetry = othello.getCanonicalHash(getNormalizedBitboards(bitboards, tile))
+                square = othello.SYMMETRY_SQUARES[symmetry][x * 8 + y]
+                moveStatistics = statistics.setdefault(hashKey, {}).setdefault(square, [0, 0, ply])
+                moveStatistics[0] += 1
+                moveStatistics[1] += scores[tile] - scores[otherTile]
+                bitboards = othello.makeBitboardMove(bitboards, tile, x, y)
+    entries = []
+    for hashKey, moveStatistics in statistics.items():
+        best = None
+        for square, (played, total, ply) in moveStatistics.items():
+            if played >= minGames and (best is None or total / played > best[2]):
+                best = [hashKey, square, total / played, played, ply]
+        if best is not None:
+            entries.append(best)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Othello opening book.")
+    parser.add_argument("mode", choices=["search", "selfplay"])
+    parser.add_argument("--plies", type=int, default=6, help="book positions up to this many moves in")
+    parser.add_argument("--engine", default="stable_hybrid:1,80,30,10,50:6",
+                        help="heuristic:compTime:depth used to search or to play the games")
+    parser.add_argument("--depth", type=int, help="override the engine depth")
+    parser.add_argument("--time", type=float, help="search each position for this many seconds instead")
+    parser.add_argument("--games", type=int, default=1000, help="selfplay: number of games")
+    parser.add_argument("--opening-moves", type=int, default=8, help="selfplay: random moves per game")
+    parser.add_argument("--min-games", type=int, default=4, help="selfplay: games a move needs to be kept")
+    parser.add_argument("--max-positions", type=int, help="bound the book to this many positions")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=othello.OPENING_BOOK_PATH)
+    args = parser.parse_args()
+
+    engine = parseEngine(args.engine)
+    if args.depth is not None:
+        engine["depth"] = args.depth
+    if args.time is not None:
+        engine["timeLimit"] = args.time
+    # the book must not answer its own searches
+    engine["useBook"] = False
+    if args.mode == "search":
+        entries = getSearchEntries(args.plies, engine, args.workers)
+    else:
+        entries = getSelfPlayEntries(args.games, args.plies, engine, args.opening_moves, args.min_games,
+                                     args.workers, args.seed)
+    othello.writeOpeningBook(args.output, entries, args.max_positions)
+    print("wrote %d positions to %s" % (min(len(entries), args.max_positions or len(entries)), args.output))
+
+
+if __name__ == "__main__":
+    main()
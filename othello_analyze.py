@@ -0,0 +1,172 @@
+# Othello batch position analysis
+# Searches every position of a file, standard input or game archive with getMinMaxMove in a pool of
+# worker processes, and writes one JSON line per position in input order:
+#   {"line": 1, "position": "...", "tile": "O", "move": "f5", "square": [4, 5], "score": 3.0, "nodes": 812,
+#    "seconds": 0.02}
+# "move" and "square" are None when the tile to move has to pass, and a line that is not a position is
+# answered with {"line": n, "error": "..."}. With --multipv K the K best moves (every move for 0) are scored
+# in one search with getMultiPVMoves and listed best first, each with its principal variation:
+#   ..., "moves": [{"move": "f5", "square": [4, 5], "score": 3.0, "pv": "f5f6e6"}, ...], ...
+#
+# A position is the 64 squares row by row (board[0][0], board[0][1], ... board[7][7]) as X, O and - (or .)
+# for empty, a space, and the tile to move, for example the start position:
+#   ---------------------------XO------OX--------------------------- O
+# Input is read as it is needed: at most --window positions are being searched or waiting to be written,
+# so memory use does not grow with the size of the input.
+#
+# Examples:
+#   python othello_analyze.py positions.txt --depth 6 --workers 8 > analysis.jsonl
+#   python othello_analyze.py --archive games.bin --time 0.5 --engine adaptive:1,80,30:0 > analysis.jsonl
+#   python othello_analyze.py positions.txt --multipv 0 --depth 4 > labels.jsonl
+
+import argparse
+import collections
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+import AI_playable_version_of_othello as othello
+from othello_tournament import parseEngine
+
+DEFAULT_ENGINE = "stable_hybrid:1,80,30,10,50:5"
+EMPTY_SQUARES = "-."
+
+analysisEngine = None
+
+
+def getPositionString(bitboards, tile):
+    # The position line of bitboards with tile to move.
+    board = othello.getBoardFromBitboards(bitboards)
+    return "".join("-" if square == " " else square for column in board for square in column) + " " + tile
+
+
+def getPositionFromString(line):
+    # Returns [board, tile] for a position line. Raises ValueError if it is not one.
+    fields = line.split()
+    if len(fields) != 2 or len(fields[0]) != 64 or fields[1] not in ["X", "O"]:
+        raise ValueError("expected 64 squares and the tile to move")
+    board = othello.getNewBoard()
+    for i, square in enumerate(fields[0]):
+        if square in EMPTY_SQUARES:
+            square = " "
+        elif square not in "XO":
+            raise ValueError("%r is not a square" % square)
+        board[i // 8][i % 8] = square
+    return [board, fields[1]]
+
+
+def initAnalysisWorker(engine):
+    global analysisEngine
+    analysisEngine = engine
+
+
+def analyzePosition(lineNumber, line, seed):
+    # Runs in a worker process and returns the result dictionary of one position line.
+    engine = analysisEngine
+    try:
+        board, tile = getPositionFromString(line)
+    except ValueError as error:
+        return {"line": lineNumber, "error": str(error)}
+    # the search always plays computerTile
+    if tile != othello.computerTile:
+        board = othello.getBoardWithTilesSwapped(board)
+    # every result depends on its position only, whichever worker searched it and what it searched before
+    random.seed(seed + lineNumber)
+    othello.getEndgameTable().clear()
+    searchStats = othello.SearchStats()
+    multiPVMoves = None
+    if engine.get("multiPV") is not None:
+        multiPVMoves = othello.getMultiPVMoves(board, engine["heuristic"], engine["compTime"], engine["depth"],
+                                               engine["multiPV"] or None, timeLimit=engine.get("timeLimit"),
+                                               searchStats=searchStats)
+        move, score = [], None
+        if multiPVMoves:
+            move, score = multiPVMoves[0][0:2]
+    else:
+        move, score = othello.getMinMaxMove(board, engine["heuristic"], engine["compTime"], engine["depth"],
+                                            engine.get("abPrune", True), timeLimit=engine.get("timeLimit"),
+                                            endgameEmpties=engine.get("endgameEmpties"),
+                                            useBook=engine.get("useBook", True), pvs=engine.get("pvs", False),
+                                            searchStats=searchStats)
+    result = {"line": lineNumber, "position": line.strip(), "tile": tile, "move": None, "square": None,
+              "score": None, "nodes": searchStats.getNodes(), "seconds": searchStats.seconds}
+    if move != []:
+        result["move"] = othello.getGameNotation([[tile, move[0], move[1]]])
+        result["square"] = move
+        result["score"] = score
+    if multiPVMoves is not None:
+        result["moves"] = [{"move": othello.getGameNotation([[tile, x, y]]), "square": [x, y], "score": moveScore,
+                            "pv": othello.getGameNotation([[tile, pvX, pvY] for pvX, pvY in pv])}
+                           for (x, y), moveScore, pv in multiPVMoves]
+    return result
+
+
+def analyzePositions(lines, engine, workers, window, output, seed=0):
+    # Analyses the position lines in the pool and writes the results to output in input order. Returns
+    # the number of positions.
+    pending = collections.deque()
+    count = 0
+    with multiprocessing.Pool(workers, initializer=initAnalysisWorker, initargs=(engine,)) as pool:
+        for lineNumber, line in enumerate(lines, 1):
+            if line.strip() == "":
+                continue
+            if len(pending) >= window:
+                writeResult(pending.popleft().get(), output)
+            pending.append(pool.apply_async(analyzePosition, (lineNumber, line, seed)))
+            count += 1
+        while pending:
+            writeResult(pending.popleft().get(), output)
+    return count
+
+
+def writeResult(result, output):
+    output.write(json.dumps(result) + "\n")
+    output.flush()
+
+
+def getArchiveLines(path):
+    # Yields the position line of every position in a game archive.
+    for game, bitboards, tile, move in othello.readArchivePositions(path):
+        yield getPositionString(bitboards, tile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse Othello positions and write JSON lines.")
+    parser.add_argument("positions", nargs="?", default="-", help="file of position lines, or - for standard input")
+    parser.add_argument("--archive", help="analyse every position of this game archive instead")
+    parser.add_argument("--engine", default=DEFAULT_ENGINE, help="heuristic:compTime:depth")
+    parser.add_argument("--depth", type=int, help="override the engine depth")
+    parser.add_argument("--time", type=float, help="search each position for this many seconds")
+    parser.add_argument("--pvs", action="store_true", help="use the principal variation search")
+    parser.add_argument("--no-book", action="store_true", help="search book positions too")
+    parser.add_argument("--multipv", type=int, metavar="K",
+                        help="score the K best moves, or every move for 0, in one search (no book or endgame solver)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--window", type=int, help="positions in flight (default 4 per worker)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = parseEngine(args.engine)
+    if args.depth is not None:
+        engine["depth"] = args.depth
+    if args.time is not None:
+        engine["timeLimit"] = args.time
+    engine["pvs"] = args.pvs
+    engine["useBook"] = not args.no_book
+    engine["multiPV"] = args.multipv
+    window = args.window or 4 * args.workers
+    start = time.perf_counter()
+    if args.archive:
+        count = analyzePositions(getArchiveLines(args.archive), engine, args.workers, window, sys.stdout, args.seed)
+    elif args.positions == "-":
+        count = analyzePositions(sys.stdin, engine, args.workers, window, sys.stdout, args.seed)
+    else:
+        with open(args.positions) as positionsFile:
+            count = analyzePositions(positionsFile, engine, args.workers, window, sys.stdout, args.seed)
+    print("analysed %d positions in %.2fs" % (count, time.perf_counter() - start), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Othello game archive tool
+# Converts game archives (see GAME ARCHIVE in AI_playable_version_of_othello.py) to and from the text
+# notation, one game per line, and prints how big an archive is. Games are streamed, so archives of any
+# size can be converted.
+#   export: prints every game as its moves ("f5d6c3..."), or with --details as the X engine, the O engine,
+#           the seed ("-" for none) and the moves separated by tabs.
+#   import: appends the games of a text file in either of the export formats; games without engines get
+#           the --engine given for them.
+#   stats:  counts the games and positions and the bytes per game.
+#
+# Examples:
+#   python othello_tournament.py --games 1000 --archive games.bin
+#   python othello_archive.py export games.bin --details > games.txt
+#   python othello_archive.py import games2.bin games.txt
+#   python othello_archive.py stats games.bin
+
+import argparse
+import os
+import sys
+import time
+
+import AI_playable_version_of_othello as othello
+
+
+def exportGames(path, details, output):
+    for game in othello.readGameArchive(path):
+        notation = othello.getGameNotation(game["moves"])
+        if details:
+            seed = "-" if game["seed"] is None else str(game["seed"])
+            output.write("%s\t%s\t%s\t%s\n" % (game["engines"]["X"], game["engines"]["O"], seed, notation))
+        else:
+            output.write(notation + "\n")
+
+
+def importGames(path, lines, engine):
+    # Appends the games of lines to the archive at path and returns how many there were.
+    games = 0
+    with othello.GameArchiveWriter(path) as archive:
+        for lineNumber, line in enumerate(lines, 1):
+            fields = line.strip().split("\t")
+            if fields == [""]:
+                continue
+            if len(fields) == 4:
+                engines = {"X": fields[0], "O": fields[1]}
+                seed = None if fields[2] == "-" else int(fields[2])
+            elif len(fields) == 1:
+                engines = {"X": engine, "O": engine}
+                seed = None
+            else:
+                raise ValueError("line %d: expected the moves, or engines, seed and moves" % lineNumber)
+            try:
+                moves = othello.getMovesFromNotation(fields[-1])
+            except ValueError as error:
+                raise ValueError("line %d: %s" % (lineNumber, error))
+            archive.addGame(engines, seed, moves)
+            games += 1
+    return games
+
+
+def getArchiveStats(path):
+    # Streams the archive once and returns a dictionary of counts.
+    start = time.perf_counter()
+    games = 0
+    positions = 0
+    engines = set()
+    for game, bitboards, tile, move in othello.readArchivePositions(path):
+        if positions == 0 or game is not lastGame:
+            games += 1
+            engines.update(game["engines"].values())
+            lastGame = game
+        positions += 1
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(path)
+    return {"games": games, "positions": positions, "engines": len(engines), "bytes": size,
+            "bytesPerGame": size / games if games else 0.0,
+            "positionsPerSecond": positions / seconds if seconds else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert and inspect Othello game archives.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    exportParser = subparsers.add_parser("export", help="print the games in text notation")
+    exportParser.add_argument("archive")
+    exportParser.add_argument("--details", action="store_true", help="also print the engines and the seed")
+    importParser = subparsers.add_parser("import", help="append games in text notation to an archive")
+    importParser.add_argument("archive")
+    importParser.add_argument("text", help="the text file, or - for standard input")
+    importParser.add_argument("--engine", default="human", help="engine name for games without one")
+    statsParser = subparsers.add_parser("stats", help="count the games and positions of an archive")
+    statsParser.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        exportGames(args.archive, args.details, sys.stdout)
+    elif args.command == "import":
+        if args.text == "-":
+            games = importGames(args.archive, sys.stdin, args.engine)
+        else:
+            with open(args.text) as textFile:
+                games = importGames(args.archive, textFile, args.engine)
+        print("added %d games to %s" % (games, args.archive))
+    else:
+        stats = getArchiveStats(args.archive)
+        print("%d games, %d positions, %d engines, %d bytes (%.1f bytes per game), read at %.0f positions/s" % (
+            stats["games"], stats["positions"], stats["engines"], stats["bytes"], stats["bytesPerGame"],
+            stats["positionsPerSecond"]))
+
+
+if __name__ == "__main__":
+    main()
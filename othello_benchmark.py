@@ -0,0 +1,255 @@
+# Othello benchmark suite
+# Times the move generation and the search on fixed work, so that a change can be checked for speed
+# and for changed results:
+#   perft:   the number of move sequences of each length from the start position (a pass counts as a
+#            move, and a finished game ends its sequence), on bitboards and through the list-of-lists
+#            board functions. The counts are checked against PERFT_COUNTS.
+#   search:  getMinMaxMove with every heuristic of HEURISTICS at each of --depths, with alpha-beta and,
+#            up to --unpruned-depth, without it, on every position of POSITIONS.
+#   endgame: the exact endgame solve of the POSITIONS with ENDGAME_EMPTIES empty squares or fewer.
+# Every benchmark is run --repeat times and its fastest time is kept. The results are printed and can be
+# written as JSON with --output; with --baseline they are compared to an earlier JSON file, and a
+# benchmark that is more than --threshold slower, or whose node count or result changed, is flagged
+# and makes the exit status 1.
+#
+# Examples:
+#   python othello_benchmark.py --output baseline.json
+#   python othello_benchmark.py --baseline baseline.json --threshold 0.1
+#   python othello_benchmark.py --only search/stable_hybrid --depths 3,4,5,6,7
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import AI_playable_version_of_othello as othello
+from othello_analyze import getPositionFromString
+
+# the number of move sequences of each length from the start position
+PERFT_COUNTS = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284]
+
+# compTime of each heuristic in the search benchmarks
+HEURISTICS = [
+    ["greedy", []],
+    ["weighted", []],
+    ["adaptive", [1, 80, 30]],
+    ["hybrid", [1, 80, 30, 50]],
+    ["stable_adaptive", [1, 80, 30, 10]],
+    ["stable_hybrid", [1, 80, 30, 10, 50]],
+    ["stable_hybrid", [1, 80, 30, 0, 50, 10]],
+    ["pattern", []],
+]
+
+# [name, position] in the format of othello_analyze.py: positions of random games after 20 to 32 moves
+# (midgame) and 44 to 50 moves (endgame), all with O to move.
+POSITIONS = [
+    ["midgame20", "--X-------XX------XXX-----XOXXX----OOOX--OOOOOOX----O-------O--- O"],
+    ["midgame24", "-----O------OOOO---OOOO----XOO-O--XXOOO----XXOXX--XXXX--------X- O"],
+    ["midgame28", "-X-O--X--OOOOOO---OOX-O---OOXXXX--OXX-X---XOXX---XX-X-O--X------ O"],
+    ["midgame32", "----X-O--OX-XO--OOOOX---OOOXX-X-OOXOOXXX-XXOXXX---X-XX---X-X---- O"],
+    ["endgame44", "-OOO---OX-X-OXO-XXXXXOXXXOOXOOX-XXOOXXOXXXOXXOXX--XOOXXX-X-O---- O"],
+    ["endgame46", "XXXXX---OXXXXXX-OOXOOXX-OOOXO-XO-OOOOOXXOOOOOOX-O-XXXX--O-XXXO-- O"],
+    ["endgame48", "XXXXXXO-XXXXXX--XOXXXXXXOOXOOOXXOOOXOXXXOOXO-OXXO-OO-XO--O-O-X-- O"],
+    ["endgame50", "--XOXXXXOO-OXOX-OOOXOOO-OOXOXOOOOOOOOOOOXXXXXOXOXXXOOOO---X-O-OO O"],
+]
+
+DEFAULT_DEPTHS = "3,4,5"
+DEFAULT_UNPRUNED_DEPTH = 4  # searches without alpha-beta are only timed up to this depth
+DEFAULT_THRESHOLD = 0.10
+
+
+def getBitboardPerft(own, opponent, depth, passed=False):
+    # The number of move sequences of depth moves with own to move. At the last move the moves are only
+    # counted, not played.
+    if depth == 0:
+        return 1
+    moves = othello.getBitboardValidMoves(own, opponent)
+    if moves == 0:
+        if passed:
+            # neither side can move, so the game is over
+            return 1
+        return getBitboardPerft(opponent, own, depth - 1, True)
+    if depth == 1:
+        return othello.countBits(moves)
+    count = 0
+    while moves:
+        lowBit = moves & -moves
+        flips = othello.getBitboardFlips(own, opponent, lowBit.bit_length() - 1)
+        count += getBitboardPerft(opponent ^ flips, own | flips | lowBit, depth - 1)
+        moves ^= lowBit
+    return count
+
+
+def getBoardPerft(board, tile, depth, passed=False):
+    # getBitboardPerft through getValidMoves, makeMoveWithUndo and undoMove on a list-of-lists board.
+    if depth == 0:
+        return 1
+    if tile == "X":
+        otherTile = "O"
+    else:
+        otherTile = "X"
+    possibleMoves = othello.getValidMoves(board, tile)
+    if possibleMoves == []:
+        if passed:
+            return 1
+        return getBoardPerft(board, otherTile, depth - 1, True)
+    count = 0
+    for x, y in possibleMoves:
+        flips = othello.makeMoveWithUndo(board, tile, x, y)
+        count += getBoardPerft(board, otherTile, depth - 1)
+        othello.undoMove(board, tile, x, y, flips)
+    return count
+
+
+def getBenchmarks(args):
+    # Returns a list of [name, function]: function runs the benchmark once and returns [nodes, result].
+    benchmarks = []
+    for depth in range(1, args.perft_depth + 1):
+        benchmarks.append(["perft/bitboard/%d" % depth, lambda depth=depth: runPerft(depth, True)])
+    for depth in range(1, args.board_perft_depth + 1):
+        benchmarks.append(["perft/board/%d" % depth, lambda depth=depth: runPerft(depth, False)])
+    depths = [int(depth) for depth in args.depths.split(",")]
+    for heuristic, compTime in HEURISTICS:
+        heuristicName = heuristic
+        if compTime:
+            heuristicName += ":" + ",".join(str(weight) for weight in compTime)
+        for depth in depths:
+            for abPrune in [True, False]:
+                if not abPrune and depth > args.unpruned_depth:
+                    continue
+                for positionName, position in POSITIONS:
+                    name = "search/%s/%d/%s/%s" % (heuristicName, depth, "ab" if abPrune else "minimax",
+                                                   positionName)
+                    benchmarks.append([name, lambda heuristic=heuristic, compTime=compTime, depth=depth,
+                                       abPrune=abPrune, position=position:
+                                       runSearch(position, heuristic, compTime, depth, abPrune)])
+    for positionName, position in POSITIONS:
+        bitboards = othello.getBitboardsFromBoard(getPositionFromString(position)[0])
+        if 64 - othello.countBits(bitboards["X"] | bitboards["O"]) <= othello.ENDGAME_EMPTIES:
+            benchmarks.append(["endgame/%s" % positionName, lambda position=position: runEndgame(position)])
+    if args.only:
+        benchmarks = [benchmark for benchmark in benchmarks if any(benchmark[0].startswith(prefix)
+                                                                   for prefix in args.only)]
+    return benchmarks
+
+
+def runPerft(depth, bitboards):
+    board = othello.getNewBoard()
+    othello.resetBoard(board)
+    if bitboards:
+        start = othello.getBitboardsFromBoard(board)
+        count = getBitboardPerft(start["O"], start["X"], depth)
+    else:
+        count = getBoardPerft(board, "O", depth)
+    if depth < len(PERFT_COUNTS) and count != PERFT_COUNTS[depth]:
+        raise AssertionError("perft %d is %d, not %d" % (depth, count, PERFT_COUNTS[depth]))
+    return [count, count]
+
+
+def runSearch(position, heuristic, compTime, depth, abPrune):
+    # A fixed depth search that depends on nothing but its arguments: no book, no endgame solver, no
+    # tables kept from an earlier search and the same tie-breaking every time.
+    board, tile = getPositionFromString(position)
+    random.seed(0)
+    searchStats = othello.SearchStats()
+    move, score = othello.getMinMaxMove(board, heuristic, compTime, depth, abPrune, endgameEmpties=0,
+                                        useBook=False, searchStats=searchStats)
+    return [searchStats.getNodes(), [move, score]]
+
+
+def runEndgame(position):
+    board, tile = getPositionFromString(position)
+    othello.getEndgameTable().clear()
+    searchStats = othello.SearchStats()
+    result = othello.getEndgameMove(othello.getBitboardsFromBoard(board), stats=searchStats)
+    return [searchStats.getNodes(), result]
+
+
+def runBenchmarks(benchmarks, repeat, log=None):
+    # Runs every benchmark repeat times and returns {name: {"seconds", "nodes", "nodesPerSecond",
+    # "result"}} with the fastest of the times. log, if given, is called with each name and result.
+    results = {}
+    for name, function in benchmarks:
+        seconds = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            nodes, result = function()
+            elapsed = time.perf_counter() - start
+            if seconds is None or elapsed < seconds:
+                seconds = elapsed
+        results[name] = {"seconds": seconds, "nodes": nodes, "nodesPerSecond": nodes / seconds if seconds else 0.0,
+                         "result": result}
+        if log is not None:
+            log(name, results[name])
+    return results
+
+
+def compareWithBaseline(results, baseline, threshold):
+    # Returns {name: flag} for the benchmarks that are worse than in baseline: "slower" when the time grew
+    # by more than threshold (0.1 for 10%), "changed" when the node count or the result differs.
+    flags = {}
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result["nodes"] != old["nodes"] or result["result"] != old["result"]:
+            flags[name] = "changed"
+        elif result["seconds"] > old["seconds"] * (1 + threshold):
+            flags[name] = "slower"
+    return flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Othello move generation and search.")
+    parser.add_argument("--perft-depth", type=int, default=8, help="deepest bitboard perft")
+    parser.add_argument("--board-perft-depth", type=int, default=6, help="deepest list-of-lists board perft")
+    parser.add_argument("--depths", default=DEFAULT_DEPTHS, help="search depths, for example 3,4,5,6,7")
+    parser.add_argument("--unpruned-depth", type=int, default=DEFAULT_UNPRUNED_DEPTH,
+                        help="deepest search without alpha-beta")
+    parser.add_argument("--only", action="append", help="only run benchmarks whose name starts with this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="the fraction a benchmark may be slower than its baseline")
+    args = parser.parse_args()
+
+    # the opening book would answer the start of the game without a search
+    othello.openingBook = None
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)["benchmarks"]
+
+    def log(name, result):
+        line = "%-60s %9.4fs %10d nodes %10.0f/s" % (name, result["seconds"], result["nodes"],
+                                                    result["nodesPerSecond"])
+        if name in baseline and baseline[name]["seconds"]:
+            line += " %6.2fx" % (result["seconds"] / baseline[name]["seconds"])
+            flag = compareWithBaseline({name: result}, baseline, args.threshold).get(name)
+            if flag is not None:
+                line += " " + flag.upper()
+        print(line)
+        sys.stdout.flush()
+
+    start = time.perf_counter()
+    results = runBenchmarks(getBenchmarks(args), args.repeat, log)
+    # the results are JSON, so compare them the way they will be read back
+    results = json.loads(json.dumps(results))
+    flags = compareWithBaseline(results, baseline, args.threshold)
+    print("%d benchmarks in %.1fs" % (len(results), time.perf_counter() - start))
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "benchmarks": results},
+                      outputFile, indent=1, sort_keys=True)
+    if flags:
+        print("%d regressions against %s (threshold %.0f%%):" % (len(flags), args.baseline, args.threshold * 100))
+        for name in sorted(flags):
+            print("  %s %s" % (flags[name], name))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# Othello server load generator
+# Plays many games against othello_server.py at once, with random moves for the player, and prints the
+# throughput and the latency of the player's moves (from sending the move until the computer's answer).
+# The games are spread over --connections connections with --concurrency games in play at a time.
+#
+# Example:
+#   python othello_server.py --port 7777 --workers 8 &
+#   python othello_load_client.py --port 7777 --games 2000 --concurrency 500 --engine adaptive:1,80,30:3
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+
+import AI_playable_version_of_othello as othello
+
+
+class ServerConnection:
+    # One connection to the server. Requests get an id, and a reader task hands each response to the
+    # request with the same id, so many requests can be waiting on one connection.
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.waiting = {}
+        self.readerTask = asyncio.ensure_future(self.readResponses())
+
+    async def readResponses(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("the server closed the connection"))
+
+    async def request(self, request):
+        request["id"] = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request["id"]] = future
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        response = await future
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    async def close(self):
+        self.writer.close()
+        self.readerTask.cancel()
+
+
+async def playGame(connection, engine, budget, gameRandom, latencies):
+    # Plays one game with random moves and appends the latency of each of the player's moves.
+    # Returns the number of moves the computer played.
+    request = {"op": "new", "engine": engine, "computer": gameRandom.choice(["X", "O"])}
+    if budget is not None:
+        request["budget"] = budget
+    state = await connection.request(request)
+    playerTile = "X" if request["computer"] == "O" else "O"
+    computerMoves = len(state["moves"])
+    while not state["over"]:
+        board = [list(column) for column in state["board"]]
+        x, y = gameRandom.choice(othello.getValidMoves(board, playerTile))
+        start = time.perf_counter()
+        state = await connection.request({"op": "move", "game": state["game"], "move": [x, y]})
+        latencies.append(time.perf_counter() - start)
+        computerMoves += len(state["moves"])
+    await connection.request({"op": "close", "game": state["game"]})
+    return computerMoves
+
+
+def getPercentile(values, percent):
+    # The nearest-rank percentile of values.
+    values = sorted(values)
+    if values == []:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+async def runLoad(args):
+    connections = []
+    for i in range(args.connections):
+        if args.unix:
+            reader, writer = await asyncio.open_unix_connection(args.unix, limit=2 ** 20)
+        else:
+            reader, writer = await asyncio.open_connection(args.host, args.port, limit=2 ** 20)
+        connections.append(ServerConnection(reader, writer))
+    seeds = random.Random(args.seed)
+    slots = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def playOne(game):
+        async with slots:
+            return await playGame(connections[game % len(connections)], args.engine, args.budget,
+                                  random.Random(seeds.getrandbits(32)), latencies)
+
+    start = time.perf_counter()
+    computerMoves = await asyncio.gather(*[playOne(game) for game in range(args.games)])
+    elapsed = time.perf_counter() - start
+    stats = await connections[0].request({"op": "stats"})
+    del stats["id"]
+    for connection in connections:
+        await connection.close()
+    return {"games": args.games, "seconds": elapsed, "gamesPerSecond": args.games / elapsed,
+            "computerMoves": sum(computerMoves), "movesPerSecond": sum(computerMoves) / elapsed,
+            "p50": getPercentile(latencies, 50), "p99": getPercentile(latencies, 99),
+            "maxLatency": max(latencies, default=0.0), "server": stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test othello_server.py with random games.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="connect to this Unix socket instead")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100, help="games in play at a time")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--engine", default="adaptive:1,80,30:3", help="heuristic:compTime:depth of the computer")
+    parser.add_argument("--budget", type=float, help="seconds the computer may search in each game")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = asyncio.run(runLoad(args))
+    print("%d games in %.2fs: %.2f games/s, %.1f computer moves/s" % (
+        result["games"], result["seconds"], result["gamesPerSecond"], result["movesPerSecond"]))
+    print("move latency p50 %.4fs p99 %.4fs max %.4fs" % (result["p50"], result["p99"], result["maxLatency"]))
+    print("server: %s" % json.dumps(result["server"]))
+
+
+if __name__ == "__main__":
+    main()
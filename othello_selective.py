@@ -0,0 +1,279 @@
+# Othello selective search calibration
+# Fits the selective search of the principal variation search (see SELECTIVE SEARCH in
+# AI_playable_version_of_othello.py) to an engine's heuristic, and measures it against the exact search.
+#   calibrate: plays --games self-play games with the engine's heuristic at --game-depth, after
+#              --opening-moves random moves, and searches every --every-th position of them with the exact
+#              search to each of --depths and PROBCUT_DEPTH_REDUCTION plies less. For each depth and each of
+#              --phases game phases the deep scores are fitted to the shallow ones by least squares, which
+#              gives the ProbCut line and its standard error. The late move reductions start at the first
+#              move index after which fewer than --lmr-share of the cutoffs of these searches happened. The
+#              calibration is written as JSON (othello_selective.json next to the game by default).
+#   compare:   plays --games games between the engine with the selective search and the same engine with
+#              the exact one (at --exact-depth if given), both with the principal variation search, each
+#              random opening twice with the colours swapped, and prints the result of each with the nodes
+#              and seconds it spent per move.
+#
+# Examples:
+#   python othello_selective.py calibrate --engine stable_hybrid:1,80,30,10,50:6 --games 60
+#   python othello_selective.py compare --engine stable_hybrid:1,80,30,10,50:6 --games 100
+#   python othello_selective.py compare --engine stable_hybrid:1,80,30,10,50:7 --exact-depth 6 --games 100
+
+import argparse
+import collections
+import math
+import multiprocessing
+import random
+import time
+
+import AI_playable_version_of_othello as othello
+from othello_tournament import getTournamentGames, parseEngine
+
+DEFAULT_ENGINE = "stable_hybrid:1,80,30,10,50:6"
+DEFAULT_DEPTHS = "3,4,5,6"
+DEFAULT_GAME_DEPTH = 2
+DEFAULT_PHASES = 12  # about 5 discs each, so few searches cross the disc count where a hybrid heuristic switches
+DEFAULT_LMR_SHARE = 0.05
+MIN_PROBCUT_SAMPLES = 20  # a phase of a depth with fewer score pairs than this gets no ProbCut
+
+
+def playSelfPlayGame(task):
+    # Runs in a worker process. Returns the moves of one game.
+    engine, openingMoves, seed = task
+    return othello.playEngineGame({"X": engine, "O": engine}, openingMoves, seed)["moves"]
+
+
+def getCalibrationPositions(games, every, minEmpties):
+    # Returns [bitboards, tile] for every every-th position of the games, with tile to move, that has
+    # more than minEmpties empty squares.
+    positions = []
+    for moves in games:
+        board = othello.getNewBoard()
+        othello.resetBoard(board)
+        bitboards = othello.getBitboardsFromBoard(board)
+        for moveIndex, (tile, x, y) in enumerate(moves):
+            if moveIndex % every == 0 and 64 - othello.countBits(bitboards["X"] | bitboards["O"]) > minEmpties:
+                positions.append([bitboards, tile])
+            bitboards = othello.makeBitboardMove(bitboards, tile, x, y)
+    return positions
+
+
+def searchCalibrationPosition(task):
+    # Runs in a worker process. Returns [scores, cutoffMoveIndices]: the exact score of the position at
+    # each of depths, and the move indices of the cutoffs of those searches. The position is searched
+    # with getPVSScore as it is, not with the tiles swapped for getMinMaxMove, because inside the search
+    # the score of a node where the player moves is the negated score of the computer, which is not the
+    # same as the computer's score with the tiles swapped.
+    bitboards, tile, heuristic, compTime, depths, seed = task
+    evaluator = othello.LeafEvaluator(heuristic, compTime)
+    evalState = evaluator.getState(bitboards)
+    transpositionTable = othello.TranspositionTable()
+    transpositionTable.newSearch((heuristic, tuple(compTime), True, None))
+    hashKey = othello.getZobristHash(bitboards, tile)
+    moveOrdering = othello.MoveOrdering(seed)
+    searchStats = othello.SearchStats()
+    scores = {}
+    cutoffMoveIndices = collections.Counter()
+    # shallowest first, so that the deeper searches start from the move ordering of the shallower ones
+    for depth in sorted(depths):
+        moveOrdering.newSearch()
+        searchStats.newSearch(heuristic)
+        move, score = othello.getPVSScore(bitboards, tile, depth, -math.inf, math.inf, evaluator, moveOrdering,
+                                          searchStats, 0, root=True, tt=transpositionTable, hashKey=hashKey,
+                                          evalState=evalState)
+        scores[depth] = score
+        cutoffMoveIndices.update(searchStats.cutoffMoveIndices)
+    return [scores, cutoffMoveIndices]
+
+
+def fitProbCut(pairs):
+    # Fits deep = slope * shallow + intercept to the [shallow, deep] score pairs by least squares and
+    # returns [slope, intercept, sigma], sigma the root mean square of the residuals.
+    count = len(pairs)
+    meanShallow = sum(shallow for shallow, deep in pairs) / count
+    meanDeep = sum(deep for shallow, deep in pairs) / count
+    varShallow = sum((shallow - meanShallow) ** 2 for shallow, deep in pairs)
+    covariance = sum((shallow - meanShallow) * (deep - meanDeep) for shallow, deep in pairs)
+    slope = covariance / varShallow if varShallow else 1.0
+    intercept = meanDeep - slope * meanShallow
+    sigma = math.sqrt(sum((deep - slope * shallow - intercept) ** 2 for shallow, deep in pairs) / count)
+    return [slope, intercept, sigma]
+
+
+def getLMRMoveIndex(cutoffMoveIndices, share):
+    # The first move index (never the first move) from which on no more than share of the cutoffs
+    # happened, or None when there were no cutoffs.
+    total = sum(cutoffMoveIndices.values())
+    if total == 0:
+        return None
+    later = total - cutoffMoveIndices.get(0, 0)
+    moveIndex = 1
+    while later > share * total:
+        later -= cutoffMoveIndices.get(moveIndex, 0)
+        moveIndex += 1
+    return moveIndex
+
+
+def calibrate(engine, depths, phases, games, gameDepth, openingMoves, every, threshold, lmrShare, workers, seed,
+              log=None):
+    # Returns [selective, samples, cutoffMoveIndices]: the fitted SelectiveSearch, the number of score
+    # pairs of each phase of each depth and the cutoff move indices of all the searches. log, if given, is
+    # called with a line of progress now and then.
+    gameEngine = {"heuristic": engine["heuristic"], "compTime": engine["compTime"], "depth": gameDepth,
+                  "useBook": False}
+    gameRandom = random.Random(seed)
+    searchDepths = set(depths) | {depth - othello.PROBCUT_DEPTH_REDUCTION for depth in depths}
+    searchDepths.discard(0)
+    with multiprocessing.Pool(workers) as pool:
+        gameMoves = pool.map(playSelfPlayGame, [[gameEngine, openingMoves, gameRandom.getrandbits(32)]
+                                                for game in range(games)])
+        positions = getCalibrationPositions(gameMoves, every, max(searchDepths))
+        if log is not None:
+            log("%d games, %d positions" % (len(gameMoves), len(positions)))
+        tasks = [[bitboards, tile, engine["heuristic"], engine["compTime"], searchDepths, gameRandom.getrandbits(32)]
+                 for bitboards, tile in positions]
+        pairs = {depth: [[] for phase in range(phases)] for depth in depths}
+        cutoffMoveIndices = collections.Counter()
+        results = pool.imap(searchCalibrationPosition, tasks)
+        for done, ((bitboards, tile), (scores, positionCutoffs)) in enumerate(zip(positions, results), 1):
+            phase = othello.getGamePhase(othello.countBits(bitboards["X"] | bitboards["O"]), phases)
+            for depth in depths:
+                pairs[depth][phase].append([scores[depth - othello.PROBCUT_DEPTH_REDUCTION], scores[depth]])
+            cutoffMoveIndices.update(positionCutoffs)
+            if log is not None and done % 100 == 0:
+                log("searched %d of %d positions" % (done, len(tasks)))
+    probCut = {}
+    for depth in depths:
+        fits = []
+        for phasePairs in pairs[depth]:
+            fit = None
+            if len(phasePairs) >= MIN_PROBCUT_SAMPLES:
+                fit = fitProbCut(phasePairs)
+                # a shallow score that does not rise with the deep one predicts nothing
+                if fit[0] <= 0:
+                    fit = None
+            fits.append(fit)
+        if any(fits):
+            probCut[depth] = fits
+    selective = othello.SelectiveSearch(probCut, threshold, getLMRMoveIndex(cutoffMoveIndices, lmrShare),
+                                        compHeuristic=engine["heuristic"], compTime=engine["compTime"])
+    samples = {depth: [len(phasePairs) for phasePairs in pairs[depth]] for depth in depths}
+    return [selective, samples, cutoffMoveIndices]
+
+
+def playComparisonGame(task):
+    # Runs in a worker process. Returns the engine names with the scores, nodes and move times of a game.
+    engines, openingMoves, seed = task
+    result = othello.playEngineGame(engines, openingMoves, seed)
+    return {"X": engines["X"]["name"], "O": engines["O"]["name"], "scores": result["scores"],
+            "nodes": result["nodes"], "moveTimes": result["moveTimes"]}
+
+
+def compare(engine, selective, games, openingMoves, workers, seed, exactDepth=None):
+    # Plays the engine with the selective search against the engine with the exact search and returns
+    # {name: standing}, each standing with the "wins", "draws", "losses", the mean "discDifference", the
+    # "nodesPerMove" and the "secondsPerMove".
+    selectiveEngine = dict(engine, pvs=True, selective=selective, name=engine["name"] + " selective")
+    exactEngine = dict(engine, pvs=True, name=engine["name"] + " exact")
+    if exactDepth is not None:
+        exactEngine["depth"] = exactDepth
+        exactEngine["name"] = "%s:%s:%d exact" % (engine["heuristic"], ",".join(str(weight) for weight in
+                                                                               engine["compTime"]), exactDepth)
+    standings = {}
+    for name in [selectiveEngine["name"], exactEngine["name"]]:
+        standings[name] = {"wins": 0, "draws": 0, "losses": 0, "discDifference": 0, "nodes": 0, "moves": 0,
+                           "seconds": 0.0}
+    tasks = list(getTournamentGames([selectiveEngine, exactEngine], games, openingMoves, seed))
+    with multiprocessing.Pool(workers) as pool:
+        for game in pool.imap_unordered(playComparisonGame, tasks):
+            for tile, otherTile in [["X", "O"], ["O", "X"]]:
+                standing = standings[game[tile]]
+                difference = game["scores"][tile] - game["scores"][otherTile]
+                if difference > 0:
+                    standing["wins"] += 1
+                elif difference < 0:
+                    standing["losses"] += 1
+                else:
+                    standing["draws"] += 1
+                standing["discDifference"] += difference
+                standing["nodes"] += game["nodes"][tile]
+                standing["moves"] += len(game["moveTimes"][tile])
+                standing["seconds"] += sum(game["moveTimes"][tile])
+    for standing in standings.values():
+        played = standing["wins"] + standing["draws"] + standing["losses"]
+        standing["discDifference"] = standing["discDifference"] / played if played else 0.0
+        standing["nodesPerMove"] = standing.pop("nodes") / standing["moves"] if standing["moves"] else 0.0
+        standing["secondsPerMove"] = standing.pop("seconds") / standing["moves"] if standing["moves"] else 0.0
+    return standings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the Othello selective search and compare it with the "
+                                                 "exact search.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    calibrateParser = subparsers.add_parser("calibrate", help="fit ProbCut and the late move reductions")
+    calibrateParser.add_argument("--engine", default=DEFAULT_ENGINE, help="heuristic:compTime:depth")
+    calibrateParser.add_argument("--depths", default=DEFAULT_DEPTHS, help="ProbCut depths, for example 3,4,5,6")
+    calibrateParser.add_argument("--phases", type=int, default=DEFAULT_PHASES, help="game phases to fit apart")
+    calibrateParser.add_argument("--games", type=int, default=30, help="self-play games to take positions from")
+    calibrateParser.add_argument("--game-depth", type=int, default=DEFAULT_GAME_DEPTH,
+                                 help="search depth of the self-play games")
+    calibrateParser.add_argument("--opening-moves", type=int, default=8, help="random moves at the start of a game")
+    calibrateParser.add_argument("--every", type=int, default=3, help="search every this many positions of a game")
+    calibrateParser.add_argument("--threshold", type=float, default=othello.PROBCUT_THRESHOLD,
+                                 help="standard errors a ProbCut needs")
+    calibrateParser.add_argument("--lmr-share", type=float, default=DEFAULT_LMR_SHARE,
+                                 help="the share of cutoffs the reduced moves may have had")
+    calibrateParser.add_argument("--output", default=othello.SELECTIVE_SEARCH_PATH)
+    calibrateParser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    calibrateParser.add_argument("--seed", type=int, default=0)
+    compareParser = subparsers.add_parser("compare", help="play the selective search against the exact search")
+    compareParser.add_argument("--engine", default=DEFAULT_ENGINE, help="heuristic:compTime:depth")
+    compareParser.add_argument("--selective", default=othello.SELECTIVE_SEARCH_PATH, help="the calibration file")
+    compareParser.add_argument("--exact-depth", type=int, help="depth of the exact search (default the engine's)")
+    compareParser.add_argument("--games", type=int, default=20)
+    compareParser.add_argument("--opening-moves", type=int, default=4, help="random moves at the start of a game")
+    compareParser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    compareParser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = parseEngine(args.engine)
+    if args.command == "calibrate":
+        depths = [int(depth) for depth in args.depths.split(",")]
+        if min(depths) <= othello.PROBCUT_DEPTH_REDUCTION:
+            parser.error("ProbCut depths must be more than %d" % othello.PROBCUT_DEPTH_REDUCTION)
+        selective, samples, cutoffMoveIndices = calibrate(
+            engine, depths, args.phases, args.games, args.game_depth, args.opening_moves, args.every, args.threshold,
+            args.lmr_share, args.workers, args.seed,
+            lambda line: print("%s (%.1fs)" % (line, time.perf_counter() - start), flush=True))
+        for depth in depths:
+            for phase, count in enumerate(samples[depth]):
+                phasePieces = [pieces for pieces in range(4, 65) if othello.getGamePhase(pieces, args.phases) == phase]
+                line = "depth %d, %2d-%2d discs: %4d pairs, " % (depth, phasePieces[0], phasePieces[-1], count)
+                if depth in selective.probCut and selective.probCut[depth][phase] is not None:
+                    print(line + "deep = %.3f * shallow %+.2f, sigma %.2f" % tuple(selective.probCut[depth][phase]))
+                else:
+                    print(line + "no ProbCut")
+        total = sum(cutoffMoveIndices.values())
+        print("cutoffs by move index: %s" % ", ".join("%d: %.1f%%" % (moveIndex, 100.0 * count / total)
+                                                     for moveIndex, count in sorted(cutoffMoveIndices.items())))
+        print("late move reductions from move index %s" % selective.lmrMoveIndex)
+        othello.writeSelectiveSearch(args.output, selective)
+        print("wrote %s" % args.output)
+    else:
+        selective = othello.readSelectiveSearch(args.selective)
+        if selective.compHeuristic is not None and (selective.compHeuristic != engine["heuristic"] or
+                                                    selective.compTime != engine["compTime"]):
+            print("warning: %s was calibrated for %s:%s" % (args.selective, selective.compHeuristic,
+                                                            ",".join(str(weight) for weight in selective.compTime)))
+        standings = compare(engine, selective, args.games, args.opening_moves, args.workers, args.seed,
+                            args.exact_depth)
+        for name, standing in standings.items():
+            print("%-45s %4d wins %4d draws %4d losses  disc diff %+6.2f  %9.0f nodes/move  %.3fs/move" % (
+                name, standing["wins"], standing["draws"], standing["losses"], standing["discDifference"],
+                standing["nodesPerMove"], standing["secondsPerMove"]))
+    print("%.1fs" % (time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# Othello game server
+# Serves many games at once over a TCP or Unix socket. Every game is a few numbers in memory, and the
+# computer's searches run in a bounded pool of worker processes, so thousands of games can be open
+# while only --workers searches run at a time.
+#
+# The protocol is one JSON object per line in each direction. Every request has an "op" and may have an
+# "id", which is copied into its response; responses to searches can come back in any order.
+#   {"op": "new", "engine": "adaptive:1,80,30:5", "computer": "O", "budget": 60}
+#       starts a game. "engine" is heuristic:compTime:depth as in othello_tournament.py, with an
+#       optional "timeLimit" per move; "computer" is the tile the server plays (O moves first);
+#       "budget" is the total number of seconds the computer may search in the game.
+#   {"op": "move", "game": 1, "move": [x, y]}
+#       plays the player's move and answers with the computer's moves.
+#   {"op": "state", "game": 1}, {"op": "close", "game": 1}, {"op": "stats"}
+# Game responses have the "game", the computer's "moves" as [tile, x, y] lists, the "board" (board[x] is
+# a string of the 8 squares (x, 0) to (x, 7)), the tile "toMove" (None once the game is "over") and the
+# "scores". Errors are answered with {"id": ..., "error": "..."}; an engine that cannot search is refused
+# when the game is started, and a game whose search fails anyway is closed.
+#
+# Searches are queued per connection and the pool takes the next search from each connection in turn,
+# so a client with many games cannot starve the others. A connection with --max-pending searches queued
+# or running is not read from until one of them finishes, which pushes back on the client through the
+# socket instead of growing the queue. A game with a budget gets its remaining time divided by the moves
+# it still has to make for each move.
+#
+# Examples:
+#   python othello_server.py --port 7777 --workers 8
+#   python othello_server.py --unix /tmp/othello.sock
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import time
+
+import AI_playable_version_of_othello as othello
+from othello_tournament import parseEngine
+
+DEFAULT_ENGINE = "stable_hybrid:1,80,30,10,50:5"
+DEFAULT_MAX_PENDING = 64  # searches a connection may have queued or running before it is not read from
+# the heuristics getMinMaxMove knows; any other name would be scored as a hybrid heuristic
+ENGINE_HEURISTICS = ["greedy", "weighted", "adaptive", "hybrid", "stable_adaptive", "stable_hybrid", "pattern", "tuned"]
+MIN_MOVE_TIME = 0.05  # seconds a move gets when the game's budget is used up
+
+
+def searchGameMove(xbits, obits, tile, engine):
+    # Runs in a worker process. Returns the engine's [x, y] move for tile and the seconds it searched.
+    start = time.perf_counter()
+    board = othello.getBoardFromBitboards({"X": xbits, "O": obits})
+    move = othello.getEngineMove(board, tile, engine)
+    return [move, time.perf_counter() - start]
+
+
+def getRequestEngine(spec):
+    # Turns the "engine" of a new game into an engine dictionary, or raises ValueError if the engine
+    # could not search: the heuristic must be known, its compTime must have the weights it needs (building
+    # its LeafEvaluator checks them) and the depth must be at least 1.
+    if not isinstance(spec, str):
+        raise ValueError("engine must be heuristic:compTime:depth")
+    try:
+        engine = parseEngine(spec)
+    except ValueError:
+        raise ValueError("engine must be heuristic:compTime:depth")
+    if engine["heuristic"] not in ENGINE_HEURISTICS:
+        raise ValueError("unknown heuristic %s" % engine["heuristic"])
+    try:
+        othello.LeafEvaluator(engine["heuristic"], engine["compTime"])
+    except (IndexError, ValueError) as error:
+        raise ValueError("engine %s cannot search: %s" % (spec, error))
+    if engine["depth"] < 1:
+        raise ValueError("depth must be at least 1")
+    return engine
+
+
+def getRequestSeconds(request, key):
+    # The request's key as a number of seconds, or None if it has none.
+    value = request.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value < math.inf:
+        raise ValueError("%s must be a number of seconds" % key)
+    return float(value)
+
+
+class EngineScheduler:
+    # Runs searches in a process pool with at most workers running at once. Waiting searches are kept in
+    # one queue per connection, and the connections take turns.
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers)
+        self.queues = collections.OrderedDict()
+        self.running = 0
+        self.searches = 0
+        self.searchTime = 0.0
+
+    def search(self, connection, bitboards, tile, engine):
+        # Queues a search for connection and returns a future of [[x, y], seconds].
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(connection, collections.deque()).append([future, bitboards, tile, engine])
+        self.dispatch()
+        return future
+
+    def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self.running < self.workers and self.queues:
+            # the connection at the front gives one search and goes to the back
+            connection, queue = self.queues.popitem(last=False)
+            future, bitboards, tile, engine = queue.popleft()
+            if queue:
+                self.queues[connection] = queue
+            if future.cancelled():
+                continue
+            self.running += 1
+            search = loop.run_in_executor(self.executor, searchGameMove, bitboards["X"], bitboards["O"], tile,
+                                          engine)
+            search.add_done_callback(lambda search, future=future: self.finished(search, future))
+
+    def finished(self, search, future):
+        self.running -= 1
+        if not future.cancelled():
+            if search.exception() is not None:
+                future.set_exception(search.exception())
+            else:
+                move, seconds = search.result()
+                self.searches += 1
+                self.searchTime += seconds
+                future.set_result([move, seconds])
+        self.dispatch()
+
+    def dropConnection(self, connection):
+        # Forgets the searches a closed connection still had waiting.
+        queue = self.queues.pop(connection, None)
+        if queue is not None:
+            for future, bitboards, tile, engine in queue:
+                future.cancel()
+
+    def getStats(self):
+        return {"workers": self.workers, "running": self.running,
+                "queued": sum(len(queue) for queue in self.queues.values()), "searches": self.searches,
+                "averageSearchTime": self.searchTime / self.searches if self.searches else 0.0}
+
+
+class Game:
+    # One game: the bitboards and the tile to move, the tile the server plays and its engine, and the time
+    # left in its budget.
+    __slots__ = ["bitboards", "toMove", "computer", "engine", "budget", "busy"]
+
+    def __init__(self, computer, engine, budget):
+        board = othello.getNewBoard()
+        othello.resetBoard(board)
+        self.bitboards = othello.getBitboardsFromBoard(board)
+        self.toMove = "O"
+        self.computer = computer
+        self.engine = engine
+        self.budget = budget
+        self.busy = False
+
+    def play(self, tile, x, y):
+        # Plays tile's move if it is valid and returns whether it was.
+        if tile != self.toMove or not (0 <= x < 8 and 0 <= y < 8):
+            return False
+        bitboards = othello.makeBitboardMove(self.bitboards, tile, x, y)
+        if bitboards is False:
+            return False
+        self.bitboards = bitboards
+        self.toMove = self.getTileToMove(tile)
+        return True
+
+    def getValidMoves(self, tile):
+        otherTile = "X" if tile == "O" else "O"
+        return othello.getBitboardValidMoves(self.bitboards[tile], self.bitboards[otherTile])
+
+    def getTileToMove(self, tile):
+        # The tile that moves after tile has moved, or None when the game is over.
+        otherTile = "X" if tile == "O" else "O"
+        if self.getValidMoves(otherTile):
+            return otherTile
+        if self.getValidMoves(tile):
+            return tile
+        return None
+
+    def getEngine(self):
+        # The engine for the next move, with its share of the budget as the time limit.
+        if self.budget is None:
+            return self.engine
+        empties = 64 - othello.countBits(self.bitboards["X"] | self.bitboards["O"])
+        timeLimit = max(MIN_MOVE_TIME, self.budget / max(1, (empties + 1) // 2))
+        if self.engine.get("timeLimit") is not None:
+            timeLimit = min(timeLimit, self.engine["timeLimit"])
+        return dict(self.engine, timeLimit=timeLimit)
+
+    def getState(self, gameId, moves):
+        board = othello.getBoardFromBitboards(self.bitboards)
+        return {"game": gameId, "moves": moves, "board": ["".join(column) for column in board],
+                "toMove": self.toMove, "over": self.toMove is None,
+                "scores": {"X": othello.countBits(self.bitboards["X"]), "O": othello.countBits(self.bitboards["O"])}}
+
+
+class GameServer:
+    # Holds every open game and answers the requests of all connections.
+
+    def __init__(self, workers, maxPending=DEFAULT_MAX_PENDING):
+        self.scheduler = EngineScheduler(workers)
+        self.maxPending = maxPending
+        self.games = {}
+        self.nextGameId = 1
+        self.connections = 0
+
+    async def handleConnection(self, reader, writer):
+        # Reads requests from one client until it disconnects. Searches are answered by their own tasks,
+        # so one connection can have many games thinking at once.
+        connection = object()
+        slots = asyncio.Semaphore(self.maxPending)
+        writeLock = asyncio.Lock()
+        ownGames = set()
+        tasks = set()
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                except ValueError as error:
+                    await self.send(writer, writeLock, {"error": "bad request: %s" % error})
+                    continue
+                # backpressure: stop reading while this connection has maxPending searches
+                await slots.acquire()
+                task = asyncio.ensure_future(self.handleRequest(request, connection, ownGames, writer, writeLock))
+                tasks.add(task)
+                task.add_done_callback(lambda task: (tasks.discard(task), slots.release()))
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self.scheduler.dropConnection(connection)
+            for task in tasks:
+                task.cancel()
+            for gameId in ownGames:
+                self.games.pop(gameId, None)
+            writer.close()
+
+    async def send(self, writer, writeLock, response):
+        async with writeLock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def handleRequest(self, request, connection, ownGames, writer, writeLock):
+        # Answers one request with exactly one response, an error one if anything goes wrong, so that a
+        # client waiting for the id never waits forever.
+        try:
+            response = await self.getResponse(request, connection, ownGames)
+        except ValueError as error:
+            response = {"error": str(error)}
+        except Exception as error:
+            response = {"error": "internal error: %r" % error}
+        if "id" in request:
+            response["id"] = request["id"]
+        try:
+            await self.send(writer, writeLock, response)
+        except ConnectionError:
+            pass
+
+    async def getResponse(self, request, connection, ownGames):
+        op = request.get("op")
+        if op == "new":
+            computer = request.get("computer", othello.computerTile)
+            if computer not in ["X", "O"]:
+                raise ValueError("computer must be X or O")
+            # the engine is checked before the game is added, so a game never waits for a search that fails
+            engine = getRequestEngine(request.get("engine", DEFAULT_ENGINE))
+            timeLimit = getRequestSeconds(request, "timeLimit")
+            if timeLimit is not None:
+                engine["timeLimit"] = timeLimit
+            budget = getRequestSeconds(request, "budget")
+            gameId = self.nextGameId
+            self.nextGameId += 1
+            game = Game(computer, engine, budget)
+            self.games[gameId] = game
+            ownGames.add(gameId)
+            # O moves first, so the computer may have to move before the player
+            return await self.playComputerMoves(gameId, game, connection, ownGames)
+        if op == "stats":
+            stats = self.scheduler.getStats()
+            stats.update({"games": len(self.games), "connections": self.connections})
+            return stats
+        if op not in ["state", "close", "move"]:
+            raise ValueError("unknown op %s" % op)
+        gameId = request.get("game")
+        game = self.games.get(gameId) if isinstance(gameId, int) else None
+        if game is None or gameId not in ownGames:
+            raise ValueError("no game %s" % gameId)
+        if op == "state":
+            return game.getState(gameId, [])
+        if op == "close":
+            del self.games[gameId]
+            ownGames.discard(gameId)
+            return {"game": gameId, "closed": True}
+        if game.busy:
+            raise ValueError("game %s is waiting for the computer's move" % gameId)
+        try:
+            x, y = [int(coordinate) for coordinate in request["move"]]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("move must be [x, y]")
+        if game.toMove == game.computer or not game.play(game.toMove, x, y):
+            raise ValueError("%s is not a valid move" % [x, y])
+        return await self.playComputerMoves(gameId, game, connection, ownGames)
+
+    async def playComputerMoves(self, gameId, game, connection, ownGames):
+        # Plays the computer's moves (more than one when the player has to pass) and returns the game's
+        # state with them. A game whose search fails could never go on, so it is closed.
+        moves = []
+        game.busy = True
+        try:
+            while game.toMove == game.computer:
+                try:
+                    move, seconds = await self.scheduler.search(connection, game.bitboards, game.computer,
+                                                                game.getEngine())
+                except Exception as error:
+                    self.games.pop(gameId, None)
+                    ownGames.discard(gameId)
+                    raise ValueError("the computer's search failed (%r), game %s is closed" % (error, gameId))
+                if game.budget is not None:
+                    game.budget = max(0.0, game.budget - seconds)
+                game.play(game.computer, move[0], move[1])
+                moves.append([game.computer, move[0], move[1]])
+        finally:
+            game.busy = False
+        return game.getState(gameId, moves)
+
+
+async def serve(args):
+    server = GameServer(args.workers, args.max_pending)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handleConnection, path=args.unix)
+        print("serving on %s" % args.unix)
+    else:
+        listener = await asyncio.start_server(server.handleConnection, args.host, args.port)
+        print("serving on %s:%d" % (args.host, args.port))
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve many Othello games over a socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="listen on this Unix socket instead")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="requests a connection may have in progress before the server stops reading it")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
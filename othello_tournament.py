@@ -0,0 +1,135 @@
+# Othello engine tournament
+# Plays engine-vs-engine games between heuristic configurations in worker processes, with no terminal
+# I/O during the games, and prints win/loss/disc-differential and time-per-move statistics.
+#
+# Example:
+#   python othello_tournament.py --games 200 --workers 8 --engine stable_hybrid:1,80,30,10,50:5 \
+#       --engine adaptive:1,80,30:5
+# With --archive the games are also appended to a game archive (see othello_archive.py).
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+
+import AI_playable_version_of_othello as othello
+
+DEFAULT_ENGINES = [
+    "greedy::3",
+    "weighted::3",
+    "adaptive:1,80,30:3",
+    "stable_adaptive:1,80,30,10:3",
+    "hybrid:1,80,30,50:3",
+    "stable_hybrid:1,80,30,10,50:3",
+    "stable_hybrid:1,80,30,0,50,10:3",
+]
+
+
+def parseEngine(spec):
+    # Turns "heuristic:compTime:depth" (for example "stable_hybrid:1,80,30,10,50:5") into an engine dictionary.
+    heuristic, compTime, depth = spec.split(":")
+    weights = []
+    for weight in compTime.split(","):
+        if weight != "":
+            weights.append(float(weight) if "." in weight else int(weight))
+    return {"heuristic": heuristic, "compTime": weights, "depth": int(depth), "name": spec}
+
+
+def getTournamentGames(engines, gamesPerPair, openingMoves, seed):
+    # Yields one task per game. Every pair of engines plays gamesPerPair games; each random opening is
+    # played twice with the colours swapped, so neither engine gets the better openings.
+    gameRandom = random.Random(seed)
+    for first, second in itertools.combinations(engines, 2):
+        for game in range(gamesPerPair):
+            if game % 2 == 0:
+                gameSeed = gameRandom.getrandbits(32)
+                yield [{"X": first, "O": second}, openingMoves, gameSeed]
+            else:
+                yield [{"X": second, "O": first}, openingMoves, gameSeed]
+
+
+def playTournamentGame(task):
+    # Runs in a worker process. Returns the engine names and the seed with the result of
+    # othello.playEngineGame.
+    engines, openingMoves, seed = task
+    result = othello.playEngineGame(engines, openingMoves, seed)
+    return {"X": engines["X"]["name"], "O": engines["O"]["name"], "seed": seed, "scores": result["scores"],
+            "winner": result["winner"], "moves": result["moves"], "moveTimes": result["moveTimes"]}
+
+
+def addGameResult(standings, game, archive=None):
+    if archive is not None:
+        archive.addGame(game, game["seed"], game["moves"])
+    for tile, otherTile in [["X", "O"], ["O", "X"]]:
+        entry = standings[game[tile]]
+        entry["games"] += 1
+        if game["winner"] == tile:
+            entry["wins"] += 1
+        elif game["winner"] == otherTile:
+            entry["losses"] += 1
+        else:
+            entry["ties"] += 1
+        entry["discDifferential"] += game["scores"][tile] - game["scores"][otherTile]
+        entry["moves"] += len(game["moveTimes"][tile])
+        entry["moveTime"] += sum(game["moveTimes"][tile])
+        entry["maxMoveTime"] = max([entry["maxMoveTime"]] + game["moveTimes"][tile])
+
+
+def runTournament(engines, gamesPerPair, workers, openingMoves=4, seed=0, archive=None):
+    # Plays the whole round robin and returns a dictionary of statistics per engine name. Every game is
+    # also added to archive, an othello.GameArchiveWriter, if there is one.
+    standings = {}
+    for engine in engines:
+        standings[engine["name"]] = {"games": 0, "wins": 0, "losses": 0, "ties": 0, "discDifferential": 0,
+                                     "moves": 0, "moveTime": 0.0, "maxMoveTime": 0.0}
+    games = getTournamentGames(engines, gamesPerPair, openingMoves, seed)
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            for game in pool.imap_unordered(playTournamentGame, games, chunksize=4):
+                addGameResult(standings, game, archive)
+    else:
+        for task in games:
+            addGameResult(standings, playTournamentGame(task), archive)
+    for entry in standings.values():
+        entry["winRate"] = (entry["wins"] + 0.5 * entry["ties"]) / entry["games"] if entry["games"] else 0.0
+        entry["averageDiscDifferential"] = entry["discDifferential"] / entry["games"] if entry["games"] else 0.0
+        entry["averageMoveTime"] = entry["moveTime"] / entry["moves"] if entry["moves"] else 0.0
+    return standings
+
+
+def printStandings(standings):
+    print("%-34s %6s %6s %6s %6s %8s %9s %10s %10s" % (
+        "engine", "games", "wins", "losses", "ties", "winrate", "avg diff", "avg move", "max move"))
+    for name, entry in sorted(standings.items(), key=lambda item: -item[1]["winRate"]):
+        print("%-34s %6d %6d %6d %6d %8.3f %9.2f %9.4fs %9.4fs" % (
+            name, entry["games"], entry["wins"], entry["losses"], entry["ties"], entry["winRate"],
+            entry["averageDiscDifferential"], entry["averageMoveTime"], entry["maxMoveTime"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a round-robin tournament between Othello engines.")
+    parser.add_argument("--engine", action="append", dest="engines",
+                        help="heuristic:compTime:depth, for example stable_hybrid:1,80,30,10,50:5 (repeatable)")
+    parser.add_argument("--games", type=int, default=20, help="games per pair of engines")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--opening-moves", type=int, default=4, help="random moves at the start of each game")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the statistics to this file")
+    parser.add_argument("--archive", help="also append the games to this game archive")
+    args = parser.parse_args()
+
+    engines = [parseEngine(spec) for spec in (args.engines or DEFAULT_ENGINES)]
+    if args.archive:
+        with othello.GameArchiveWriter(args.archive) as archive:
+            standings = runTournament(engines, args.games, args.workers, args.opening_moves, args.seed, archive)
+    else:
+        standings = runTournament(engines, args.games, args.workers, args.opening_moves, args.seed)
+    printStandings(standings)
+    if args.json:
+        with open(args.json, "w") as jsonFile:
+            json.dump(standings, jsonFile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# Othello weight tuner
+# Fits evaluation weights to the results of recorded games (a game archive, see GAME ARCHIVE in
+# AI_playable_version_of_othello.py). Every position before a move is a sample, seen once from each side:
+# the side in computerTile's place is "the computer", and the target is the computer's final disc
+# difference. Samples are split into game phases by the number of discs on the board, as the pattern
+# tables are, and every phase gets weights of its own.
+# The archive is streamed in chunks of --chunk positions. Each chunk is turned into NumPy feature arrays
+# and folded into the fit before the next one is read, so the archive can be larger than memory.
+#   comptime: fits the compTime weights [coins, corners, mobility, stability, stable discs] of the
+#             stable heuristics by least squares and writes them as a weight file of the 'tuned'
+#             heuristic (othello_comptime.json next to the game by default, which the game reads by
+#             itself), which scores each phase with its own weights. They are also printed with the
+#             number of discs ("pieces") of each phase, which is where a hybrid heuristic switches; with
+#             --phases 1 the one line is a stable_adaptive engine spec for the whole game. The normal
+#             equations are summed chunk by chunk, so one pass over the archive gives the exact fit.
+#   patterns: fits the tables of the 'pattern' heuristic to the squared error with --epochs passes of
+#             averaged gradient steps, one step per chunk, and writes them as a weight file
+#             (othello_patterns.bin next to the game by default, which the game reads by itself).
+#
+# Examples:
+#   python othello_tournament.py --games 5000 --engine pattern::3 --engine adaptive:1,80,30:3 \
+#       --archive games.bin
+#   python othello_tune.py comptime games.bin --phases 4
+#   python othello_tournament.py --engine tuned::3 --engine stable_adaptive:1,80,30,10:3
+#   python othello_tune.py patterns games.bin --epochs 8
+
+import argparse
+import time
+
+import numpy as np
+
+import AI_playable_version_of_othello as othello
+
+# positions per chunk (each one gives two samples); the batched features take about 10KB a sample
+DEFAULT_CHUNK = 4096
+FEATURES = othello.COMPTIME_FEATURES
+RIDGE = 1e-3  # keeps the least-squares fit solvable when a feature never changes in a phase
+# a table entry seen n times in a chunk takes n / (n + PATTERN_SMOOTHING) of a full step, so rare ones move less
+PATTERN_SMOOTHING = 5
+
+# PATTERN_POWERS[square, instance] is the place value of square's digit in the instance's index, 0 when
+# the instance does not contain square; PATTERN_OFFSETS[instance] is where its pattern's table starts when
+# all the tables of a phase are laid out one after the other.
+PATTERN_POWERS = np.zeros((64, len(othello.PATTERN_INSTANCES)), dtype=np.int64)
+for instance, (pattern, squares) in enumerate(othello.PATTERN_INSTANCES):
+    for digit, square in enumerate(squares):
+        PATTERN_POWERS[square, instance] = 3 ** digit
+PATTERN_TABLE_STARTS = np.cumsum([0] + othello.PATTERN_SIZES)
+PATTERN_OFFSETS = PATTERN_TABLE_STARTS[[pattern for pattern, squares in othello.PATTERN_INSTANCES]]
+
+
+def getPositionChunks(path, chunkSize=DEFAULT_CHUNK):
+    # Replays the games of the archive and yields [xbits, obits, results] arrays of whole games, about
+    # chunkSize positions at a time: the bitboards of every position before a move and the final disc
+    # difference of "O".
+    xbitsList = []
+    obitsList = []
+    results = []
+    for game in othello.readGameArchive(path):
+        board = othello.getNewBoard()
+        othello.resetBoard(board)
+        bitboards = othello.getBitboardsFromBoard(board)
+        firstPosition = len(results)
+        for tile, x, y in game["moves"]:
+            xbitsList.append(bitboards["X"])
+            obitsList.append(bitboards["O"])
+            results.append(0)
+            bitboards = othello.makeBitboardMove(bitboards, tile, x, y)
+        result = othello.countBits(bitboards["O"]) - othello.countBits(bitboards["X"])
+        for i in range(firstPosition, len(results)):
+            results[i] = result
+        if len(results) >= chunkSize:
+            yield [np.array(xbitsList, dtype=np.uint64), np.array(obitsList, dtype=np.uint64),
+                   np.array(results, dtype=np.float64)]
+            xbitsList, obitsList, results = [], [], []
+    if results:
+        yield [np.array(xbitsList, dtype=np.uint64), np.array(obitsList, dtype=np.uint64),
+               np.array(results, dtype=np.float64)]
+
+
+def getSamples(xbits, obits, results):
+    # Returns [boardArrays, targets]: every position twice, as it is and with the tiles swapped, so that
+    # both sides are the computer once. The boards are N x 8 x 8 arrays as in BATCHED EVALUATION.
+    boardArrays = othello.getBoardArraysFromBitboards(xbits, obits)
+    return [np.concatenate([boardArrays, -boardArrays]), np.concatenate([results, -results])]
+
+
+def getFeatureMatrix(boardArrays):
+    # Returns [features, pieces]: an N x len(FEATURES) array with the features the stable heuristics weigh,
+    # for the computer, and the number of discs on each board. The mobility is the computer's number of
+    # moves minus the player's.
+    computerTile, playerTile = othello.computerTile, othello.playerTile
+    features = othello.getBatchFeatures(boardArrays, computerTile, playerTile)
+    features.update(othello.getBatchReplyFeatures(boardArrays, playerTile, features["coins"]))
+    computerMobility = (othello.getBatchFlipCounts(boardArrays, computerTile) > 0).sum(axis=1)
+    # the stable discs have no batched form, so the stability state is worked out board by board
+    flat = boardArrays.reshape(-1, 64)
+    computerBits = np.packbits(flat == othello.BOARD_ARRAY_VALUES[computerTile], axis=1, bitorder="little")
+    playerBits = np.packbits(flat == othello.BOARD_ARRAY_VALUES[playerTile], axis=1, bitorder="little")
+    stableDiscs = []
+    for own, opponent in zip(computerBits.view("<u8")[:, 0].tolist(), playerBits.view("<u8")[:, 0].tolist()):
+        stability = othello.getStabilityState({computerTile: own, playerTile: opponent})
+        stableDiscs.append(othello.getStableDiscScore(stability, computerTile, playerTile))
+    matrix = np.column_stack([features["coins"], features["corners"], computerMobility - features["mobility"],
+                              features["stability"], stableDiscs]).astype(np.float64)
+    return [matrix, features["pieces"]]
+
+
+def getPatternColumns(boardArrays):
+    # Returns an N x len(PATTERN_INSTANCES) array with the position of every instance's table entry among
+    # the tables of one phase, from the base-3 digits of the boards (1 the computer, 2 the player).
+    flat = boardArrays.reshape(-1, 64)
+    digits = (flat == othello.BOARD_ARRAY_VALUES[othello.computerTile]).astype(np.int64) + 2 * (
+            flat == othello.BOARD_ARRAY_VALUES[othello.playerTile])
+    return digits @ PATTERN_POWERS + PATTERN_OFFSETS
+
+
+def fitCompTime(path, phases, chunkSize=DEFAULT_CHUNK):
+    # Returns a list with one dictionary per phase: the "pieces" range, the number of "samples", the
+    # fitted "weights" in the order of FEATURES and the root mean square "error" of the fit.
+    size = len(FEATURES)
+    gram = np.zeros((phases, size, size))
+    moments = np.zeros((phases, size))
+    squares = np.zeros(phases)
+    samples = np.zeros(phases, dtype=np.int64)
+    for xbits, obits, results in getPositionChunks(path, chunkSize):
+        boardArrays, targets = getSamples(xbits, obits, results)
+        matrix, pieces = getFeatureMatrix(boardArrays)
+        phaseOfSample = othello.getGamePhase(pieces, phases)
+        for phase in range(phases):
+            rows = phaseOfSample == phase
+            gram[phase] += matrix[rows].T @ matrix[rows]
+            moments[phase] += matrix[rows].T @ targets[rows]
+            squares[phase] += targets[rows] @ targets[rows]
+            samples[phase] += rows.sum()
+    fits = []
+    for phase in range(phases):
+        weights = np.linalg.solve(gram[phase] + RIDGE * np.eye(size), moments[phase])
+        # the sum of squared residuals from the same sums: y.y - 2 w.(X.y) + w.(X.X)w
+        error = squares[phase] - 2 * weights @ moments[phase] + weights @ gram[phase] @ weights
+        fits.append({"pieces": getPhasePieces(phase, phases), "samples": int(samples[phase]),
+                     "weights": weights.tolist(),
+                     "error": float(np.sqrt(max(error, 0.0) / samples[phase])) if samples[phase] else 0.0})
+    return fits
+
+
+def getPhasePieces(phase, phases):
+    # The [fewest, most] discs on the board of positions in phase.
+    pieces = [count for count in range(4, 65) if othello.getGamePhase(count, phases) == phase]
+    return [pieces[0], pieces[-1]]
+
+
+def fitPatterns(path, phases, epochs, rate=1.0, chunkSize=DEFAULT_CHUNK, log=None):
+    # Returns the fitted tables as a phases x sum(PATTERN_SIZES) array of scores in discs. Every chunk
+    # moves each table entry it uses by rate times the average residual of its samples, shared out over
+    # the instances of a sample. log, if given, is called with the epoch and its root mean square error.
+    instances = len(othello.PATTERN_INSTANCES)
+    tableSize = int(PATTERN_TABLE_STARTS[-1])
+    weights = np.zeros(phases * tableSize)
+    for epoch in range(epochs):
+        squares = 0.0
+        samples = 0
+        for xbits, obits, results in getPositionChunks(path, chunkSize):
+            boardArrays, targets = getSamples(xbits, obits, results)
+            pieces = (boardArrays != 0).sum(axis=(1, 2))
+            columns = getPatternColumns(boardArrays) + (othello.getGamePhase(pieces, phases) * tableSize)[:, None]
+            residuals = targets - weights[columns].sum(axis=1)
+            squares += residuals @ residuals
+            samples += len(residuals)
+            columns = columns.ravel()
+            sums = np.bincount(columns, weights=np.repeat(residuals, instances), minlength=len(weights))
+            counts = np.bincount(columns, minlength=len(weights))
+            weights += rate * sums / (counts + PATTERN_SMOOTHING) / instances
+        if log is not None:
+            log(epoch, np.sqrt(squares / samples) if samples else 0.0)
+    return weights.reshape(phases, tableSize)
+
+
+def writePatternTables(path, weights, scale=othello.PATTERN_SCALE):
+    # Writes the tables of fitPatterns as a weight file.
+    tables = []
+    for phaseWeights in weights:
+        tables.append([np.rint(phaseWeights[start:end] * scale).astype(np.int64).tolist()
+                       for start, end in zip(PATTERN_TABLE_STARTS[:-1], PATTERN_TABLE_STARTS[1:])])
+    othello.writePatternWeights(path, tables, scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit Othello evaluation weights to recorded games.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compTimeParser = subparsers.add_parser("comptime", help="fit the compTime weights of each phase")
+    compTimeParser.add_argument("archive")
+    compTimeParser.add_argument("--output", default=othello.COMPTIME_WEIGHTS_PATH)
+    compTimeParser.add_argument("--phases", type=int, default=othello.PATTERN_PHASES,
+                                help="game phases to fit apart, 1 for one set of weights for the whole game")
+    compTimeParser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="positions per chunk")
+    patternsParser = subparsers.add_parser("patterns", help="fit the pattern tables and write a weight file")
+    patternsParser.add_argument("archive")
+    patternsParser.add_argument("--output", default=othello.PATTERN_WEIGHTS_PATH)
+    patternsParser.add_argument("--phases", type=int, default=othello.PATTERN_PHASES)
+    patternsParser.add_argument("--epochs", type=int, default=8, help="passes over the archive")
+    patternsParser.add_argument("--rate", type=float, default=1.0, help="the fraction of a full step to take")
+    patternsParser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="positions per chunk")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "comptime":
+        fits = fitCompTime(args.archive, args.phases, args.chunk)
+        for fit in fits:
+            print("pieces %2d-%2d: %8d samples, error %.2f, stable_adaptive:%s" % (
+                fit["pieces"][0], fit["pieces"][1], fit["samples"], fit["error"],
+                ",".join("%.3f" % weight for weight in fit["weights"])))
+        # a phase without samples has nothing to fit, so it keeps the default weights
+        othello.writeCompTimeWeights(args.output, [fit["weights"] if fit["samples"] else othello.DEFAULT_COMPTIME_WEIGHTS
+                                                   for fit in fits])
+        print("wrote %s (use it with the 'tuned' heuristic, for example tuned::5)" % args.output)
+    else:
+        weights = fitPatterns(args.archive, args.phases, args.epochs, args.rate, args.chunk,
+                              lambda epoch, error: print("epoch %d: error %.2f (%.1fs)" % (
+                                  epoch + 1, error, time.perf_counter() - start)))
+        writePatternTables(args.output, weights)
+        print("wrote %s" % args.output)
+    print("%.1fs" % (time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()